@@ -0,0 +1,134 @@
+"""
+Implements loading of dataframes from file in a background thread, so the GUI stays responsive while (large) files are
+being parsed. The progress (bytes read/rows parsed) is reported using Qt-signals and loading can be cancelled.
+
+The loaded dataframe is only passed on (using the finished-signal, which is handled in the GUI-thread) once loading
+is complete, so the current data is never replaced by a partially loaded dataframe. Work that would otherwise block the
+GUI-thread when the dataframe is installed (e.g. building its derived data, see GraphData.prepare_df) can be done in the
+worker thread as well, using the prepare-argument.
+"""
+import logging
+import threading
+import time
+import typing
+
+from PySide6 import QtCore
+
+from mvts_analyzer.utility import df_utility
+
+log = logging.getLogger(__name__)
+
+
+class BackgroundLoaderSignals(QtCore.QObject):
+	"""Signals of a BackgroundLoader (QRunnable is not a QObject, so it can not define signals itself)"""
+	progress = QtCore.Signal(int, int) #(bytes_read, rows_parsed)
+	finished = QtCore.Signal(object) #The loaded dataframe (or the result of prepare)
+	failed = QtCore.Signal(str) #Error message
+	cancelled = QtCore.Signal()
+
+
+class BackgroundLoader(QtCore.QRunnable):
+	"""
+	Loads a dataframe from file (using df_utility.load_dataframe_using_file_extension) in a QThreadPool-thread.
+	Exactly one of the finished/failed/cancelled signals is emitted when done.
+
+	NOTE: signals are emitted from the worker thread, connected slots of objects living in the GUI-thread are called
+	in the GUI-thread (queued connection).
+	"""
+	PROGRESS_INTERVAL_S = 0.1 #Minimum time between progress-signals, to not flood the GUI event loop
+
+	def __init__(self,
+				file_source : str,
+				prepare : typing.Optional[typing.Callable[[typing.Any], typing.Any]] = None,
+				**load_kwargs
+			):
+		"""
+		Args:
+			file_source (str): The file to load
+			prepare (typing.Callable[[pd.DataFrame], typing.Any] | None, optional): Called (in the worker thread) with
+				the loaded dataframe, its result is emitted using the finished-signal. Defaults to None (emit the
+				dataframe itself).
+			**load_kwargs: Passed on to df_utility.load_dataframe_using_file_extension (e.g. columns, datetime_range)
+		"""
+		super().__init__()
+		self.setAutoDelete(False) #Python owns this object (and its signals)
+		self.file_source = file_source
+		self.signals = BackgroundLoaderSignals()
+		self._prepare = prepare
+		self._load_kwargs = load_kwargs
+		self._cancel_event = threading.Event()
+		self._last_progress_time = 0.0
+		self._last_progress : typing.Optional[typing.Tuple[int, int]] = None #Last (bytes_read, rows_parsed)
+
+	def cancel(self):
+		"""Request the loading to be cancelled, the cancelled-signal is emitted once the loader has stopped"""
+		log.info(f"Requested cancel of loading {self.file_source}")
+		self._cancel_event.set()
+
+	@property
+	def is_cancelled(self) -> bool:
+		"""Whether cancelling has been requested"""
+		return self._cancel_event.is_set()
+
+	def start(self, thread_pool : typing.Optional[QtCore.QThreadPool] = None):
+		"""Start loading in the passed thread pool
+
+		Args:
+			thread_pool (QtCore.QThreadPool | None, optional): The thread pool to use. Defaults to None (global pool).
+		"""
+		(thread_pool if thread_pool is not None else QtCore.QThreadPool.globalInstance()).start(self)
+
+	def _on_progress(self, bytes_read : int, rows_parsed : int):
+		if self._cancel_event.is_set():
+			raise df_utility.LoadCancelledError()
+		self._last_progress = (bytes_read, rows_parsed)
+		cur_time = time.perf_counter()
+		if cur_time - self._last_progress_time >= self.PROGRESS_INTERVAL_S:
+			self._last_progress_time = cur_time
+			self.signals.progress.emit(bytes_read, rows_parsed)
+
+	def run(self):
+		"""Load the dataframe (called from the thread pool)"""
+		before = time.perf_counter()
+		try:
+			success, msg, new_df = df_utility.load_dataframe_using_file_extension(
+				self.file_source, progress_callback=self._on_progress, **self._load_kwargs)
+		except df_utility.LoadCancelledError:
+			self.signals.cancelled.emit()
+			return
+		except Exception as err: #pylint: disable=broad-exception-caught #Always report back to the GUI-thread
+			log.error(f"Error while loading {self.file_source} in the background: {err}")
+			self.signals.failed.emit(str(err))
+			return
+
+		if self._last_progress is not None: #Final progress (intermediate progress is throttled)
+			self.signals.progress.emit(*self._last_progress)
+		if self._cancel_event.is_set(): #Cancelled after the last progress-check
+			self.signals.cancelled.emit()
+			return
+		if not success or new_df is None:
+			self.signals.failed.emit(msg)
+			return
+		log.info(f"Loaded {self.file_source} in the background in {time.perf_counter() - before:.2f}s")
+
+		result = new_df
+		if self._prepare is not None:
+			before = time.perf_counter()
+			try:
+				result = self._prepare(new_df)
+			except Exception as err: #pylint: disable=broad-exception-caught
+				log.error(f"Error while preparing {self.file_source} in the background: {err}")
+				self.signals.failed.emit(str(err))
+				return
+			log.info(f"Prepared {self.file_source} in the background in {time.perf_counter() - before:.2f}s")
+			if self._cancel_event.is_set():
+				self.signals.cancelled.emit()
+				return
+		self.signals.finished.emit(result)
+
+	@staticmethod
+	def format_progress(bytes_read : int, rows_parsed : int, file_size : int = 0) -> str:
+		"""Get a human-readable progress string, e.g. "12.3 / 100.0 MB read, 50000 rows parsed" """
+		size_str = f" / {file_size / 1024**2:.1f}" if file_size > 0 else ""
+		rows_str = f", {rows_parsed} rows parsed" if rows_parsed > 0 else ""
+		return f"{bytes_read / 1024**2:.1f}{size_str} MB read{rows_str}"
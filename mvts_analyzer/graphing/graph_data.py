@@ -7,16 +7,18 @@ display settings.
 """
 
 import datetime
+import functools
 import logging
 import time
 import traceback
 import typing
 from enum import Enum
+import numpy as np
 import pandas as pd
 from PySide6 import QtCore
 
 # from mvts_analyzer.utility import GuiUtility
-from mvts_analyzer.utility import df_utility
+from mvts_analyzer.utility import df_utility, downsampling, fft_store, label_runs
 from mvts_analyzer.widgets.datastructures import LimitedRange
 
 log = logging.getLogger(__name__)
@@ -27,6 +29,16 @@ class OperationType(Enum):
 	OVERWRITE = 1 #Overwrite current
 	COMPLEMENT = 2 #Everything except
 
+
+class PreparedDataFrame(typing.NamedTuple):
+	"""A (newly loaded) dataframe together with the data derived from it (see GraphData.prepare_df), so the derived
+	data can be built outside of the GUI-thread before the dataframe is installed (see GraphData.install_loaded_df)"""
+	df : pd.DataFrame
+	dt_index : typing.Tuple[typing.Any, typing.Any, typing.Any, typing.Any] #See GraphData._build_dt_index
+	summary_pyramid : typing.Optional[downsampling.SummaryPyramid]
+	fft_matrices : typing.Dict[str, fft_store.FftMatrix]
+	fft_rows : typing.Dict[str, np.ndarray]
+
 # class GraphSettingsModel(QtCore.QObject):
 class GraphData(QtCore.QObject):
 	"""
@@ -45,68 +57,159 @@ class GraphData(QtCore.QObject):
 		super().__init__()
 
 		self._df : typing.Optional[pd.DataFrame] = None
-		self._df_selection : set = set([]) #Set of pandas locs
 		self._file_source : str = ""
 
+		#Selection and (globally) hidden datapoints as boolean masks, positionally aligned with self._df. When the index
+		#	of the dataframe changes, the masks are realigned using the index labels (see _align_masks)
+		self._selection_mask : np.ndarray = np.zeros(0, dtype=bool)
+		self._hidden_mask : np.ndarray = np.zeros(0, dtype=bool) #TODO: globally hidden datapoints, is somewhat
+			# different from view-filters.
+		self._mask_index : typing.Optional[pd.Index] = None #The index the masks are aligned with
+
+		self._dt_col = "DateTime"
+
+		#============== Derived data (rebuilt/patched on dfChanged) ==============
+		self._dt_sort_order : typing.Optional[np.ndarray] = None #Positions that sort the df by DateTime (without NaT)
+		self._dt_sort_inverse : typing.Optional[np.ndarray] = None #Position -> sorted row (-1 for NaT)
+		self._dt_sorted_times : typing.Optional[np.ndarray] = None #Sorted DateTime values as int64 nanoseconds
+		self._dt_sort_step : typing.Optional[int] = None #1/-1 if the df itself is sorted ascending/descending
+		self._summary_pyramid : typing.Optional[downsampling.SummaryPyramid] = None
+		self._fft_matrices : typing.Dict[str, fft_store.FftMatrix] = {} #Contiguous storage of the fft-columns
+		self._fft_rows : typing.Dict[str, np.ndarray] = {} #Per fft-column: matrix-row of each position (-1=missing)
+		self._stale_fft_columns : typing.Set[str] = set() #Fft-columns whose matrix is realigned on the next request
+		self._label_runs : typing.Dict[str, label_runs.LabelRuns] = {} #Run-length encoded label columns (built lazily)
+		self._patched_label_runs : typing.Set[str] = set() #Label runs that were already patched for the next dfChanged
+		self._pending_changed_columns : typing.Optional[typing.List[str]] = None
+		self.dfChanged.connect(self._on_df_changed) #Connect first, so derived data is up to date for all other listeners
+
 		if df_path is not None:
 			try:
 				self.load_from_file(df_path)
 			except Exception as err: #pylint: disable=broad-exception-caught
 				log.error(f"Could not load from file: {err}")
 
-		self.hidden_datapoints = set([]) #TODO: globally hidden datapoints, is somewhat different from view-filters. Although
 
-		self._dt_col = "DateTime"
+	def _align_masks(self):
+		"""Make sure the selection/hidden masks are aligned with the current dataframe. If the index of the dataframe
+		changed (e.g. a new dataframe was loaded, or rows were added), the masks are realigned using the index labels.
+		If the index is unchanged, the masks are kept as-is (positionally). NOTE: when realigning an index with
+		duplicate labels, all rows that share a label with a selected/hidden row are selected/hidden, as the labels
+		cannot tell these rows apart.
+		"""
+		index = self._df.index if self._df is not None else pd.RangeIndex(0)
+		if self._mask_index is index:
+			return
+		if self._mask_index is None or not self._mask_index.equals(index):
+			old_index = self._mask_index if self._mask_index is not None else pd.RangeIndex(0)
+			self._selection_mask, self._hidden_mask = [
+				index.isin(old_index[mask]) if mask.any() else np.zeros(len(index), dtype=bool)
+					for mask in (self._selection_mask, self._hidden_mask)
+			]
+		self._mask_index = index
+
+	def to_mask(self, idxes : typing.Union[set, typing.Iterable, np.ndarray, None]) -> np.ndarray:
+		"""Convert a collection of pandas-idxes (or a boolean mask, which is returned as-is) to a boolean mask aligned
+		with the current dataframe.
+
+		Args:
+			idxes (set | typing.Iterable | np.ndarray | None): The pandas-idxes, or a boolean mask of the same length
+				as the dataframe
+
+		Returns:
+			np.ndarray: Boolean mask with the same length as the dataframe
+		"""
+		n_rows = self.get_df_len()
+		if isinstance(idxes, np.ndarray) and idxes.dtype == bool:
+			assert len(idxes) == n_rows, f"Mask length ({len(idxes)}) does not match dataframe length ({n_rows})"
+			return idxes
+		if self._df is None or idxes is None or len(idxes) == 0: #type: ignore
+			return np.zeros(n_rows, dtype=bool)
+		return self._df.index.isin(idxes if isinstance(idxes, (np.ndarray, pd.Index)) else list(idxes))
 
+	@property
+	def selection_mask(self) -> np.ndarray:
+		"""Boolean mask (aligned with df) of the currently selected datapoints. NOTE: this is not a copy!"""
+		self._align_masks()
+		return self._selection_mask
+
+	@property
+	def hidden_mask(self) -> np.ndarray:
+		"""Boolean mask (aligned with df) of the (globally) hidden datapoints. NOTE: this is not a copy!"""
+		self._align_masks()
+		return self._hidden_mask
+
+	@property
+	def selection_count(self) -> int:
+		"""The amount of selected datapoints"""
+		return int(np.count_nonzero(self.selection_mask))
+
+	@property
+	def hidden_count(self) -> int:
+		"""The amount of hidden datapoints"""
+		return int(np.count_nonzero(self.hidden_mask))
+
+	@property
+	def hidden_datapoints(self) -> set:
+		"""Returns the hidden datapoints as a set of pandas-idxes (compatibility, prefer hidden_mask)"""
+		if self._df is None:
+			return set([])
+		return set(self._df.index[self.hidden_mask])
+
+	@hidden_datapoints.setter
+	def hidden_datapoints(self, new_hidden : typing.Union[set, np.ndarray]):
+		self._align_masks()
+		self._set_hidden_mask(self.to_mask(new_hidden).copy())
+
+	def _set_hidden_mask(self, new_mask : np.ndarray, emit_changed : bool = True):
+		"""Replace the hidden mask and emit hiddenDatapointsChanged if so desired"""
+		self._hidden_mask = new_mask
+		if emit_changed:
+			self.hiddenDatapointsChanged.emit(self._hidden_mask)
 
 	def hide_selection(self):
 		"""Hide the currently selected datapoints"""
-		self.hide_datapoints(self._df_selection)
+		self.hide_datapoints(self.selection_mask)
 
 	def hide_all_datapoints_except_selection(self):
 		"""Hide all datapoints except those selected"""
-		self.hide_all_datapoints_except(self._df_selection)
+		self.hide_all_datapoints_except(self.selection_mask)
 
-	def hide_datapoints(self, idxes : typing.Optional[set]):
-		"""Hide the passed (by pandas-idx) datapoints
+	def hide_datapoints(self, idxes : typing.Union[set, np.ndarray, None]):
+		"""Hide the passed (by pandas-idx or boolean mask) datapoints
 
 		Args:
-			idxes (set): The indexes to hide
+			idxes (set | np.ndarray | None): The indexes to hide (or a boolean mask)
 		"""
 		if idxes is None:
 			return
 		log.debug("Hiding some datapoints")
-		firstlen = len(self.hidden_datapoints)
-		self.hidden_datapoints.update(idxes)
-
-		if firstlen != len(self.hidden_datapoints):
-			self.hiddenDatapointsChanged.emit(self.hidden_datapoints)
+		new_hidden = self.to_mask(idxes) & ~self.hidden_mask
+		if new_hidden.any(): #Only if something actually changed
+			self._set_hidden_mask(self._hidden_mask | new_hidden)
 
 
 	def unhide_all_datapoints(self):
 		"""Reset the hidden datapoints - no datapoints will be hidden"""
 		log.debug("Unhiding all datapoints")
-		if len(self.hidden_datapoints) > 0:
-			self.hidden_datapoints = set([])
-			self.hiddenDatapointsChanged.emit(self.hidden_datapoints)
+		if self.hidden_mask.any():
+			self._set_hidden_mask(np.zeros(len(self._hidden_mask), dtype=bool))
 
-	def hide_all_datapoints_except(self, idxes : set):
-		"""Hide all datapoints except those passed (by pandas-idx)
+	def hide_all_datapoints_except(self, idxes : typing.Union[set, np.ndarray]):
+		"""Hide all datapoints except those passed (by pandas-idx or boolean mask)
 
 		Args:
-			idxes (set): The indexes to keep visible
+			idxes (set | np.ndarray): The indexes to keep visible (or a boolean mask)
 		"""
 		if self._df is None:
 			return
-		all_indx = set(list(self._df.index))
-		self.hidden_datapoints = all_indx - idxes
-		self.hiddenDatapointsChanged.emit(self.hidden_datapoints)
+		self._align_masks()
+		self._set_hidden_mask(~self.to_mask(idxes))
 
 	def flip_hidden(self):
 		"""
 		Flip the hidden datapoints, i.e. if some datapoints are hidden, unhide them, and vice versa
 		"""
-		self.hide_all_datapoints_except(self.hidden_datapoints)
+		self.hide_all_datapoints_except(self.hidden_mask)
 
 	def get_df_len(self) -> int:
 		"""Return the length of the current dataframe (0 if no dataframe is loaded)"""
@@ -133,25 +236,28 @@ class GraphData(QtCore.QObject):
 	@property
 	def df_selection(self):
 		"""
-		Returns the current dataframe selection as a list(! not a set!) of indexes
+		Returns the current dataframe selection as a list(! not a set!) of indexes (compatibility, prefer
+		selection_mask)
 		"""
-		return list(self._df_selection)
+		if self._df is None:
+			return []
+		return list(self._df.index[self.selection_mask])
 
 	@df_selection.setter
-	def df_selection(self, new_selection : set):
+	def df_selection(self, new_selection : typing.Union[set, np.ndarray]):
 		"""Overwrite the current dataframe-selection"""
-		self._df_selection = new_selection #TODO: check for change?
-		self.dfSelectionChanged.emit(new_selection) #Emit new selection
+		self.set_df_selection(new_selection, OperationType.OVERWRITE)
 
 	def set_df_selection(self,
-				new_selection : set,
+				new_selection : typing.Union[set, np.ndarray],
 				mode : OperationType = OperationType.OVERWRITE,
 				fill_gaps_ms : int = 0
 			):
 		"""Change the dataframe selection, can use multiple opreations (APPEND, OVERWRITE, COMPLEMENT)
 
 		Args:
-			new_selection (set): The newly selected points
+			new_selection (set | np.ndarray): The newly selected points, either as a set of pandas-idxes or as a
+				boolean mask aligned with the dataframe
 			mode (OperationType, optional): What to do with old selection, can either reuse (APPEND/COMPLEMENT) or
 				completely overwrite. Defaults to OperationType.OVERWRITE.
 			fill_gaps_ms (int, optional): Whether to fill gaps between datapoints, e.g. if t=1 and t=3, then t=2
@@ -165,57 +271,71 @@ class GraphData(QtCore.QObject):
 
 				Defaults to 0.
 		"""
-		assert isinstance(new_selection, set)
+		assert isinstance(new_selection, (set, np.ndarray))
 		if self._df is None:
 			return
 
 		before_time = time.perf_counter()
+		self._align_masks()
+		new_mask = self.to_mask(new_selection)
 
-
-		if len(new_selection) >= 2 and fill_gaps_ms > 0: #Only if more than 2 datapoints and fill_gaps is turned on
+		if fill_gaps_ms > 0 and np.count_nonzero(new_mask) >= 2: #Only if more than 2 datapoints and fill_gaps is on
 			log.debug(f"Settings GraphData selection in mode {mode} - filling gaps of size (ms): {fill_gaps_ms}")
-			time_selection = self._df[[self._dt_col]].copy()
-			time_selection["mask"] = False
-			time_selection.loc[list(new_selection), "mask"] = True
-			time_selection["indx"] = self._df.index
-			time_selection.index = time_selection[self._dt_col] #type:ignore
-
-			time_selection.sort_index(inplace=True) #Sort ascending (dt=0  -> indx = 0)
-
-			#We have to do the following operation twice to account for left + right
-			time_selection["mask"] = (
-				#If left + right aligned rolling find at least 1 entry -> select this one
-				((time_selection["mask"].rolling(f"{int(fill_gaps_ms/2)}ms", closed='both').sum()) > 0)
-				& (time_selection["mask"][::-1].rolling(f"{int(fill_gaps_ms/2)}ms", closed='both').sum()[::-1] > 0)
-			)
-			time_selection["mask"] = (
-				#Do this a second time to account for left/right
-				((time_selection["mask"].rolling(f"{int(fill_gaps_ms/2)}ms", closed='both').sum()) > 0)
-				& (time_selection["mask"][::-1].rolling(f"{int(fill_gaps_ms/2)}ms", closed='both').sum()[::-1] > 0)
-			)
-
-			new_selection = set(time_selection.loc[time_selection["mask"], "indx"]) #Take indexes where time selection
+			new_mask = self._fill_selection_gaps(new_mask, fill_gaps_ms)
 			log.debug(f"Filling gaps in selection took: {time.perf_counter() - before_time}")
 
 		if mode == OperationType.APPEND:
-			prev = len(self._df_selection)
-			self._df_selection = self._df_selection.union(new_selection)
-			if prev != len(self._df_selection): #If selection actually changed
-				self.dfSelectionChanged.emit(self._df_selection) #Emit new selection
+			if np.any(new_mask & ~self._selection_mask): #If selection actually changed
+				self._selection_mask = self._selection_mask | new_mask
+				self.dfSelectionChanged.emit(self._selection_mask) #Emit new selection
 		elif mode == OperationType.OVERWRITE:
-			self._df_selection = new_selection #TODO: check for change?
-			self.dfSelectionChanged.emit(self._df_selection ) #Emit new selection
+			if not np.array_equal(new_mask, self._selection_mask): #If selection actually changed
+				self._selection_mask = new_mask.copy()
+				self.dfSelectionChanged.emit(self._selection_mask) #Emit new selection
 		elif mode == OperationType.COMPLEMENT:
-			prev = len(self._df_selection)
-			self._df_selection = self._df_selection - new_selection
-			if prev != len(self._df_selection): #If selection actually changed
-				self.dfSelectionChanged.emit(self._df_selection ) #Emit new selection
+			if np.any(new_mask & self._selection_mask): #If selection actually changed
+				self._selection_mask = self._selection_mask & ~new_mask
+				self.dfSelectionChanged.emit(self._selection_mask) #Emit new selection
 
 
 
 		# log.debug(f"Model selection: {self._df.loc[new_selection]}")
 
 
+	def _fill_selection_gaps(self, mask : np.ndarray, fill_gaps_ms : int) -> np.ndarray:
+		"""Also select all datapoints between two (in time) consecutive selected datapoints that are at most
+		fill_gaps_ms apart (see set_df_selection). Runs in a single vectorized pass over the DateTime-sorted rows.
+
+		Args:
+			mask (np.ndarray): Boolean mask (aligned with the dataframe) of the selected datapoints
+			fill_gaps_ms (int): The maximum size of the gaps to fill (in ms)
+
+		Returns:
+			np.ndarray: The boolean mask with the gaps filled
+		"""
+		assert self._df is not None
+		if self._dt_sort_inverse is None or len(self._dt_sort_inverse) != len(self._df): #E.g. changed without signal
+			self._rebuild_dt_index()
+		if self._dt_sort_order is None:
+			log.warning(f"Can not fill gaps in selection, no (datetime) column {self._dt_col} available")
+			return mask
+
+		selected_rows = np.flatnonzero(mask[self._dt_sort_order]) #Sorted rows of the selected datapoints
+		if len(selected_rows) < 2:
+			return mask
+		gaps = np.diff(self._dt_sorted_times[selected_rows]) #type: ignore
+		filled = np.flatnonzero(gaps <= fill_gaps_ms * 1_000_000) #Fill from selected_rows[i] until selected_rows[i+1]
+
+		#Mark the start (+1) and end (-1) of each filled span, the cumulative sum is then 1 within the spans
+		span_edges = np.zeros(len(self._dt_sort_order) + 1, dtype=np.int8)
+		span_edges[selected_rows[filled]] = 1
+		span_edges[selected_rows[filled + 1]] -= 1
+		in_span = np.cumsum(span_edges[:-1], dtype=np.int8).view(bool)
+
+		new_mask = mask.copy()
+		new_mask[self._dt_sort_order[in_span]] = True
+		return new_mask
+
 	def get_column_type(self, column : str):
 		"""Return the type of a column by name"""
 		if self._df is not None and column in self._df:
@@ -260,11 +380,345 @@ class GraphData(QtCore.QObject):
 		"""Return _df NOTE: this is not a copy!!!"""
 		return self._df
 
+	@property
+	def dt_col(self) -> str:
+		"""The name of the datetime column"""
+		return self._dt_col
+
+	@property
+	def dt_sort_order(self) -> typing.Optional[np.ndarray]:
+		"""Positions (iloc) that sort the dataframe by the datetime column (rows with NaT are excluded), or None if
+		there is no (datetime) DateTime column"""
+		return self._dt_sort_order
+
+	@property
+	def dt_sort_inverse(self) -> typing.Optional[np.ndarray]:
+		"""The permutation back from sorted order: dt_sort_inverse[iloc] is the sorted row of iloc (-1 for NaT), so
+		that dt_sort_order[dt_sort_inverse[i]] == i for all non-NaT rows"""
+		return self._dt_sort_inverse
+
+	@property
+	def changed_columns(self) -> typing.Optional[typing.List[str]]:
+		"""The columns that changed, only set while dfChanged is being emitted (see _emit_df_changed). None if
+		everything might have changed."""
+		return self._pending_changed_columns
+
+	@property
+	def dt_sorted_times(self) -> typing.Optional[np.ndarray]:
+		"""The sorted (naive UTC) DateTime values as int64 nanoseconds, dt_sorted_times[i] is the time of sorted row i"""
+		return self._dt_sorted_times
+
+	def get_dt_row_range(self, left : typing.Any = None, right : typing.Any = None) -> typing.Tuple[int, int]:
+		"""Get the sorted row range [start, stop) of all rows with left <= DateTime <= right using a binary search on
+		the sorted DateTime column.
+
+		Args:
+			left (typing.Any, optional): The left bound (anything convertible to a pd.Timestamp). Defaults to None (no
+				bound).
+			right (typing.Any, optional): The right bound. Defaults to None (no bound).
+
+		Raises:
+			ValueError: If no sorted DateTime index is available
+		"""
+		if self._dt_sorted_times is None:
+			raise ValueError(f"No sorted index available, make sure a datetime-column '{self._dt_col}' exists")
+		times = self._dt_sorted_times
+		start = 0 if left is None else int(np.searchsorted(times, downsampling.to_int64_time(left), side="left"))
+		stop = len(times) if right is None \
+			else int(np.searchsorted(times, downsampling.to_int64_time(right), side="right"))
+		return start, max(start, stop)
+
+	def get_dt_positions(self, left : typing.Any = None, right : typing.Any = None) -> np.ndarray:
+		"""Get the positions (ilocs) of all rows with left <= DateTime <= right, sorted by DateTime. The result is a
+		view of dt_sort_order, so no copy is made.
+
+		Raises:
+			ValueError: If no sorted DateTime index is available
+		"""
+		start, stop = self.get_dt_row_range(left, right)
+		return self._dt_sort_order[start:stop] #type: ignore
+
+	def get_dt_indexer(self, left : typing.Any = None, right : typing.Any = None) -> typing.Union[slice, np.ndarray]:
+		"""Same as get_dt_positions, but returns a slice if the dataframe itself is already sorted (ascending or
+		descending) by DateTime, so that df.iloc[indexer] returns a view instead of a copy.
+
+		Raises:
+			ValueError: If no sorted DateTime index is available
+		"""
+		start, stop = self.get_dt_row_range(left, right)
+		if self._dt_sort_step == 1:
+			return slice(start, stop)
+		elif self._dt_sort_step == -1:
+			if start >= stop: #Empty range (e.g. domain outside of the data), a reversed slice would select all rows
+				return slice(0, 0)
+			last = len(self._dt_sort_order) - 1 #type: ignore
+			return slice(last - start, (last - stop) if stop <= last else None, -1)
+		return self._dt_sort_order[start:stop] #type: ignore
+
+	def get_summary_pyramid(self) -> typing.Optional[downsampling.SummaryPyramid]:
+		"""Returns the cached multi-resolution min/max/mean/count summaries of all numeric columns (in DateTime-sorted
+		order, see dt_sort_order) or None if not available (e.g. no DateTime column)"""
+		return self._summary_pyramid
+
+	def get_label_runs(self, column : str) -> typing.Optional[label_runs.LabelRuns]:
+		"""Get the run-length encoding (in DateTime-sorted order) of a label column, the runs are built on the first
+		request and patched/dropped when the column changes. Returns None if the column or DateTime-index does not exist.
+		"""
+		if self._df is None or self._dt_sort_order is None or column not in self._df.columns:
+			return None
+		if column not in self._label_runs or self._label_runs[column].n_rows != len(self._dt_sort_order):
+			before = time.perf_counter()
+			self._label_runs[column] = label_runs.LabelRuns.from_values(
+				self._df[column].iloc[self._dt_sort_order]) #type: ignore
+			log.debug(f"Building label runs of column {column} ({len(self._label_runs[column])} runs) took: "
+				f"{time.perf_counter() - before}")
+		return self._label_runs[column]
+
+	def _get_sorted_rows(self, mask : np.ndarray) -> np.ndarray:
+		"""Get the (ascending) sorted rows of the positions in a boolean mask (rows with NaT are left out)"""
+		rows = self._dt_sort_inverse[mask] #type: ignore
+		rows = rows[rows >= 0]
+		rows.sort()
+		return rows
+
+	def get_fft_matrix(self, column : str) -> typing.Optional[typing.Tuple[np.ndarray, np.ndarray]]:
+		"""Get the contiguous (rows x lines) matrix of an fft-column and the matrix-row of each position in the
+		dataframe (-1 for missing values), or None if the column can not be stored as a matrix (e.g. rows differ in
+		length). If the column changed since the last request, the matrix is realigned first (see _align_fft_column).
+		"""
+		if column in self._stale_fft_columns and self._df is not None:
+			self._stale_fft_columns.discard(column)
+			self._align_fft_column(self._df, column, self._fft_matrices, self._fft_rows)
+		if column not in self._fft_matrices or column not in self._fft_rows:
+			return None
+		return self._fft_matrices[column].matrix, self._fft_rows[column] #type: ignore
+
 	def set_df(self, new_df : pd.DataFrame, emit_changed = False):
 		"""Sets the new dataframe """
 		self._df = new_df
 		if emit_changed:
 			self.dfChanged.emit()
+		else:
+			self._refresh_derived_data()
+
+	def _emit_df_changed(self, changed_columns : typing.Optional[typing.Iterable[str]] = None):
+		"""Emit dfChanged, if changed_columns is passed, the derived data (e.g. the summary pyramid) is only patched
+		for these columns instead of being rebuilt completely.
+
+		Args:
+			changed_columns (typing.Iterable[str] | None, optional): The columns that were changed/added/removed.
+				Defaults to None (everything might have changed).
+		"""
+		self._pending_changed_columns = None if changed_columns is None else list(changed_columns)
+		try:
+			self.dfChanged.emit()
+		finally:
+			self._pending_changed_columns = None
+
+	def _on_df_changed(self):
+		self._refresh_derived_data(self._pending_changed_columns)
+
+	def _refresh_derived_data(self, changed_columns : typing.Optional[typing.List[str]] = None):
+		"""Rebuild (or patch) the data derived from the dataframe (sorting order, summary pyramid)
+
+		Args:
+			changed_columns (typing.List[str] | None, optional): If passed, only the derived data of these columns is
+				updated. Defaults to None (rebuild everything).
+		"""
+		before = time.perf_counter()
+		self._align_masks()
+		self._refresh_fft_matrices(changed_columns)
+		self._refresh_label_categoricals(changed_columns)
+		if changed_columns is None or self._dt_col in changed_columns or self._summary_pyramid is None:
+			self._rebuild_summary_pyramid()
+			self._label_runs.clear() #Sorted order might have changed
+		else:
+			for column in changed_columns:
+				self._update_summary_pyramid_column(column)
+				if column not in self._patched_label_runs:
+					self._label_runs.pop(column, None)
+		self._patched_label_runs.clear()
+		log.debug(f"Refreshing derived data (columns: {changed_columns}) took: {time.perf_counter() - before}")
+
+	def _refresh_fft_matrices(self, changed_columns : typing.Optional[typing.List[str]] = None):
+		"""Mark the matrices of fft-columns that changed (or to which rows were added) as stale, they are realigned on
+		the next get_fft_matrix, so dfChanged does not run a pass over all cells (e.g. when the fft is not plotted).
+		Loaded dataframes are stored as matrices when they are prepared (see prepare_df)."""
+		fft_columns = df_utility.get_fft_columns(self._df)
+		for column in list(self._fft_matrices):
+			if column not in fft_columns:
+				self._fft_matrices.pop(column)
+				self._fft_rows.pop(column, None)
+		self._stale_fft_columns.intersection_update(fft_columns)
+		for column in fft_columns:
+			if changed_columns is None or column in changed_columns or column not in self._fft_rows \
+					or len(self._fft_rows[column]) != len(self._df): #type: ignore
+				self._stale_fft_columns.add(column)
+
+	@staticmethod
+	def _align_fft_column(
+				df : pd.DataFrame,
+				column : str,
+				fft_matrices : typing.Dict[str, fft_store.FftMatrix],
+				fft_rows : typing.Dict[str, np.ndarray]
+			):
+		"""Make sure an fft-column is stored as a contiguous matrix, if not all cells are row-views of the matrix (e.g.
+		rows were added/replaced), the matrix is rebuilt and the cells are replaced by (lossless) row-views of it.
+		fft_matrices/fft_rows are updated in place."""
+		fft_matrix = fft_matrices.setdefault(column, fft_store.FftMatrix())
+		try:
+			rows, new_cells = fft_matrix.align(df[column].to_numpy()) #type: ignore
+		except ValueError as err:
+			log.warning(f"Could not store fft-column {column} as a matrix, using it as-is: {err}")
+			fft_matrices.pop(column)
+			fft_rows.pop(column, None)
+			return
+		if new_cells is not None:
+			df[column] = pd.Series(new_cells, index=df.index, copy=False)
+		fft_rows[column] = rows
+
+	def _refresh_label_categoricals(self, changed_columns : typing.Optional[typing.List[str]] = None):
+		"""Store label columns of python strings as pandas Categoricals (see _convert_label_categoricals)"""
+		self._convert_label_categoricals(self._df, changed_columns)
+
+	@staticmethod
+	def _convert_label_categoricals(
+				df : typing.Optional[pd.DataFrame],
+				changed_columns : typing.Optional[typing.List[str]] = None
+			):
+		"""Store label columns of python strings as pandas Categoricals (integer codes plus a dictionary of labels), so
+		labeling/renaming/coloring work on the codes instead of on the strings. Only changed columns are checked."""
+		if df is None:
+			return
+		columns = df.select_dtypes(include=["object", "string"]).columns
+		for column in columns if changed_columns is None else columns.intersection(changed_columns):
+			categorical = df_utility.to_categorical_labels(df[column]) #type: ignore
+			if categorical is not None:
+				df[column] = categorical
+				log.debug(f"Stored label column {column} as categorical ({len(categorical.cat.categories)} labels)")
+
+	def _rebuild_dt_index(self):
+		"""(Re)build the DateTime-sorted positions, its inverse and the sorted times"""
+		self._dt_sort_order, self._dt_sort_inverse, self._dt_sorted_times, self._dt_sort_step = \
+			self._build_dt_index(self._df, self._dt_col)
+
+	@staticmethod
+	def _build_dt_index(
+				df : typing.Optional[pd.DataFrame],
+				dt_col : str
+			) -> typing.Tuple[
+				typing.Optional[np.ndarray], typing.Optional[np.ndarray], typing.Optional[np.ndarray], typing.Optional[int]
+			]:
+		"""Build the DateTime-sorted positions, its inverse (-1 for NaT), the sorted times (int64 nanoseconds) and the
+		sort-step (1/-1 if the df itself is sorted ascending/descending, else None). All None if there is no
+		DateTime-column."""
+		if df is None or dt_col not in df.columns or not pd.api.types.is_datetime64_any_dtype(df[dt_col]):
+			return None, None, None, None
+		dts = df[dt_col]
+		if dts.dt.tz is not None:
+			dts = dts.dt.tz_convert(None) #Sort on (naive) UTC
+		dts = dts.to_numpy(dtype="datetime64[ns]")
+		n_nat = int(np.isnat(dts).sum())
+
+		sort_step = None
+		if n_nat == 0 and pd.Index(dts).is_monotonic_increasing: #Most logs are already sorted -> no need to argsort
+			order = np.arange(len(dts))
+			sort_step = 1
+		elif n_nat == 0 and pd.Index(dts).is_monotonic_decreasing:
+			order = np.arange(len(dts))[::-1]
+			sort_step = -1
+		else:
+			order = np.argsort(dts, kind="stable") #NaT is sorted last
+
+		sort_order = np.ascontiguousarray(order[:len(order) - n_nat])
+		sort_inverse = np.full(len(dts), -1, dtype=np.int64)
+		sort_inverse[sort_order] = np.arange(len(sort_order))
+		return sort_order, sort_inverse, dts[sort_order].view(np.int64), sort_step
+
+	def _rebuild_summary_pyramid(self):
+		self._rebuild_dt_index()
+		self._summary_pyramid = self._build_summary_pyramid(
+			self._df, self._dt_col, self._dt_sort_order, self._dt_sorted_times, self._get_sorted_column_values)
+
+	@staticmethod
+	def _build_summary_pyramid(
+				df : typing.Optional[pd.DataFrame],
+				dt_col : str,
+				sort_order : typing.Optional[np.ndarray],
+				sorted_times : typing.Optional[np.ndarray],
+				value_getter : typing.Callable[..., np.ndarray]
+			) -> typing.Optional[downsampling.SummaryPyramid]:
+		"""Build the summary pyramid of all numeric columns of df, None if there is no DateTime-index"""
+		if df is None or sort_order is None:
+			return None
+		summary_pyramid = downsampling.SummaryPyramid(
+			sorted_times, #type: ignore #Shared with the dt-index, not copied
+			value_getter=value_getter
+		)
+		for column in df.columns:
+			if GraphData._is_summarized_column(df, column, dt_col):
+				summary_pyramid.add_column(column, value_getter(column))
+		return summary_pyramid
+
+	@staticmethod
+	def _is_summarized_column(df : pd.DataFrame, column : str, dt_col : str) -> bool:
+		"""Whether a column is part of the summary pyramid (numeric, non-boolean columns except the DateTime-column)"""
+		return column != dt_col and column in df.columns and pd.api.types.is_numeric_dtype(df[column]) \
+			and not pd.api.types.is_bool_dtype(df[column])
+
+	def _update_summary_pyramid_column(self, column : str):
+		if self._summary_pyramid is None or self._df is None:
+			return
+		if not self._is_summarized_column(self._df, column, self._dt_col):
+			self._summary_pyramid.remove_column(column)
+			return
+		self._summary_pyramid.add_column(column, self._get_sorted_column_values(column))
+
+	def _get_sorted_column_values(self,
+				column : str,
+				start : typing.Optional[int] = None,
+				stop : typing.Optional[int] = None
+			) -> np.ndarray:
+		"""Get the float values of a column in DateTime-sorted order (NaN for missing values), optionally only of the
+		sorted rows [start, stop)"""
+		assert self._df is not None and self._dt_sort_order is not None
+		return self._get_sorted_values(self._df, self._dt_sort_order, column, start, stop)
+
+	@staticmethod
+	def _get_sorted_values(
+				df : pd.DataFrame,
+				sort_order : np.ndarray,
+				column : str,
+				start : typing.Optional[int] = None,
+				stop : typing.Optional[int] = None
+			) -> np.ndarray:
+		values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+		return values[sort_order[start:stop]]
+
+	@staticmethod
+	def prepare_df(new_df : pd.DataFrame, dt_col : str = "DateTime") -> PreparedDataFrame:
+		"""Build the data derived from a newly loaded dataframe (fft-matrices, label categoricals, DateTime-index and
+		summary pyramid) without using a GraphData, so this can run outside of the GUI-thread (e.g. in a
+		BackgroundLoader). install_loaded_df then only adopts the result instead of rebuilding it in the GUI-thread.
+
+		NOTE: new_df is modified in place (label columns are stored as categoricals), so it should not be in use elsewhere.
+
+		Args:
+			new_df (pd.DataFrame): The loaded dataframe
+			dt_col (str, optional): The DateTime-column. Defaults to "DateTime".
+		"""
+		before = time.perf_counter()
+		fft_matrices, fft_rows = {}, {}
+		for column in df_utility.get_fft_columns(new_df):
+			GraphData._align_fft_column(new_df, column, fft_matrices, fft_rows)
+		GraphData._convert_label_categoricals(new_df)
+		dt_index = GraphData._build_dt_index(new_df, dt_col)
+		summary_pyramid = None
+		if dt_index[0] is not None:
+			summary_pyramid = GraphData._build_summary_pyramid(new_df, dt_col, dt_index[0], dt_index[2],
+				functools.partial(GraphData._get_sorted_values, new_df, dt_index[0]))
+		log.debug(f"Preparing the derived data of the loaded dataframe took: {time.perf_counter() - before}")
+		return PreparedDataFrame(new_df, dt_index, summary_pyramid, fft_matrices, fft_rows)
 
 
 	def get_col_limrange(self, col : typing.Optional[str]):
@@ -311,27 +765,57 @@ class GraphData(QtCore.QObject):
 		if self._df is None:
 			raise ValueError("No dataframe loaded, cannot set labels")
 
-		if column is not None and len(column) > 0 and self._df_selection is not None:
-			selection = list(self.df_selection)
-			self._df.loc[selection, column] = label #type: ignore
+		if column is not None and len(column) > 0:
+			self.set_lbls(column, self.selection_mask, label)
 			log.debug(f"Columns are now: {self._df.columns}")
-			self.dfChanged.emit()
+			if column in self._label_runs: #Only re-encode the runs around the selection
+				self._label_runs[column].set_rows(self._get_sorted_rows(self.selection_mask), label)
+				self._patched_label_runs.add(column)
+			self._emit_df_changed(changed_columns=[column])
 			return True
 		return False
 
+	def set_lbls(self, column : str, mask : typing.Any, label : typing.Any):
+		"""Set the labels of the rows in mask. Label columns of strings are stored as categoricals (see
+		df_utility.to_categorical_labels), which only accept labels that are already a category, so assigning a new label
+		directly (e.g. self.df.loc[mask, column] = "new") fails. This method adds the label as a new category first, and
+		can also be used from the code passed to apply_python_code (as self.set_lbls(...)).
+		NOTE: dfChanged is not emitted, apply_python_code emits it after the code has run (use set_selection_lbls to
+		label the selection and update the views).
+
+		Args:
+			column (str): The column in which the labels will be set (created if it does not exist yet)
+			mask (any): The rows to label, anything accepted by DataFrame.loc (e.g. a boolean mask or index labels)
+			label (any): The new label (can be string, int, Int64, None etc)
+		"""
+		if self._df is None:
+			raise ValueError("No dataframe loaded, cannot set labels")
+		if column not in self._df.columns or isinstance(self._df[column].dtype, pd.CategoricalDtype):
+			self._set_categorical_lbls(column, mask, label)
+		else:
+			self._df.loc[mask, column] = label #type: ignore
+
+	def _set_categorical_lbls(self, column : str, mask : typing.Any, label : typing.Any):
+		"""Set the labels of the rows in mask in a categorical (or new) column, only the codes are written"""
+		assert self._df is not None
+		if column not in self._df.columns:
+			self._df[column] = pd.Categorical.from_codes(np.full(len(self._df), -1, dtype=np.int8), categories=[])
+		label_is_missing = label is None or (pd.api.types.is_scalar(label) and pd.isna(label))
+		if not label_is_missing and label not in self._df[column].cat.categories:
+			self._df[column] = self._df[column].cat.add_categories([label])
+		self._df.loc[mask, column] = None if label_is_missing else label #type: ignore
+
 	def save_df_selection(self, save_path : str):
 		"""Save only the selected datapoints to a file"""
 		if self._df is None:
 			raise ValueError("No dataframe loaded, cannot save selection.")
-		return df_utility.save_dataframe(self._df.loc[list(self._df_selection)], save_path=save_path)
+		return df_utility.save_dataframe(self._df[self.selection_mask], save_path=save_path)
 
 	def save_df_not_hidden_only(self, save_path : str):
 		"""Save all non-hidden datapoints to a file (is different from view-only save)"""
 		if self._df is None:
 			raise ValueError("No dataframe loaded, cannot save dataframe.")
-		all_indx = set(list(self._df.index))
-		tosave = all_indx - self.hidden_datapoints
-		return df_utility.save_dataframe(self._df.loc[list(tosave)], save_path=save_path)
+		return df_utility.save_dataframe(self._df[~self.hidden_mask], save_path=save_path)
 
 	def save_df(self, save_path : str):
 		"""Save the whole dataframe to a file"""
@@ -356,9 +840,16 @@ class GraphData(QtCore.QObject):
 				transform_dict[key] = None
 
 		try:
-			self._df[column] = self._df[column].replace(transform_dict)
+			if isinstance(self._df[column].dtype, pd.CategoricalDtype): #Only the categories have to be edited
+				self._df[column] = df_utility.rename_categorical_labels(self._df[column], transform_dict) #type: ignore
+			else:
+				self._df[column] = self._df[column].replace(transform_dict)
 		except Exception as err: #pylint: disable=broad-exception-caught
 			return False, str(err)
+		if column in self._label_runs: #Renaming only changes the categories of the runs
+			self._label_runs[column].rename(transform_dict)
+			self._patched_label_runs.add(column)
+		self._emit_df_changed(changed_columns=[column])
 
 		returnmsg = [f"{key} -> {val}" for key,val in transform_dict.items()]
 
@@ -415,17 +906,21 @@ class GraphData(QtCore.QObject):
 				if dst_column not in self._df.columns: #Create empty column if it does not yet exist
 					self._df[dst_column] = None
 
+				src_values, dst_values = self._df[src_column], self._df[dst_column]
+				if isinstance(src_values.dtype, pd.CategoricalDtype) or isinstance(dst_values.dtype, pd.CategoricalDtype):
+					src_values, dst_values = df_utility.align_categories(src_values, dst_values) #type: ignore
+
 				# merged_col = None
 				if mode == "Source priority":
-					self._df[dst_column] = self._df[src_column].fillna(self._df[dst_column])
+					self._df[dst_column] = src_values.fillna(dst_values)
 				elif mode == "Destination priority":
-					self._df[dst_column] = self._df[dst_column].fillna(self._df[src_column])
+					self._df[dst_column] = dst_values.fillna(src_values)
 				else:
 					raise NotImplementedError(f"Could not merge columns, as merging mode {mode} is not implemented")
 
 			if not preserve_source:
 				self._df.drop(src_column, axis=1, inplace=True) #Remove src column if so desired
-				self.dfChanged.emit() #TODO: change this to columnschanged? Not everything needs to be updates
+				self._emit_df_changed(changed_columns=[src_column, dst_column]) #TODO: change this to columnschanged?
 				# if src_column in self.plot_settings.plotted_labels_list:
 				# 	self.plot_settings.plotted_labels_list.remove(src_column) #Remove src column from plotlist if it is there
 
@@ -436,7 +931,7 @@ class GraphData(QtCore.QObject):
 			log.error(traceback.format_exc(), err)
 			return False, str(err)
 
-		self.dfChanged.emit()
+		self._emit_df_changed(changed_columns=[src_column, dst_column])
 		return True, f"Merged columns {src_column} into {dst_column} succesfully (using {mode}-mode)"
 
 
@@ -469,49 +964,81 @@ class GraphData(QtCore.QObject):
 		return True
 
 
-	def load_from_file(self, file_source : str):
+	def load_from_file(self,
+				file_source : str,
+				columns : typing.Optional[typing.Iterable[str]] = None,
+				datetime_range : typing.Optional[typing.Tuple[typing.Any, typing.Any]] = None
+			):
 		"""Overwrites all existing loaded data and attempts to load from specified file, if succesful, new file path is
 		also set
 
+		Args:
+			file_source (str): The file to load
+			columns (typing.Iterable[str] | None, optional): Only load these columns (the datetime column is always
+				loaded). Defaults to None (all columns).
+			datetime_range (typing.Tuple[typing.Any, typing.Any] | None, optional): Only load the rows within this
+				(left, right) datetime range. Defaults to None (all rows).
+
 		Raises:
-			Exception: General exception if compatibility error occurs (validate_df fails)
-		Returbn
+			ValueError: If loading fails or a compatibility error occurs (validate_df fails)
 
 		"""
 		log.info(f"Reloading current database from file: {file_source}")
 		if file_source: #if path has been specified
-			success, msg, new_df = df_utility.load_dataframe_using_file_extension(file_source=file_source)
+			success, msg, new_df = df_utility.load_dataframe_using_file_extension(
+				file_source=file_source, columns=columns, datetime_range=datetime_range, datetime_column=self._dt_col)
 			# new_df = pd.read_pickle(file_source)
 
 			if not success:
 				raise ValueError(msg)
-			elif not self.validate_df(new_df, inplace_try_fix=True) or new_df is None:
-				raise ValueError("Dataframe compatibility error - returning...")
-
-			self._df = new_df
+			self.install_loaded_df(new_df, file_source) #type: ignore
+		else:
+			log.info("File not specified... keeping original dataframe")
 
-			log.info(f"Succesfully (re)loaded database from file - df size: {len(new_df)}, columns: {new_df.columns}")
-			self._df_selection = set([]) #Reset selection
-			self._file_source = file_source
-			self.fileSourceChanged.emit(self.file_source)
-			# self.df_selection = np.array([i for i in range(int(len(new_df) * 0.5))])
-			# self._df.set_index(self._dt_col) #Added 20220424 --> set datetime as index
+	def install_loaded_df(self, new_df : typing.Union[pd.DataFrame, PreparedDataFrame], file_source : str):
+		"""Overwrites all existing data with a dataframe that was loaded from file (e.g. in a background thread, see
+		background_loader.BackgroundLoader), resets the selection and sets the new file path. Must be called from the
+		GUI-thread, dfChanged is emitted once the new dataframe is in place.
 
-			#TODO: safe to add this assertionerror here?
-		# except (AttributeError, ImportError, ModuleNotFoundError, TypeError, FileNotFoundError, AssertionError) as err:
+		If a PreparedDataFrame is passed (see prepare_df), its derived data is adopted as-is, else the derived data is
+		built in the GUI-thread (on dfChanged), which blocks the UI for large dataframes.
 
+		Args:
+			new_df (pd.DataFrame | PreparedDataFrame): The loaded (and optionally prepared) dataframe
+			file_source (str): The file the dataframe was loaded from
 
-			# self.update_config_using_df()
-		else:
-			log.info("File not specified... keeping original dataframe")
-			return
-		self.dfChanged.emit()
+		Raises:
+			ValueError: If the dataframe is not compatible (validate_df fails)
+		"""
+		prepared = new_df if isinstance(new_df, PreparedDataFrame) else None
+		if prepared is not None:
+			new_df = prepared.df
+		if new_df is None or not self.validate_df(new_df, inplace_try_fix=True): #type: ignore
+			raise ValueError("Dataframe compatibility error - returning...")
+
+		self._df = new_df #type: ignore
+		if prepared is not None:
+			self._dt_sort_order, self._dt_sort_inverse, self._dt_sorted_times, self._dt_sort_step = prepared.dt_index
+			self._summary_pyramid = prepared.summary_pyramid
+			self._fft_matrices, self._fft_rows = prepared.fft_matrices, prepared.fft_rows
+			self._stale_fft_columns.clear()
+			self._label_runs.clear()
+			self._patched_label_runs.clear()
+
+		log.info(f"Succesfully (re)loaded database from file - df size: {len(new_df)}, columns: {new_df.columns}")
+		self._align_masks()
+		self._selection_mask[:] = False #Reset selection
+		self._file_source = file_source
+		self.fileSourceChanged.emit(self.file_source)
+		self._emit_df_changed(None if prepared is None else []) #Prepared derived data is already up to date
 
 	# def append_existing_df(self, append_df : pd.DataFrame):
 
 	def apply_python_code(self, code : str, force_update_afterwards : bool = True):
 		"""Executes the passed code using Exec (note: this function is not very safe).
-			Makes it possible to create/execute dataset processing techniques on-the-fly
+			Makes it possible to create/execute dataset processing techniques on-the-fly.
+			NOTE: label columns of strings are stored as categoricals, a new label can not be assigned directly to
+			a categorical column, use self.set_lbls(column, mask, label) (or add it using .cat.add_categories first).
 
 		Args:
 			code (str): The code to be executed using exec.
@@ -567,7 +1094,8 @@ class GraphData(QtCore.QObject):
 				axis=0, subset=merged_df.columns.difference([self._dt_col]), how="all", inplace=True
 			) #Drop columns that are completely empty
 			self._df = merged_df
-			self._df_selection = set([]) #Reset selection
+			self._align_masks()
+			self._selection_mask[:] = False #Reset selection
 		else:
 			self._df = new_df #Copy?
 		self.dfChanged.emit() #Broadcast
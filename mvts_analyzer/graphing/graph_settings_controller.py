@@ -3,8 +3,11 @@ Manages linking the view to the model and vice versa.
 This enables the use of multiple views with the same model.
 """
 
+import datetime
+import functools
 import io
 import logging
+import os
 import typing
 
 import matplotlib
@@ -13,10 +16,12 @@ import numpy as np
 import pandas as pd
 from PySide6 import QtCore, QtGui, QtWidgets
 
-from mvts_analyzer.graphing.graph_data import GraphData
+from mvts_analyzer.graphing.background_loader import BackgroundLoader
+from mvts_analyzer.graphing.graph_data import GraphData, PreparedDataFrame
 from mvts_analyzer.graphing.graph_settings_model import GraphSettingsModel
 from mvts_analyzer.graphing.graph_settings_view import GraphSettingsView
-from mvts_analyzer.graphing.plotter.plot_wrapper import QPlotter
+from mvts_analyzer.graphing.plotter.plot_backends import create_plotter
+from mvts_analyzer.graphing.plotter.plotter_base import PlotterBase
 from mvts_analyzer.utility import df_utility, gui_utility
 from mvts_analyzer.widgets.datastructures import LimitedRange
 from mvts_analyzer.windows.load_type_selection_window import (
@@ -52,7 +57,7 @@ class GraphSettingsViewWindow(QtWidgets.QMainWindow):
 
 		if deleteOnClose:
 			self.setAttribute(QtCore.Qt.WidgetAttribute.WA_DeleteOnClose) #Prevent plot-connections-calls after del
-		self.plotter = QPlotter(self.graph_data_model, self.graph_settings_model)
+		self.plotter = create_plotter(self.graph_data_model, self.graph_settings_model)
 		self.graph_view = GraphSettingsView(self.plotter) # Create View (using created plotter)
 		self.graph_controller = GraphSettingsController(
 			self.graph_data_model, self.graph_settings_model, self.graph_view, self.plotter
@@ -71,7 +76,7 @@ class GraphSettingsController():
 			data_model: GraphData,
 			model : GraphSettingsModel,
 			view : GraphSettingsView,
-			plotter : QPlotter,
+			plotter : PlotterBase,
 			 *args,
 			**kwargs
 		):
@@ -85,6 +90,8 @@ class GraphSettingsController():
 		self.view = view
 
 		self.labeler_window_view = self.view.plot_settings.labeler_window_view
+		self._background_loader : typing.Optional[BackgroundLoader] = None #The currently running file-loader
+		self._load_progress_dialog : typing.Optional[QtWidgets.QProgressDialog] = None
 
 		self.view.plot_settings.inner_settings.fft_brightness_slider.set_all(limited_value=self.model.fft_brightness_limval)
 		# self.view.plot_settings.inner_settings.plot_domain_sliders.set_all(limited_range=self.model.plot_domain_limrange)
@@ -122,6 +129,12 @@ class GraphSettingsController():
 		sm.plotColorMethodChanged.connect(self.process_model_plotColorMethod)
 		sm.selectionGapFillMsChanged.connect(self.process_model_selectionGapFillMs)
 
+		#============ Model -> plotter ==========
+		#Only re-map the colors of the drawn fft-data, the (cached) data itself does not change
+		sm.fftBrightnessChanged.connect(lambda *_ : self.plotter.restyle_fft())
+		sm.fftColorMapChanged.connect(lambda *_ : self.plotter.restyle_fft())
+		sm.fftTransparencyChanged.connect(lambda *_ : self.plotter.restyle_fft())
+
 		#============ Data -> view callbacks ==========
 
 		# self.data_model.fileSourceChanged.connect(self.process_model_file_source)
@@ -137,6 +150,7 @@ class GraphSettingsController():
 		sv_inner.fftBrightnessChanged.connect(self.process_view_fftBrightness)
 		sv_inner.fftLineRangeChanged.connect(self.process_view_fftLineRange)
 		sv_inner.fftColorMapChanged.connect(self.process_view_fftColorMap)
+		sv_inner.fftTransparencyChanged.connect(self.process_view_fftTransparency)
 		sv_inner.fontSizeChanged.connect(self.process_view_fontSize)
 		sv_inner.labelerToggleChanged.connect(self.process_view_labelerToggle)
 		sv_inner.normalizationToggleChanged.connect(self.process_view_normalizationToggle)
@@ -187,7 +201,7 @@ class GraphSettingsController():
 
 			if self.data_model.set_selection_lbls(column, label):
 				log.info(f"Succesfully set column: {column} to label: {label} of current selection "
-	     			f"(consisting of {len(self.data_model._df_selection)} entries)")
+	     			f"(consisting of {self.data_model.selection_count} entries)")
 				self.process_labeler_column_option_changed(
 					self.labeler_window_view.col_dropdown.currentText()) #Refresh current selection
 				return
@@ -276,6 +290,15 @@ class GraphSettingsController():
 		"""
 		self.model.fft_color_map = new_map
 
+	def process_view_fftTransparency(self, new_val : float):
+		"""
+		View --> Model
+		Fft transparency changed
+		Args:
+			new_val (float): The new transparency (alpha) of the fft-data
+		"""
+		self.model.fft_transparency = new_val
+
 	def process_view_labelerToggle(self, new_val : bool):
 		"""
 		View --> Model
@@ -408,7 +431,7 @@ class GraphSettingsController():
 	def copy_plot_to_clipboard(self):
 		"""Copy the current plot figure to the clipboard"""
 		with io.BytesIO() as buffer:
-			self.plotter.canvas.figure.savefig(buffer)
+			self.plotter.save_figure(buffer)
 			QtWidgets.QApplication.clipboard().setImage(QtGui.QImage.fromData(buffer.getvalue()))
 			log.debug("Succesfully copied current canvas to clipboard")
 
@@ -458,28 +481,144 @@ class GraphSettingsController():
 		log.info("Now trying to append a df from file...")
 
 		fname = QtWidgets.QFileDialog.getOpenFileName(None, 'Open file', #type: ignore
-				self.data_model.file_source, "Pickled dataframes/Excel Sheet/CSV (*.pkl;*.xlsx;*.csv)")
-		success, msg, df = df_utility.load_dataframe_using_file_extension(fname[0])
-		if not success or df is None:
-			gui_utility.create_qt_warningbox(msg, "Error")
+				self.data_model.file_source, df_utility.LOAD_FILE_DIALOG_FILTER)
+		if len(fname[0]) == 0 or fname[0] is None:
 			return
-
-		self.append_df_popup(df=df)
-
-
+		self._load_in_background(fname[0], lambda df, _: self.append_df_popup(df=df))
 
 
 	@gui_utility.catch_show_exception_in_popup_decorator(custom_error_msg="<b>Could not load dataframe</b>")
 	def load_df_popup(self):
 		"""
-		Show a popup to load a dataframe from file
+		Show a popup to load a dataframe from file, the file is loaded in the background, after which it replaces
+		the current data.
 		"""
 		fname = QtWidgets.QFileDialog.getOpenFileName(None, 'Open file', #type: ignore
-				self.data_model.file_source, "Pickled dataframes/Excel Sheet/CSV (*.pkl;*.xlsx;*.csv)")
+				self.data_model.file_source, df_utility.LOAD_FILE_DIALOG_FILTER)
 		if len(fname[0]) == 0 or fname[0] is None:
 			#If nothing selected -> just return
 			return
-		self.data_model.load_from_file(fname[0])
+		columns, datetime_range = self._ask_load_projection(fname[0])
+		self._load_in_background(fname[0], self._install_loaded_df,
+			prepare=functools.partial(GraphData.prepare_df, dt_col=self.data_model.dt_col), #Derived data in worker
+			columns=columns, datetime_range=datetime_range, datetime_column=self.data_model.dt_col)
+
+	@gui_utility.catch_show_exception_in_popup_decorator(custom_error_msg="<b>Could not load dataframe</b>")
+	def _install_loaded_df(self, new_df : typing.Union[pd.DataFrame, PreparedDataFrame], file_source : str):
+		self.data_model.install_loaded_df(new_df, file_source)
+
+	def _load_in_background(self,
+				file_source : str,
+				on_loaded : typing.Callable[[typing.Any, str], typing.Any],
+				prepare : typing.Optional[typing.Callable[[pd.DataFrame], typing.Any]] = None,
+				**load_kwargs
+			):
+		"""Load a dataframe from file in a background thread while showing a (cancellable) progress dialog. When
+		loading is done, on_loaded(df, file_source) is called in the GUI-thread. If another file is still being loaded,
+		that load is cancelled first.
+
+		Args:
+			file_source (str): The file to load
+			on_loaded (typing.Callable[[typing.Any, str], typing.Any]): Called with the loaded dataframe (or the result
+				of prepare) and the file
+			prepare (typing.Callable[[pd.DataFrame], typing.Any] | None, optional): Called with the loaded dataframe in
+				the background thread (see BackgroundLoader). Defaults to None.
+			**load_kwargs: Passed on to df_utility.load_dataframe_using_file_extension
+		"""
+		if self._background_loader is not None:
+			self._background_loader.cancel()
+			self._close_load_progress_dialog()
+
+		loader = BackgroundLoader(file_source, prepare=prepare, **load_kwargs)
+		try:
+			file_size = os.path.getsize(file_source)
+		except OSError:
+			file_size = 0
+		dialog = QtWidgets.QProgressDialog(f"Loading {os.path.basename(file_source)}...", "Cancel", 0, 1000)
+		dialog.setWindowTitle("Loading data")
+		dialog.setMinimumDuration(500) #Only show for slow loads
+		dialog.setAutoClose(False)
+		dialog.setAutoReset(False)
+		dialog.setValue(0)
+		dialog.canceled.connect(loader.cancel)
+
+		def on_progress(bytes_read : int, rows_parsed : int):
+			if self._background_loader is not loader or self._load_progress_dialog is None:
+				return
+			if file_size > 0:
+				dialog.setValue(min(int(1000 * bytes_read / file_size), 999)) #Stay below max until actually done
+			dialog.setLabelText(f"Loading {os.path.basename(file_source)}...\n"
+				+ BackgroundLoader.format_progress(bytes_read, rows_parsed, file_size))
+
+		def on_done():
+			if self._background_loader is loader: #Else: already replaced by a newer load
+				self._background_loader = None
+				self._close_load_progress_dialog()
+
+		def on_finished(new_df : typing.Any):
+			if self._background_loader is not loader or loader.is_cancelled:
+				return
+			on_done()
+			on_loaded(new_df, file_source)
+
+		def on_failed(msg : str):
+			if self._background_loader is not loader:
+				return
+			on_done()
+			gui_utility.create_qt_warningbox(msg, "Could not load dataframe")
+
+		loader.signals.progress.connect(on_progress)
+		loader.signals.finished.connect(on_finished)
+		loader.signals.failed.connect(on_failed)
+		loader.signals.cancelled.connect(on_done)
+		self._background_loader = loader
+		self._load_progress_dialog = dialog
+		loader.start()
+
+	def _close_load_progress_dialog(self):
+		if self._load_progress_dialog is not None:
+			self._load_progress_dialog.canceled.disconnect() #Closing would otherwise emit canceled
+			self._load_progress_dialog.close()
+			self._load_progress_dialog.deleteLater()
+			self._load_progress_dialog = None
+
+	def _get_plotted_columns(self) -> typing.List[str]:
+		"""Returns all columns that are used in the current plot settings (plotted columns, labels, fft etc.)"""
+		columns = [
+			*(self.model.plot_list or []),
+			*(self.model.plotted_labels_list or []),
+			self.model.x_axis,
+			self.model.fft_column,
+			self.model.plot_color_column
+		]
+		return list(dict.fromkeys([col for col in columns if col is not None and col != ""])) #Unique, keep order
+
+	def _ask_load_projection(self, file_source : str) -> typing.Tuple[
+				typing.Optional[typing.List[str]], typing.Optional[typing.Tuple[typing.Any, typing.Any]]]:
+		"""For filetypes from which a subset can be read efficiently (parquet/feather), ask the user whether only the
+		currently plotted columns within the current plot domain should be loaded.
+
+		Returns:
+			typing.Tuple[list | None, tuple | None]: The columns and the (left, right) datetime range to load (None=all)
+		"""
+		if file_source.rsplit(".", 1)[-1] not in df_utility.PROJECTABLE_FILETYPES:
+			return None, None
+		plotted_columns = self._get_plotted_columns()
+		if len(self.model.plot_list or []) == 0 and len(self.model.plotted_labels_list or []) == 0:
+			return None, None
+		domain = self.model.plot_domain_limrange
+		datetime_range = None
+		if domain is not None and (domain.left_val is not None or domain.right_val is not None) \
+				and isinstance(domain.left_val or domain.right_val, (datetime.datetime, np.datetime64, pd.Timestamp)):
+			datetime_range = (domain.left_val, domain.right_val)
+		ret = QtWidgets.QMessageBox.question(None, 'Load subset?', #type: ignore
+			f"Only load the currently plotted columns ({', '.join(plotted_columns)})"
+			+ (f" between {datetime_range[0]} and {datetime_range[1]}" if datetime_range is not None else "")
+			+ "?<br>This is much faster and uses less memory for large files.",
+			QtWidgets.QMessageBox.StandardButton.Yes, QtWidgets.QMessageBox.StandardButton.No)
+		if ret == QtWidgets.QMessageBox.StandardButton.Yes:
+			return plotted_columns, datetime_range
+		return None, None
 
 
 	def _save_df_base(self, fname : str, save_function : typing.Callable):
@@ -511,7 +650,7 @@ class GraphSettingsController():
 			log.warning("Could not set current path to save to, returning without saving...")
 			return
 		fname, _ = QtWidgets.QFileDialog.getSaveFileName(None, 'Save Location', #type: ignore
-			curpath, "Pickled dataframe (*.pkl) ;; Excel sheet (*.xlsx);; Comma-Separated-Values (*.csv)")
+			curpath, df_utility.SAVE_FILE_DIALOG_FILTER)
 		self._save_df_base(fname=fname, save_function=self.data_model.save_df)
 
 	def save_df_selection_only_popup(self):
@@ -523,13 +662,12 @@ class GraphSettingsController():
 		percentage = 0
 		dflen = len(self.data_model._df)
 		if dflen != 0:
-			percentage = int((len(self.data_model._df_selection)) / dflen * 100)
+			percentage = int(self.data_model.selection_count / dflen * 100)
 
 		fname, _ = QtWidgets.QFileDialog.getSaveFileName(None, 'Save selection', #type: ignore
 			self.data_model.file_source.rsplit("\\", 1)[0] + \
 				"\\"+ self.data_model.file_source.rsplit("\\")[-1].rsplit(".", 1)[0] + \
-				f" - Subselection ({percentage}%).pkl", "Pickled dataframe (*.pkl) ;; Excel sheet (*.xlsx);; "
-				"Comma-Separated-Values (*.csv)")
+				f" - Subselection ({percentage}%).pkl", df_utility.SAVE_FILE_DIALOG_FILTER)
 		self._save_df_base(fname=fname, save_function=self.data_model.save_df_selection)
 
 	def save_df_not_hidden_only_popup(self):
@@ -542,23 +680,23 @@ class GraphSettingsController():
 		percentage = 0
 		dflen = len(self.data_model._df)
 		if dflen != 0:
-			percentage = int((dflen - len(self.data_model.hidden_datapoints)) / dflen * 100)
+			percentage = int((dflen - self.data_model.hidden_count) / dflen * 100)
 		fname, _ = QtWidgets.QFileDialog.getSaveFileName(None, 'Save Not-Hidden Datapoints Only', #type: ignore
 			self.data_model.file_source.rsplit("\\", 1)[0] + "\\"
 				+ self.data_model.file_source.rsplit("\\")[-1].rsplit(".", 1)[0]
-				+ f" - Subselection ({percentage}%).pkl", "Pickled dataframe (*.pkl) ;; "
-				+ "Excel sheet (*.xlsx);; Comma-Separated-Values (*.csv)")
+				+ f" - Subselection ({percentage}%).pkl", df_utility.SAVE_FILE_DIALOG_FILTER)
 		self._save_df_base(fname=fname, save_function=self.data_model.save_df_not_hidden_only)
 
 	def plotter_replot(self):
-		"""Calls replot on the plotter"""
-		print("Controller received signal to replot, passing on to plot_wrapper")
-		self.plotter.replot()#self.data_model, self.model)
+		"""Schedules a replot on the plotter, multiple requests within the same event-loop iteration (e.g. an action
+		connected to both set_xlim_to_view and plotter_replot) result in a single replot"""
+		log.debug("Controller received signal to replot, passing on to plot_wrapper")
+		self.plotter.schedule_replot()
 
 	def set_xlim_to_view(self):
 		"""Set the xlim to the current view"""
-		log.info(f"Setting xlim to current view: {self.plotter.canvas.ax_dict['main'].get_xlim()}")
-		cur_xlim = self.plotter.canvas.ax_dict['main'].get_xlim()
+		cur_xlim = self.plotter.get_view_xlim()
+		log.info(f"Setting xlim to current view: {cur_xlim}")
 
 		cur_type = self.data_model.get_column_type(self.model.x_axis)
 
@@ -581,7 +719,7 @@ class GraphSettingsController():
 		"""
 		Sets the fft line range to the current view (vertical)
 		"""
-		cur_ylim = self.plotter.canvas.ax_dict['main'].get_ylim()
+		cur_ylim = self.plotter.get_view_ylim()
 		bottom, top = cur_ylim
 		bottom = max(0.0, bottom) #Make sure bounded by 0/1
 		top = min(1.0, top)
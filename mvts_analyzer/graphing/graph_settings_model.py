@@ -149,6 +149,7 @@ class GraphSettingsModel(GraphSettingsModelData, QtCore.QObject):
 	fftLineRangeChanged = QtCore.Signal(object) #When fftLineRange (Which lines of fft should be plotted) changes
 	fftBrightnessChanged = QtCore.Signal(object)
 	fftQualityChanged = QtCore.Signal(float)
+	fftTransparencyChanged = QtCore.Signal(float)
 
 	fftColorMapChanged = QtCore.Signal(object)
 
@@ -248,6 +249,13 @@ class GraphSettingsModel(GraphSettingsModelData, QtCore.QObject):
 	def fft_transparency(self) -> float:
 		return self._fft_transparency
 
+	@fft_transparency.setter
+	def fft_transparency(self, new_transparency : float):
+		if new_transparency != self._fft_transparency:
+			self._fft_transparency = new_transparency
+			self.fftTransparencyChanged.emit(self._fft_transparency)
+			self.changed.emit(self)
+
 
 	@property
 	def fft_line_range_left(self) -> int:
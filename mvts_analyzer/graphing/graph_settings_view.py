@@ -7,7 +7,7 @@ import logging
 
 from PySide6 import QtCore, QtGui, QtWidgets
 
-from mvts_analyzer.graphing.plotter.plot_wrapper import QPlotter
+from mvts_analyzer.graphing.plotter.plotter_base import PlotterBase
 from mvts_analyzer.widgets import (combobox_list, datetime_range,
                                    range_slider_with_box,
                                    range_sliders_with_boxes, variable_range)
@@ -306,7 +306,7 @@ class GraphSettingsView(QtWidgets.QWidget):
 	"""
 	xlimChangedSignal = QtCore.Signal()
 	# def __init__(self, plot_data, matplot_plotter, *args, **kwargs):
-	def __init__(self, plotter : QPlotter, *args, **kwargs):
+	def __init__(self, plotter : PlotterBase, *args, **kwargs):
 		super(GraphSettingsView, self).__init__(*args, **kwargs)
 		log.debug("initializing GraphSettings view")
 
@@ -0,0 +1,154 @@
+"""
+Implements blitting for the interactive parts of a figure-canvas.
+
+Redrawing the whole figure (spectrogram, label tracks, axes decorations and all plotted series) on every mouse move or
+selection change is slow. Instead, the artists that change during interaction are marked as animated: a full draw
+renders the figure without them, the result is cached as the background, after which the animated artists are drawn
+on top. Updating the animated artists then only restores the cached background and redraws the animated artists.
+
+Three layers are used:
+	- The background: everything that is not animated
+	- The animated artists (e.g. the plotted series, whose colors change with the selection)
+	- Overlays (e.g. the lasso), drawn on top of the cached frame (background + animated artists) without redrawing the
+	animated artists
+
+During an interaction that only changes some artists (e.g. panning a single twin-axis), the other animated artists
+are temporarily made part of the background (see begin_interaction), so the cost of a frame does not depend on the
+amount of series and points in the rest of the figure.
+"""
+import logging
+import typing
+
+import matplotlib.artist
+import matplotlib.axes
+import matplotlib.backend_bases
+
+log = logging.getLogger(__name__)
+
+
+class BlitManager():
+	"""
+	Keeps the animated artists of a canvas and the cached background/frame used to redraw them. The animated artists
+	are also drawn after every full draw, so they are never missing from the figure. When saving the figure, matplotlib
+	draws the animated artists itself.
+	"""
+	def __init__(self, canvas : matplotlib.backend_bases.FigureCanvasBase):
+		self.canvas = canvas
+		self._artists : typing.List[matplotlib.artist.Artist] = [] #Drawn in this order, on top of the background
+		self._interaction : typing.Optional[typing.List[matplotlib.artist.Artist]] = None #See begin_interaction
+		self._background = None #Region of the figure without the animated artists
+		self._frame = None #Region of the figure with the animated artists (but without the overlays)
+		self.canvas.mpl_connect("draw_event", self._on_draw)
+
+	@property
+	def artists(self) -> typing.List[matplotlib.artist.Artist]:
+		"""The animated artists"""
+		return list(self._artists)
+
+	@property
+	def frame(self):
+		"""The cached region of the figure including the animated artists (None if there is none)"""
+		return self._frame
+
+	def add_artist(self, artist : matplotlib.artist.Artist):
+		"""Animate an artist, it is no longer part of the background and is redrawn on every update"""
+		if artist.figure is not self.canvas.figure:
+			raise ValueError("Can only animate artists of the figure of this canvas")
+		if artist not in self._artists:
+			artist.set_animated(True)
+			self._artists.append(artist)
+			self.invalidate()
+
+	def remove_artist(self, artist : matplotlib.artist.Artist):
+		"""Stop animating an artist, it is part of the background again after the next full draw"""
+		if artist in self._artists:
+			self._artists.remove(artist)
+			artist.set_animated(False)
+			self.invalidate()
+
+	def clear(self):
+		"""Stop animating all artists (e.g. when the axes are remade)"""
+		for artist in self._artists:
+			artist.set_animated(False)
+		self._artists = []
+		self._interaction = None
+		self.invalidate()
+
+	def invalidate(self):
+		"""Discard the cached background, the next update results in a full draw"""
+		self._background, self._frame = None, None
+
+	def begin_interaction(self, artists : typing.Iterable[matplotlib.artist.Artist]):
+		"""Only animate the passed artists until end_interaction is called, the other animated artists become part of
+		the background, so a frame only redraws the passed artists. Animated artists in the passed axes stay animated.
+		This results in a single full draw to create the new background."""
+		self.end_interaction(redraw=False)
+		artists = list(artists)
+		axes = {artist for artist in artists if isinstance(artist, matplotlib.axes.Axes)}
+		self._interaction = [artist for artist in self._artists if artist.axes in axes] + artists
+		for artist in self._artists:
+			artist.set_animated(artist in self._interaction)
+		for artist in artists:
+			artist.set_animated(True)
+		self.invalidate()
+		self.canvas.draw()
+
+	def end_interaction(self, redraw : bool = True):
+		"""Undo begin_interaction"""
+		if self._interaction is None:
+			return
+		for artist in self._interaction:
+			artist.set_animated(False)
+		for artist in self._artists:
+			artist.set_animated(True)
+		self._interaction = None
+		self.invalidate()
+		if redraw:
+			self.canvas.draw_idle()
+
+	def update(self):
+		"""Redraw the animated artists on top of the cached background, if there is no background (yet), a full draw
+		is requested instead. Changes to the rest of the figure should request a full draw (e.g. using draw_idle), which
+		also replaces the cached background."""
+		if self._background is None:
+			self.canvas.draw_idle()
+			return
+		self.canvas.restore_region(self._background)
+		self._draw_animated(self.canvas.get_renderer())
+		self._frame = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+		self.canvas.blit(self.canvas.figure.bbox)
+
+	def draw_overlay(self, artists : typing.Iterable[matplotlib.artist.Artist], bbox = None) -> bool:
+		"""Draw (animated) overlay-artists on top of the cached frame, without redrawing the animated artists.
+
+		Args:
+			artists (typing.Iterable[matplotlib.artist.Artist]): The artists to draw (in zorder)
+			bbox (matplotlib.transforms.BboxBase, optional): The region to blit. Defaults to None (whole figure).
+
+		Returns:
+			bool: Whether the overlay was drawn, False if there is no frame (yet), a full draw should then be done
+		"""
+		if self._frame is None:
+			return False
+		self.canvas.restore_region(self._frame)
+		for artist in sorted(artists, key=lambda artist: artist.get_zorder()):
+			if artist.get_visible():
+				self.canvas.figure.draw_artist(artist)
+		self.canvas.blit(self.canvas.figure.bbox if bbox is None else bbox)
+		return True
+
+	def _get_animated(self) -> typing.List[matplotlib.artist.Artist]:
+		return self._artists if self._interaction is None else self._interaction
+
+	def _draw_animated(self, renderer : matplotlib.backend_bases.RendererBase):
+		for artist in self._get_animated():
+			if artist.figure is self.canvas.figure and artist.get_visible(): #Might have been removed
+				artist.draw(renderer)
+
+	def _on_draw(self, event : matplotlib.backend_bases.DrawEvent):
+		if event.canvas is not self.canvas or self.canvas.is_saving(): #E.g. savefig with a different dpi/backend
+			self.invalidate() #Animated artists are already drawn by the axes while saving
+			return
+		self._background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+		self._draw_animated(event.renderer)
+		self._frame = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
@@ -4,7 +4,7 @@ When the plot is created, we pass the axes, and the pandas indexes to this class
 indexes are emitted.
 """
 import logging
-import time
+import typing
 
 import matplotlib.axes
 import matplotlib.backend_bases
@@ -15,8 +15,62 @@ import matplotlib.widgets
 import numpy as np
 from PySide6 import QtCore, QtWidgets
 
+from mvts_analyzer.graphing.plotter.spatial_index import PointIndex
+
 log = logging.getLogger(__name__)
 
+
+class BlitManagedSelectorMixin():
+	"""
+	Mixin for matplotlib selector-widgets that draws the widget on top of the frame cached by the BlitManager of the
+	canvas (see MplCanvas.blit_manager). By default, blitting selectors redraw all animated artists of the figure (e.g.
+	all plotted series) on every mouse move and re-render the whole canvas on every draw to create their background.
+	"""
+	canvas : typing.Any
+	ax : matplotlib.axes.Axes
+	artists : typing.List[typing.Any]
+	useblit : bool
+
+	@property
+	def _blit_manager(self):
+		return getattr(self.canvas, "blit_manager", None)
+
+	def _get_animated_artists(self):
+		if self._blit_manager is None:
+			return super()._get_animated_artists() #type: ignore
+		return () #Already part of the frame of the blit manager
+
+	def update_background(self, event):
+		"""The frame of the blit manager is used as the background, only (re)draw the visible widget artists"""
+		if self._blit_manager is None:
+			return super().update_background(event) #type: ignore
+		if event is not None and (event.canvas is not self.canvas or self.canvas.is_saving()): #Saving the figure
+			return
+		if self.useblit and self.canvas.figure._get_renderer() is not None: #pylint: disable=protected-access
+			for artist in sorted(self.artists, key=lambda artist: artist.get_zorder()):
+				if artist.get_visible():
+					self.ax.draw_artist(artist)
+
+	def update(self):
+		"""Draw the widget artists on top of the frame of the blit manager (or do a full draw if there is none)"""
+		if self._blit_manager is None or not self.useblit:
+			return super().update() #type: ignore
+		if not self.ax.get_visible() or self.ax.figure._get_renderer() is None: #pylint: disable=protected-access
+			return
+		if not self._blit_manager.draw_overlay(self.artists, self.ax.bbox):
+			self.canvas.draw_idle()
+
+
+class BlitLassoSelector(BlitManagedSelectorMixin, matplotlib.widgets.LassoSelector):
+	"""LassoSelector that draws on top of the frame of the blit manager of the canvas"""
+
+class BlitRectangleSelector(BlitManagedSelectorMixin, matplotlib.widgets.RectangleSelector):
+	"""RectangleSelector that draws on top of the frame of the blit manager of the canvas"""
+
+class BlitSpanSelector(BlitManagedSelectorMixin, matplotlib.widgets.SpanSelector):
+	"""SpanSelector that draws on top of the frame of the blit manager of the canvas"""
+
+
 class CollectionSelector(QtWidgets.QWidget):
 	#Inspired from : https://matplotlib.org/stable/gallery/widgets/lasso_selector_demo_sgskip.html
 	"""
@@ -34,6 +88,7 @@ class CollectionSelector(QtWidgets.QWidget):
 				minmaxes,
 				locs):
 		super().__init__()
+		self._widgets : typing.List[matplotlib.widgets.AxesWidget] = []
 		self.reset_all(
 			ax,
 			xys,
@@ -64,46 +119,52 @@ class CollectionSelector(QtWidgets.QWidget):
 			lineplot (bool): whether the target plot is a lineplot, this means collections contains a list of Line2D
 				instead of a collection of points
 		"""
+		for widget in self._widgets: #The axis might be kept, so the previous selectors should stop handling events
+			widget.disconnect_events()
+			for artist in widget.artists:
+				if artist.axes is not None:
+					artist.remove()
+		self._widgets = []
+
 		self._ax = selector_ax
 		self._canvas = None
 		if selector_ax is not None:
 			self._canvas = selector_ax.figure.canvas
-			self._lmbselector = matplotlib.widgets.LassoSelector(
+			self._lmbselector = BlitLassoSelector(
 				selector_ax,
 				onselect=self.on_select_lasso,
+				useblit=True,
 				button=matplotlib.backend_bases.MouseButton.LEFT,
 			)
-			self._mmbselector = matplotlib.widgets.RectangleSelector(
+			self._mmbselector = BlitRectangleSelector(
 				selector_ax,
 				onselect=self.on_select_rect,
+				useblit=True,
 				button=matplotlib.backend_bases.MouseButton.MIDDLE,
 			)
-			self._rmbselector = matplotlib.widgets.SpanSelector(
+			self._rmbselector = BlitSpanSelector(
 				selector_ax, onselect=self.on_select_span,
 				direction="horizontal",
 				useblit=True,
 				props=dict(alpha=0.2, facecolor='red'),
 				button=matplotlib.backend_bases.MouseButton.RIGHT,
 			)
+			self._widgets = [self._lmbselector, self._mmbselector, self._rmbselector]
 
 
-		self._locs = locs #The pandas idx's
-
-		before = time.perf_counter()
-		self._loc_to_indxs = [] #Dictionary to convert loc values back to indexes (should save time when converting)
-		for loc in locs:
-			cur_loc_to_indx = {}
-			for i, cur_loc in enumerate(loc):
-				cur_loc_to_indx[cur_loc] = i
-			self._loc_to_indxs.append(cur_loc_to_indx)
-
-		log.debug(f"Creating loc->index dictionary took: {time.perf_counter() - before}")
+		self._locs = locs #The pandas idx's, selected points are emitted as the locs at their indexes
 		self._minmaxes = minmaxes
 		# self._selections = [] #2d array with current selected ids in each ax
 		self._selection_locs = [] #unique list of all selected ids
 		self._selection_locs_set = None
 
 		self._xys = xys
+		self._point_indexes = [PointIndex(xy_coord) for xy_coord in xys] #Spatial indexes are built on first query
+
+	def set_minmaxes(self, minmaxes : typing.List[typing.Tuple[float, float]]):
+		"""Set the y-limits of each axis (e.g. after an axis was panned), used to map normalized selections back to the
+		y-values of each axis"""
+		self._minmaxes = minmaxes
 
 
 	def on_select_rect(self,
@@ -119,14 +180,20 @@ class CollectionSelector(QtWidgets.QWidget):
 		ret:
 			None
 		"""
+		x_min, x_max = sorted((eclick.xdata, erelease.xdata))
+		y_min, y_max = sorted((eclick.ydata, erelease.ydata))
+		self.select_rect(x_min, x_max, y_min, y_max)
+
+	def select_rect(self, x_min : float, x_max : float, y_min : float, y_max : float) -> None:
+		"""Selects all points within the given rectangle, the y-values are normalized (0.0-1.0 is the y-range of each
+		axis)"""
 		pd_locs = set([])
-		for xy_coord, minmax, loc in zip(self._xys, self._minmaxes, self._locs):
-			ind = np.nonzero(
-				(xy_coord[:, 0] >= eclick.xdata)
-				& (xy_coord[:, 0] <= erelease.xdata)
-				& (xy_coord[:, 1] >= (eclick.ydata * (minmax[1] - minmax[0]) + minmax[0]))
-				& (xy_coord[:, 1] <= (erelease.ydata * (minmax[1] - minmax[0]) + minmax[0]))
-				)[0]
+		for point_index, minmax, loc in zip(self._point_indexes, self._minmaxes, self._locs):
+			ind = point_index.query_bbox(
+				x_min, x_max,
+				y_min * (minmax[1] - minmax[0]) + minmax[0],
+				y_max * (minmax[1] - minmax[0]) + minmax[0]
+			)
 			pd_locs.update(list(loc[ind]))
 
 		log.debug(f"Currently selected locs: {list(pd_locs)[:min(len(pd_locs), 3)]}... etc (len={len(pd_locs)})")
@@ -141,8 +208,8 @@ class CollectionSelector(QtWidgets.QWidget):
 			maxval (float): The maximum value
 		"""
 		pd_locs = set([])
-		for xy_coord, minmax, loc in zip(self._xys, self._minmaxes, self._locs): #pylint: disable=unused-variable
-			ind = np.nonzero((xy_coord[:, 0] >= minval) & (xy_coord[:, 0] <= maxval))[0]
+		for point_index, loc in zip(self._point_indexes, self._locs):
+			ind = point_index.query_x_range(minval, maxval)
 			pd_locs.update(list(loc[ind]))
 
 		log.debug(f"Currently selected locs: {list(pd_locs)[:min(len(pd_locs), 3)]}... etc (len={len(pd_locs)})")
@@ -158,10 +225,10 @@ class CollectionSelector(QtWidgets.QWidget):
 
 		pd_locs = set([])
 		# ind_locs = set([])
-		for xy_coord, minmax, loc in zip(self._xys, self._minmaxes, self._locs):
+		for point_index, minmax, loc in zip(self._point_indexes, self._minmaxes, self._locs):
 			unnormalized_verts = [(vert[0], vert[1] * (minmax[1] - minmax[0]) + minmax[0]) for vert in verts]
 			path = matplotlib.path.Path(unnormalized_verts)
-			ind = np.nonzero(path.contains_points(xy_coord))[0]
+			ind = point_index.query_path(path) #Only tests the points within the bounding box of the lasso
 			pd_locs.update(list(loc[ind]))
 			# ind_locs.update(list(ind))
 
@@ -0,0 +1,141 @@
+"""
+Hover lookup for label tracks (the colorbars of label columns).
+
+A track is stored as the edges (in matplotlib date-numbers) and the category code of each drawn run, so looking up the
+label under the cursor is a binary search in the edges (O(log n) in the amount of runs) instead of a scan over the
+whole label column. The service shows the label in the toolbar (using format_coord) and in an annotation on the
+track. The annotation is placed in the center of the hovered run and the canvas is only redrawn when the hovered run
+changes, so moving the mouse within a run does not trigger redraws.
+"""
+import logging
+import typing
+
+import matplotlib.axes
+import matplotlib.backend_bases
+import matplotlib.dates
+import matplotlib.text
+import numpy as np
+
+from mvts_analyzer.utility import label_runs
+
+log = logging.getLogger(__name__)
+
+
+class LabelTrack(typing.NamedTuple):
+	"""The drawn runs of a label track, run i spans edges[i] until edges[i + 1]"""
+	edges : np.ndarray #(float64) matplotlib date-numbers
+	codes : np.ndarray #The category code of each run (label_runs.MISSING_CODE for no label)
+	categories : typing.List[typing.Any] #The label of each code
+	annotation : typing.Optional[matplotlib.text.Annotation]
+
+	def find_run(self, x_coord : float) -> int:
+		"""Get the run at (or, outside the track, nearest to) x_coord, -1 if the track has no runs"""
+		if len(self.codes) == 0:
+			return -1
+		run = int(np.searchsorted(self.edges, x_coord, side="right")) - 1
+		return min(max(run, 0), len(self.codes) - 1)
+
+	def get_label(self, run : int) -> typing.Any:
+		"""Get the label of a run (None for no label)"""
+		code = self.codes[run]
+		return None if code == label_runs.MISSING_CODE else self.categories[code]
+
+
+class LabelHoverService():
+	"""
+	Keeps the label tracks of a canvas and shows the label under the cursor. The mouse-events are connected once, the
+	tracks are replaced on every replot (see clear and add_track).
+	"""
+	def __init__(self, canvas : matplotlib.backend_bases.FigureCanvasBase):
+		self.canvas = canvas
+		self.enabled = True #Whether to show the annotation when hovering over a track
+		self._tracks : typing.Dict[matplotlib.axes.Axes, LabelTrack] = {}
+		self._hovered : typing.Optional[typing.Tuple[matplotlib.axes.Axes, int]] = None #(axis, run) of the annotation
+		self.canvas.mpl_connect("motion_notify_event", self._on_motion)
+		self.canvas.mpl_connect("axes_leave_event", self._on_axes_leave)
+
+	def clear(self):
+		"""Remove all tracks (e.g. before the axes are recreated)"""
+		self._tracks.clear()
+		self._hovered = None
+
+	def add_track(self,
+				ax : matplotlib.axes.Axes, #pylint: disable=invalid-name
+				edges : np.ndarray,
+				codes : np.ndarray,
+				categories : typing.List[typing.Any],
+				annotation : typing.Optional[matplotlib.text.Annotation] = None
+			):
+		"""Add the track drawn on an axis, the format_coord of the axis is replaced to show the hovered label
+
+		Args:
+			ax (matplotlib.axes.Axes): The axis of the track
+			edges (np.ndarray): The edges of the runs (datetimes), run i spans edges[i] until edges[i + 1]
+			codes (np.ndarray): The category code of each run
+			categories (typing.List[typing.Any]): The label of each code
+			annotation (matplotlib.text.Annotation | None, optional): Annotation used to show the hovered label.
+				Defaults to None (only show the label in the toolbar).
+		"""
+		if annotation is not None:
+			annotation.set_visible(False)
+		track = LabelTrack(
+			edges=np.asarray(matplotlib.dates.date2num(edges), dtype=np.float64) if len(edges) > 0 \
+				else np.zeros(0, dtype=np.float64),
+			codes=codes,
+			categories=categories,
+			annotation=annotation
+		)
+		self._tracks[ax] = track
+		ax.format_coord = lambda x, y, track=track: self.format_coord(track, x, y) #type: ignore
+
+	def get_label(self, ax : matplotlib.axes.Axes, x_coord : float) -> typing.Any: #pylint: disable=invalid-name
+		"""Get the label at x_coord (date-number) of the track on an axis, None if there is no (label at this) track"""
+		track = self._tracks.get(ax, None)
+		if track is None:
+			return None
+		run = track.find_run(x_coord)
+		return None if run < 0 else track.get_label(run)
+
+	@staticmethod
+	def format_coord(track : LabelTrack, x_coord : float, y_coord : float) -> str: #pylint: disable=unused-argument
+		"""Toolbar-text when hovering over a track"""
+		run = track.find_run(x_coord)
+		label = None if run < 0 else track.get_label(run)
+		py_dt = matplotlib.dates.num2date(x_coord).replace(tzinfo=None)
+		return f"x={py_dt} 		class={label}"
+
+	def _on_motion(self, event : matplotlib.backend_bases.MouseEvent):
+		track = self._tracks.get(event.inaxes, None) #type: ignore
+		if not self.enabled or track is None or track.annotation is None or event.xdata is None:
+			self._hide()
+			return
+		run = track.find_run(event.xdata)
+		if run < 0:
+			self._hide()
+			return
+		if self._hovered == (event.inaxes, run):
+			return #Annotation is already showing this run
+		self._hide(redraw=False)
+
+		#Place the annotation in the center of the visible part of the run
+		left, right = sorted(event.inaxes.get_xlim()) #type: ignore
+		center = (max(track.edges[run], left) + min(track.edges[run + 1], right)) / 2
+		track.annotation.xy = (center, 0.5)
+		track.annotation.set_text(str(track.get_label(run)))
+		track.annotation.set_visible(True)
+		self._hovered = (event.inaxes, run) #type: ignore
+		self.canvas.draw_idle()
+
+	def _on_axes_leave(self, event : matplotlib.backend_bases.LocationEvent): #pylint: disable=unused-argument
+		self._hide()
+
+	def _hide(self, redraw : bool = True):
+		"""Hide the annotation (if shown)"""
+		if self._hovered is None:
+			return
+		track = self._tracks.get(self._hovered[0], None)
+		self._hovered = None
+		if track is not None and track.annotation is not None and track.annotation.get_visible():
+			track.annotation.set_visible(False)
+			if redraw:
+				self.canvas.draw_idle()
@@ -0,0 +1,58 @@
+"""
+Implements the selection of the plotting backend.
+
+The plotters share the preparation of the plotted data (see PlotterBase), the backend determines how it is drawn:
+	- "matplotlib" (QPlotter): rasterizes on the CPU using Agg, used by default and for export-quality figures
+	- "pyqtgraph" (PyQtGraphPlotter): draws on an OpenGL-surface using pyqtgraph, which stays interactive for millions of
+		points. Requires the optional dependency pyqtgraph, if it is not installed, the matplotlib backend is used
+		instead.
+
+The backend can be selected using the environment variable MVTS_ANALYZER_PLOT_BACKEND.
+"""
+import logging
+import os
+import typing
+
+from mvts_analyzer.graphing.graph_data import GraphData
+from mvts_analyzer.graphing.graph_settings_model import GraphSettingsModel
+from mvts_analyzer.graphing.plotter.plotter_base import PlotterBase
+
+log = logging.getLogger(__name__)
+
+PLOT_BACKENDS = ("matplotlib", "pyqtgraph")
+DEFAULT_PLOT_BACKEND = os.environ.get("MVTS_ANALYZER_PLOT_BACKEND", "matplotlib").lower()
+
+
+def create_plotter(
+			data_model : GraphData,
+			settings_model : GraphSettingsModel,
+			backend : typing.Optional[str] = None,
+			*args,
+			**kwargs
+		) -> PlotterBase:
+	"""Create a plotter that draws using the passed backend
+
+	Args:
+		data_model (GraphData): The data model
+		settings_model (GraphSettingsModel): The settings model
+		backend (str | None, optional): One of PLOT_BACKENDS. Defaults to None (DEFAULT_PLOT_BACKEND, which is
+			"matplotlib" or $MVTS_ANALYZER_PLOT_BACKEND).
+
+	Returns:
+		PlotterBase: The plotter, falls back to the matplotlib plotter if the backend is unknown or not available
+	"""
+	backend = DEFAULT_PLOT_BACKEND if backend is None else backend.lower()
+	if backend == "pyqtgraph":
+		try:
+			from mvts_analyzer.graphing.plotter.pyqtgraph_plotter import \
+			    PyQtGraphPlotter  #pylint: disable=import-outside-toplevel #Optional dependency
+			return PyQtGraphPlotter(data_model, settings_model, *args, **kwargs)
+		except ImportError as err:
+			log.warning(f"Could not import pyqtgraph, using the matplotlib plotting backend instead ({err}). Install "
+				"pyqtgraph (and PyOpenGL) to use the pyqtgraph plotting backend.")
+	elif backend != "matplotlib":
+		log.warning(f"Unknown plotting backend '{backend}' (options: {PLOT_BACKENDS}), using matplotlib instead")
+
+	from mvts_analyzer.graphing.plotter.plot_wrapper import \
+	    QPlotter  #pylint: disable=import-outside-toplevel
+	return QPlotter(data_model, settings_model, *args, **kwargs)
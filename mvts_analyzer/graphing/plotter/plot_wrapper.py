@@ -1,7 +1,8 @@
 """
 Implements:
 MplCanvas - Wrapper around matplotlib figure-canvas, used to manage axes and twinxes for a stacked plot for QPlotter
-QPlotter - Uses the datamodel and settingsmodel to plot the data in the desired way
+QPlotter - Uses the datamodel and settingsmodel to plot the data in the desired way using matplotlib (the default
+	plotting backend, see plotter_base and plot_backends)
 
 And:
 DragDetector - Manages the dragging of a rectangle, self.drag_start and self.drag_end correspond to the ax coordinate
@@ -9,17 +10,11 @@ DragDetector - Manages the dragging of a rectangle, self.drag_start and self.dra
 """
 #pylint: disable=too-many-lines
 
-import datetime
 import logging
-import math
-import numbers
 import os
 import time
-import traceback
 import typing
-from cmath import nan
 
-import keyboard
 import matplotlib
 import matplotlib.axes
 import matplotlib.axis
@@ -29,29 +24,30 @@ import matplotlib.collections
 import matplotlib.colors
 import matplotlib.dates
 import matplotlib.gridspec
+import matplotlib.image
 import matplotlib.lines
 import matplotlib.patches
 import matplotlib.pyplot as plt
 import matplotlib.transforms as mtransforms
 import numpy as np
-import pandas as pd
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.backends.backend_qt5agg import \
     NavigationToolbar2QT as NavigationToolbar
 from PySide6 import QtWidgets
 
-from mvts_analyzer.graphing.graph_data import GraphData, OperationType
+from mvts_analyzer.graphing.graph_data import GraphData
 from mvts_analyzer.graphing.graph_settings_model import GraphSettingsModel
+from mvts_analyzer.graphing.plotter.blit_manager import BlitManager
 from mvts_analyzer.graphing.plotter.collection_selector import \
     CollectionSelector
+from mvts_analyzer.graphing.plotter.label_hover import LabelHoverService
+from mvts_analyzer.graphing.plotter.plotter_base import PlotterBase
+from mvts_analyzer.graphing.plotter.replot_scheduler import ReplotStage
 from mvts_analyzer.utility.gui_utility import (
     catch_show_exception_in_popup_decorator, create_qt_warningbox)
 
 log = logging.getLogger(__name__)
 
-class PlotError(Exception):
-	"""Exception raised when plotting fails"""
-
 class DragDetector():
 	"""
 	Manages the dragging of a rectangle, self.drag_start and self.drag_end correspond to the ax coordinates
@@ -65,6 +61,7 @@ class DragDetector():
 		):
 
 		self.ax = ax #pylint: disable=invalid-name
+		self._cids = []
 		self.connect(canvas)
 		self.canvas = canvas
 		self.rect = rect
@@ -76,9 +73,18 @@ class DragDetector():
 
 	def connect(self, canvas):
 		"""Connect a new canvas to the drag detector so that we can detect drags/releases/movements on this canvas"""
-		canvas.mpl_connect('button_release_event', self.on_release)
-		canvas.mpl_connect('button_press_event', self.on_press)
-		canvas.mpl_connect('motion_notify_event', self.on_motion)
+		self._cids.append(canvas.mpl_connect('button_release_event', self.on_release))
+		self._cids.append(canvas.mpl_connect('button_press_event', self.on_press))
+		self._cids.append(canvas.mpl_connect('motion_notify_event', self.on_motion))
+
+	def disconnect(self):
+		"""Disconnect from the canvas (e.g. when the axis is removed)"""
+		for cid in self._cids:
+			self.canvas.mpl_disconnect(cid)
+		self._cids = []
+		if self.dragging:
+			self.dragging = False
+			self.canvas.blit_manager.end_interaction()
 
 
 	def on_press(self, event):
@@ -94,6 +100,7 @@ class DragDetector():
 		# xdata, ydata = self.ax.transData.inverted().transform(coords)
 		log.debug(f"Drag start: {coords} => {self.ax.transData.inverted().transform(coords)}")
 		self.ax.start_pan(event.x, event.y, event.button)
+		self.canvas.blit_manager.begin_interaction([self.ax]) #Only the dragged axis is redrawn while dragging
 
 
 	def on_motion(self, event):
@@ -104,8 +111,8 @@ class DragDetector():
 		self.drag_end = self.ax.transAxes.inverted().transform(coords)
 		log.debug(f"Current drag: {coords} => {self.ax.transData.inverted().transform(coords)}")
 		# xdata, ydata = self.ax.transData.inverted().transform(coords)
-		self.ax.drag_pan(event.button, event.key, event.x, event.y)
-		self.canvas.draw_idle()
+		self.ax.drag_pan(event.button, "y", event.x, event.y) #Only pan y, the x-axis is shared with all other axes
+		self.canvas.blit_manager.update()
 
 
 	def on_release(self, event): #pylint: disable=unused-argument
@@ -116,11 +123,16 @@ class DragDetector():
 		self.dragging = False
 		# coords = (event.x, event.y)
 		self.ax.end_pan() #End panning
+		self.canvas.blit_manager.end_interaction()
 
 class MplCanvas(FigureCanvasQTAgg):
 	"""
 	Wrapper around matplotlib figure-canvas, used to manage axes and twinxes for a stacked plot.
-	Makes it easier to add/remove axes and set their respective heights
+	Makes it easier to add/remove axes and set their respective heights.
+
+	The axes are stacked using a GridSpec. Adding/removing/reordering axes only creates/removes the axes that changed,
+	the existing axes (and their twinxes) are kept and only moved to their new position in the grid (see
+	_update_layout). Use clear_axes to remove the plotted artists, while keeping the axes.
 	"""
 
 	def __init__(self): #, parent=None, width=5, height=4, dpi=100):
@@ -132,6 +144,8 @@ class MplCanvas(FigureCanvasQTAgg):
 		self.ax_dict : typing.Dict[str, matplotlib.axes.Axes] = {"main" : ax }
 		self.twinxes = {"main" : {}}
 		self.annots = {"main": None}
+		self._used_twinxes : typing.Set[typing.Tuple[str, str]] = set() #(ax_name, twinx_name) since last clear_axes
+		self.blit_manager = BlitManager(self) #Redraws the interactive artists (e.g. selection, dragged axes)
 
 
 	def add_axis(self, name, index, relative_height = 1, refresh_after = True):
@@ -141,11 +155,12 @@ class MplCanvas(FigureCanvasQTAgg):
 		self.twinxes[name] = {}
 		self.annots[name] = None
 		if refresh_after:
-			self._refresh_axes()
+			self._update_layout()
 
 
 	def get_twinx(self, ax_name, twinx_name) -> matplotlib.axes.Axes:
-		"""Safe method to retrieve twinx axes, twinx axes are never deleted and can thus be reused
+		"""Safe method to retrieve twinx axes, twinx axes are kept until they are removed (see remove_unused_twinxes)
+		and can thus be reused
 
 		Args:
 			ax_name (str): where to add twinx axis
@@ -154,6 +169,7 @@ class MplCanvas(FigureCanvasQTAgg):
 		Returns:
 			matplotlib.axes.Axes: twinx axis of specified axis
 		"""
+		self._used_twinxes.add((ax_name, twinx_name))
 		if twinx_name in self.twinxes[ax_name].keys(): #if axis already exists
 			return self.twinxes[ax_name][twinx_name]
 
@@ -173,15 +189,27 @@ class MplCanvas(FigureCanvasQTAgg):
 		"""
 		for (name, index, height) in zip(names, indexes, relative_heights):
 			self.add_axis(name, index, height, refresh_after=False)
-			# self.ax_order.insert(indexes[i], names[i])
-
-			# # self.ax_sizes.append(relative_heights[i])
-			# self.ax_sizes[names[i]] = relative_heights[i]
 
 		log.debug(f"Added axes: {names} with heights : {relative_heights},"
 	    	f"this resulted in total list: {self.ax_order}, {self.ax_sizes}")
-		# self._refresh_axes()
-		self._remake_axes()
+		self._update_layout()
+
+	def set_axes(self, names : typing.List[str], relative_heights : typing.List[float]):
+		"""Set the axes below the main axis, only the axes that are not in names are removed and only the new names are
+		added, the other axes (and their twinxes) are kept.
+
+		Args:
+			names (list[str]): The names of the axes below the main axis (in order)
+			relative_heights (list[float]): the relative heights of these axes compared to main (size=10)
+		"""
+		for name in [name for name in self.ax_order if name != "main" and name not in names]:
+			self._remove_axis(name)
+		self.ax_order = ["main", *names]
+		for name, height in zip(names, relative_heights):
+			self.ax_sizes[name] = height
+			self.twinxes.setdefault(name, {})
+			self.annots.setdefault(name, None)
+		self._update_layout()
 
 	def remove_axis(self, name):
 		"""
@@ -190,18 +218,26 @@ class MplCanvas(FigureCanvasQTAgg):
 		Args:
 			name (str): name of axis to remove.
 		"""
+		self._remove_axis(name)
+		self._update_layout()
+
+	def _remove_axis(self, name):
+		"""Remove an axis (and its twinxes) without updating the layout"""
 		self.ax_order = [i for i in self.ax_order if i!= name]
 		if name in self.ax_sizes:
 			del self.ax_sizes[name] #remove
 		if name in self.twinxes:
-			for twinxname in self.twinxes[name].keys():
-				del self.twinxes[name][twinxname]
+			for twinx in self.twinxes.pop(name).values():
+				self._remove_from_figure(twinx)
 		if name in self.ax_dict:
-			del self.ax_dict[name] #remove
+			self._remove_from_figure(self.ax_dict.pop(name)) #remove
 		if name in self.annots:
 			del self.annots[name] #Remove annotations
-		self.ax_order = [i for i in self.ax_order if i != name]
-		self._remake_axes()
+
+	def _remove_from_figure(self, ax : matplotlib.axes.Axes): #pylint: disable=invalid-name
+		if ax.figure is self.figure and ax in self.figure.axes: #E.g. not already removed by clf
+			self.blit_manager.clear() #Might contain artists of this axis
+			ax.remove()
 
 	def get_axis(self, name):
 		"""Get axis by name"""
@@ -231,63 +267,90 @@ class MplCanvas(FigureCanvasQTAgg):
 		except Exception as err: #pylint: disable=broad-exception-caught
 			log.warning(f"Could not save figure - {err}")
 
-	def _remake_axes(self):
+	def _update_layout(self):
 		"""
-		Remakes axes in the same figure, uses relative sizes to determine the height of each axis
+		Places the axes in a new grid, uses relative sizes to determine the height of each axis. Existing axes (and
+		their twinxes) are moved to their new position, only axes that do not exist yet are created.
 		"""
 		sizes = [self.ax_sizes[i] for i in self.ax_order]
-		self.figure.clf() #Changed into this to not interfere with other figures
-		temp_axes = []
+		if len(sizes) == 0:
+			return
 		grid = matplotlib.gridspec.GridSpec(len(sizes), 1, height_ratios=sizes, hspace=0) #Create grid-specification
-		# gs.update(wspace=0, hspace=0)
-		for i in range(len(sizes)): #Then remake axes
-			if i > 0:
-				# temp_axes.append(plt.subplot(gs[i], sharex = temp_axes[i-1]))
-				new_subplot = self.figure.add_subplot(grid[i], sharex = temp_axes[i-1])
-				# new_subplot.title #TODO: do this so we can easily normalize
-				temp_axes.append(new_subplot)
-
-			else:
-				# temp_axes.append(plt.subplot(gs[i]))
-				temp_axes.append(self.figure.add_subplot(grid[i]))
-
-			# temp_axes.append(self.figure.add_subplot(1, i, gridspec))
-
+		shared_ax = next((self.ax_dict[name] for name in self.ax_order if name in self.ax_dict), None)
+		created = []
 		for i, name in enumerate(self.ax_order):
-			self.ax_dict[name] = temp_axes[i]
-
-
-
-		log.debug(f"Axes remade: {self.ax_dict}")
+			if name in self.ax_dict:
+				self.ax_dict[name].set_subplotspec(grid[i])
+			else:
+				self.ax_dict[name] = self.figure.add_subplot(grid[i], sharex = shared_ax)
+				shared_ax = self.ax_dict[name] if shared_ax is None else shared_ax
+				created.append(name)
+			for twinx in self.twinxes.get(name, {}).values():
+				twinx.set_subplotspec(grid[i])
+		log.debug(f"Axes layout updated: {self.ax_order} with heights {sizes}, created axes: {created}")
+
+	def reset_axes(self):
+		"""Remove all axes and twinxes, the axes in ax_order are recreated from scratch (e.g. when the units of the
+		x-axis change)"""
+		self.blit_manager.clear()
+		self.figure.clf()
+		self.ax_dict = {}
+		self.twinxes = {name : {} for name in self.ax_order}
+		self._used_twinxes = set()
+		self._update_layout()
+
+	def clear_axes(self):
+		"""Remove the plotted artists (and legends) from all axes and twinxes, the axes themselves are kept"""
+		self.blit_manager.clear()
+		for name, ax in self.ax_dict.items(): #pylint: disable=invalid-name
+			self.clear_axis(ax)
+			for twinx in self.twinxes.get(name, {}).values():
+				self.clear_axis(twinx)
+		self._used_twinxes = set()
 
+	@staticmethod
+	def clear_axis(ax : matplotlib.axes.Axes): #pylint: disable=invalid-name
+		"""Remove the plotted artists (and legend) from an axis, without resetting its settings (unlike ax.cla())"""
+		for artist in [*ax.collections, *ax.lines, *ax.images, *ax.patches, *ax.texts, *ax.artists, *ax.tables]:
+			artist.remove()
+		if ax.legend_ is not None:
+			ax.legend_.remove()
+		ax.relim() #Forget the data limits of the removed artists
 
 	def clear_all_axes(self): #TODO: this doesnt seem to work?
 		"""Clear the figure"""
 		log.debug("Now clearing figure...")
+		self.blit_manager.clear()
 		self.figure.clf()
 
 	def remove_twinxes(self):
 		"""Remove all twinxes from the plot"""
 		for ax_name in self.twinxes: #pylint: disable=consider-using-dict-items
-			twinx_names =  list(self.twinxes[ax_name].keys())
-			for twinx_name in twinx_names:
-				del self.twinxes[ax_name][twinx_name]
+			for twinx in self.twinxes[ax_name].values():
+				self._remove_from_figure(twinx)
+			self.twinxes[ax_name] = {}
+
+	def remove_unused_twinxes(self):
+		"""Remove the twinxes that were not retrieved (see get_twinx) since the last clear_axes"""
+		for ax_name in self.twinxes: #pylint: disable=consider-using-dict-items
+			for twinx_name in [name for name in self.twinxes[ax_name] if (ax_name, name) not in self._used_twinxes]:
+				self._remove_from_figure(self.twinxes[ax_name].pop(twinx_name))
 
 	def remove_axes(self, except_main = True):
 		"""Remove all axes from the plot, except main (if specified)"""
 		for name in self.ax_dict.copy():
 			if name == "main" and except_main: #Skip main deletion if so desired
 				continue
-			self.remove_axis(name)
+			self._remove_axis(name)
 		self.remove_twinxes()
-		self._remake_axes()
+		self._update_layout()
 		log.debug(f"Refreshed axes, this resulted in axes: {self.ax_dict} and twinxes: {self.twinxes}")
 
 
-class QPlotter(QtWidgets.QWidget):
+class QPlotter(PlotterBase):
 	"""
 	Intermediate between plot datamodel/settingsmodel which manages the plotter using the GraphSettingsModel
-	data passed on replot call
+	data passed on replot call. Draws using matplotlib (see PlotterBase for the preparation of the plotted data).
 	"""
 	def __init__(self,
 				data_model : GraphData,
@@ -295,7 +358,7 @@ class QPlotter(QtWidgets.QWidget):
 				*args,
 				**kwargs
 			):
-		super(QPlotter, self).__init__(*args, **kwargs)
+		super(QPlotter, self).__init__(data_model, settings_model, *args, **kwargs)
 		log.debug("Reloading QPlotter")
 
 		self.canvas = MplCanvas()#, width=5, height=4, dpi=100)
@@ -305,113 +368,239 @@ class QPlotter(QtWidgets.QWidget):
 		layout.addWidget(self.canvas)
 		self.setLayout(layout)
 
-		self.settings_model = settings_model
-		self.data_model = data_model
+		self.label_hover = LabelHoverService(self.canvas) #Shows the label under the cursor on label tracks
+		self.data_model.dfChanged.connect(self._on_df_changed)
+		self.data_model.hiddenDatapointsChanged.connect(lambda *_: self.replot_scheduler.invalidate(ReplotStage.DATA))
+		#The settings the current plot was made with, used to find the stages that changed (see _get_changed_stages)
+		self._plot_state : typing.Optional[tuple] = None #None if there is no (complete) plot
+		self._plotted_fft_key : typing.Optional[tuple] = None
+		self._plotted_series_key : typing.Optional[tuple] = None
+		self._plotted_font_size : typing.Optional[float] = None #Restyled in place (see _apply_font_size)
+		self._fft_artist : typing.Optional[matplotlib.cm.ScalarMappable] = None #The drawn fft-data (mesh/image)
+		self._fft_image_values : typing.Optional[np.ndarray] = None #The (canvas-sized) values of the drawn fft-image
 
-		self.model = None
-		self.selected_data = None #The intermediate dataframe used to plot the main data
-		self.selection_exclusion_brightness = 0.75 #The brightness factor for the points not selected
-		self.plot_title = "-"
-		self.fft_data = (None, None, None)
-
-		self.cur_pd_selection = set([])
 		self.selectors = []
 		self.selector = CollectionSelector(self.canvas.get_axis("main"), [], [],[])
 
 		self.selector.pdSelectionEdited.connect(self.handle_selection_change)
-		self.data_model.dfSelectionChanged.connect(self._set_selection)
 
 		self._colorbar_legend = None
+		self._colorbar_legend_entries : typing.Tuple[np.ndarray, np.ndarray] = (np.array([]), np.array([]))
+		self._layout_x_axis = None #The x-axis the axes were created for (see _replot)
 		# self.selector.pandasSelectionEdited.connect(lambda x: self.set_cur_loc_selection(x, redraw_after=True))
 
 
 		#============== Other ==================
-		self.legend_names = []
-		self.legend_colors_dict = {}
-		self.data_locs = []
 		self.data_axes = []
 		self.collections = [] #in the case of scatterplots
-		self.cur_plot_type = self.settings_model.plot_type
-		self.data_colors = []
 		self._drag_detectors = []
 		self.rectangle = None
+		self._twin_rectangles : typing.List[matplotlib.patches.Rectangle] = [] #Per plotted series: behind its spine
 
+	def _get_plot_width(self) -> float:
+		return self.canvas.figure.bbox.width
 
-	def handle_selection_change(self, new_selection : set):
-		"""Handle selection change, detect which key is being pressed and update the selection accordingly"""
-		mode = OperationType.OVERWRITE
-		try:  # used try so that if user pressed other than the given key error will not be shown
-			if keyboard.is_pressed('ctrl') or keyboard.is_pressed('shift'):  # if key 'q' is pressed
-				mode = OperationType.APPEND
-			elif keyboard.is_pressed('alt'):
-				mode = OperationType.COMPLEMENT
-		except Exception: #pylint: disable=broad-exception-caught
-			pass
-		self.data_model.set_df_selection(new_selection, mode, fill_gaps_ms=self.settings_model.selection_gap_fill_ms)
+	def get_view_xlim(self) -> typing.Tuple[float, float]:
+		return self.canvas.ax_dict["main"].get_xlim()
 
+	def get_view_ylim(self) -> typing.Tuple[float, float]:
+		return self.canvas.ax_dict["main"].get_ylim()
 
-	@staticmethod
-	def plot_title_reformatter(val):
-		"""Formats the title according to type of data"""
-		if isinstance(val, datetime.datetime):
-			val = val.strftime("%Y-%m-%d %H:%M:%S") #up until seconds precision
-		else:
-			val = str(val)
-
-		return val
-
-	def replot(self,):
-		"""Replots the data using the current settings.
-		Note that we should not change the (plot)settings/data while replotting, as this could lead to unexpected
-		behaviour.
-
-		The replotting process consists of:
-			- Clearing the axes
-			- Plotting the main data
-			- Plotting the fft data
-			- Plotting the selection
-			- Plotting the annotations
-			- Plotting the selectors
-			etc.
-		"""
-		log.debug("Now trying to replot...")
+	def save_figure(self, target : typing.Union[str, typing.BinaryIO], file_format : typing.Optional[str] = None):
+		self.canvas.figure.savefig(target, format=file_format)
+
+	def open_save_popup(self):
+		self.canvas.open_save_popup()
+
+	def _render_scheduled(self, stages : ReplotStage, is_stale : typing.Callable[[], bool]) -> bool:
+		stages |= self._get_changed_stages()
+		if stages == ReplotStage.NONE: #Explicit replot without any changes
+			stages = ReplotStage.ALL
+		log.debug(f"Now rendering scheduled replot (stages: {stages})")
+		if ReplotStage.DATA not in stages:
+			updated = self._update_stages(stages)
+			if updated is not None: #Failed updates (None) are shown in a popup by _update_stages
+				if updated:
+					return True
+				log.debug(f"Could not update stages {stages} in place, replotting everything")
+		return self._replot(is_stale=is_stale) is not False #Failed replots (None) are shown in a popup by _replot
+
+	def _get_plot_state(self) -> tuple:
+		"""The settings that change the layout/data of the plot, if any of these change, everything is replotted"""
+		domain = self.settings_model.plot_domain_limrange
+		return (
+			self.settings_model.x_axis,
+			tuple(self.settings_model.plot_list),
+			tuple(self.settings_model.plotted_labels_list),
+			self.settings_model.plot_type,
+			self.settings_model.fft_toggle,
+			None if domain is None else (domain.left_val, domain.right_val),
+			tuple(id(filt) for filt in self.settings_model.plot_filters)
+		)
+
+	def _get_fft_key(self) -> tuple:
+		"""The settings of the drawn fft-data (the colors are restyled in place, see restyle_fft)"""
+		return (self.settings_model.fft_column, self.settings_model.fft_line_range_left,
+			self.settings_model.fft_line_range_right, self.settings_model.fft_line_range_max,
+			self.settings_model.fft_quality)
+
+	def _get_series_key(self) -> tuple:
+		"""The settings of the colors of the plotted series"""
+		return (self.settings_model.plot_color_method, self.settings_model.plot_color_column)
+
+	def _get_changed_stages(self) -> ReplotStage:
+		"""Get the stages that are invalidated by settings that changed since the last replot"""
+		if self._plot_state is None or self._get_plot_state() != self._plot_state:
+			return ReplotStage.ALL
+		stages = ReplotStage.NONE
+		if self._get_fft_key() != self._plotted_fft_key:
+			stages |= ReplotStage.FFT
+		if self._get_series_key() != self._plotted_series_key:
+			stages |= ReplotStage.SERIES | ReplotStage.STYLE #Legend changes as well
+		if self.settings_model.font_size != self._plotted_font_size:
+			stages |= ReplotStage.STYLE
+		return stages
+
+	def _on_df_changed(self):
+		"""Invalidate the stages that depend on the changed columns"""
+		changed_columns = self.data_model.changed_columns
+		if changed_columns is None:
+			self.replot_scheduler.invalidate(ReplotStage.ALL)
+			return
+		settings = self.settings_model
+		data_columns = {*settings.plot_list, settings.x_axis, self.data_model.dt_col}
+		labels_colored = settings.plot_color_method == settings.plot_color_method_options[1]
+		stages = ReplotStage.NONE
+		for column in changed_columns:
+			if column in data_columns or len(settings.plot_filters) > 0: #Filters might use any column
+				stages |= ReplotStage.DATA
+			if column in settings.plotted_labels_list:
+				stages |= ReplotStage.COLORBARS
+			if column == settings.fft_column:
+				stages |= ReplotStage.FFT
+			if labels_colored and column == settings.plot_color_column:
+				stages |= ReplotStage.SERIES | ReplotStage.STYLE
+		self.replot_scheduler.invalidate(stages)
+
+	@catch_show_exception_in_popup_decorator(custom_error_msg="<b>Plotting Failed</b>", re_raise=False)
+	def _update_stages(self, stages : ReplotStage) -> bool:
+		"""Re-execute only the passed stages on the existing plot, the existing artists are updated in place where
+		possible. Returns False if the stages could not be updated this way (e.g. the axes do not exist), then
+		everything should be replotted."""
+		before = time.perf_counter()
+		if ReplotStage.FFT in stages and not self._update_fft():
+			return False
+		if ReplotStage.COLORBARS in stages and not self._update_colorbars():
+			return False
+		if ReplotStage.SERIES in stages and not self._update_series_colors():
+			return False
+		if ReplotStage.STYLE in stages:
+			self._replot_ax_style()
+		self.canvas.draw()
+		log.debug(f"Updating stages {stages} took: {time.perf_counter() - before}")
+		return True
+
+	def _update_fft(self) -> bool:
+		if not self.settings_model.fft_toggle or self.settings_model.x_axis != "DateTime": #Nothing drawn
+			return True
+		self._reload_fft_data()
+		self._replot_fft()
+		self._plotted_fft_key = self._get_fft_key()
+		return True
+
+	def _update_colorbars(self) -> bool:
+		for label_col in self.settings_model.plotted_labels_list: #Remove the tracks, but keep the axes
+			if label_col in self.canvas.ax_dict:
+				self.canvas.clear_axis(self.canvas.get_axis(label_col))
+		self._colorbar_legend = None #Removed with the artists of its axis
+		self._replot_colorbars()
+		return True
+
+	def _update_series_colors(self) -> bool:
+		"""Recolor the plotted series (in place) using the current color method"""
+		if len(self.collections) != len(self.plotted_columns) \
+				or any(df_positions is None for df_positions in self.plotted_df_positions):
+			return False
+		col_colors = self._reload_series_colors()
+		color_based_on_col = self.settings_model.plot_color_method == self.settings_model.plot_color_method_options[0]
+		plot_list = list(self.settings_model.plot_list)
+		for ax_idx, (col, df_positions) in enumerate(zip(self.plotted_columns, self.plotted_df_positions)):
+			col_color = col_colors[plot_list.index(col)]
+			if color_based_on_col:
+				colors = np.tile(np.array([col_color[0], col_color[1], col_color[2], 1.0]), (len(df_positions), 1))
+			else:
+				color_col = self.settings_model.plot_color_column
+				if color_col not in self.data_model.df.columns: #type: ignore
+					raise KeyError(f"KeyError: Selected color-column ({color_col}) does not exist, please make sure an "
+						"existing column is selected under Plot Colors")
+				colors = self._get_point_colors(self.data_model.df[color_col].iloc[df_positions], #type: ignore
+					self.legend_colors_dict)
+			colors[:, 3] = self.data_colors[ax_idx][:, 3] #Keep the transparency of (line-)segments over gaps
+			self.data_colors[ax_idx] = colors
+			self.unselected_colors[ax_idx] = self._get_unselected_colors(colors, self.selection_exclusion_brightness)
+			self.data_axes[ax_idx].yaxis.label.set_color(col_color)
+			self.data_axes[ax_idx].spines['right'].set_color(col_color)
+			self.data_axes[ax_idx].tick_params(axis='y', colors=col_color)
+			self._drag_detectors[ax_idx].rect.set_facecolor(col_color)
+		self._set_selection(self.data_model.selection_mask) #Applies the new colors to the collections
+		self._plotted_series_key = self._get_series_key()
+		return True
+
+	def restyle_fft(self):
+		"""Only update the colors (colormap, transparency and brightness) of the drawn fft-data, without reloading or
+		redrawing the data itself"""
+		if self._fft_artist is None or self._fft_artist.axes is None: #type: ignore
+			return
 		try:
-			self._replot()
-		except Exception as err: #pylint: disable=broad-exception-caught
-			log.error(traceback.format_exc(), err)
-			create_qt_warningbox(str(err), "Exception during replot: {err}")
+			fft_cmap = self._get_fft_cmap()
+		except ValueError as err: #E.g. unknown colormap
+			log.warning(f"Could not restyle fft-data: {err}")
+			return
+		if self._fft_image_values is not None: #Only re-map the canvas-sized values
+			self._fft_artist.set_data(self._get_fft_rgba(self._fft_image_values, fft_cmap)) #type: ignore
+		else:
+			self._fft_artist.set_cmap(fft_cmap)
+			self._fft_artist.set_clim(*self._get_fft_clim())
+		self.canvas.draw_idle()
 
 	def _replot_fft(self):
 		"""
 		Replot the fft-data (numpy-array)
 		"""
+		previous_artist = self._fft_artist #Updated in place where possible (only set if the axes were kept)
+		self._fft_artist, self._fft_image_values = None, None
 		if self.fft_data is None or self.fft_data[0] is None:
 			log.info("FFT data is none, could not replot")
+			if previous_artist is not None and previous_artist.axes is not None: #type: ignore
+				previous_artist.remove() #type: ignore
 			return
-		log.debug(f"Chose for fft_color {self.settings_model.fft_color_map}")
-		if self.settings_model.fft_color_map == "BlueYellowRed":
-
-			colordict = [
-				(0, "Blue"),
-				(0.9999, "Yellow"),
-				(1.0, "Red")
-			]
-			fft_cmap = matplotlib.colors.LinearSegmentedColormap.from_list("custom", colordict, N=256)
-
-		else:
-			fft_cmap = plt.get_cmap(self.settings_model.fft_color_map) #type: ignore
-
-
-
-		fft_cmap = fft_cmap(np.arange(fft_cmap.N)) #type: ignore
-		fft_cmap[:, -1] = self.settings_model.fft_transparency #type: ignore
-		fft_cmap = matplotlib.colors.ListedColormap(fft_cmap) #type: ignore
 
 		X, Y, Z = self.fft_data #pylint: disable=invalid-name
-		log.debug(f"Creating mesh of dimensions: {len(X)}")
-		mesh = self.canvas.get_axis("main").pcolormesh(
-			X, Y, Z, vmax=1.0, cmap=fft_cmap, linewidth=0, rasterized=True)#, cmap=cMap)
-		mesh.set_edgecolor('face')
+		plt_ax = self.canvas.get_axis("main")
+		fft_cmap = self._get_fft_cmap()
+		plt_ax_size = (plt_ax.bbox.width, plt_ax.bbox.height)
+		raster = self._get_fft_raster(X, Z, plt_ax_size) if self.fft_raster_enabled else None
+		if raster is not None: #Regularly sampled -> draw a precomputed (canvas-sized) RGBA-image
+			values, extent = raster
+			log.debug(f"Creating image of dimensions: {values.shape} from fft-data of dimensions {Z.shape}")
+			self._fft_image_values = values
+			if isinstance(previous_artist, matplotlib.image.AxesImage) and previous_artist.axes is plt_ax:
+				previous_artist.set_data(self._get_fft_rgba(values, fft_cmap))
+				previous_artist.set_extent(extent)
+				self._fft_artist, previous_artist = previous_artist, None
+			else:
+				self._fft_artist = plt_ax.imshow(self._get_fft_rgba(values, fft_cmap), extent=extent, origin="lower",
+					aspect="auto", interpolation="nearest", rasterized=True)
+		else: #Irregular sampling (e.g. gaps) -> draw each cell as a quad
+			vmin, vmax = self._get_fft_clim()
+			X, Y, Z = self._bin_fft_mesh(X, Y, Z, plt_ax_size) #pylint: disable=invalid-name
+			log.debug(f"Creating mesh of dimensions: {len(X)}")
+			mesh = plt_ax.pcolormesh(
+				X, Y, Z, vmin=vmin, vmax=vmax, cmap=fft_cmap, linewidth=0, rasterized=True)#, cmap=cMap)
+			mesh.set_edgecolor('face')
+			self._fft_artist = mesh
+		if previous_artist is not None and previous_artist.axes is not None: #type: ignore
+			previous_artist.remove() #type: ignore
 
 
 		#======= y -axis on left side =====
@@ -433,68 +622,6 @@ class QPlotter(QtWidgets.QWidget):
 		cur_ax.set_ylabel("Frequency (Hz)")
 		# cur_ax.spines['left'].set_position(('outward', 0))
 
-	def _reload_fft_data(self):
-		log.info("Now reloading FFT data")
-
-
-		# cur_ax.spines['left'].set_visible(True)
-
-		if self.settings_model.fft_column == "" or self.settings_model.fft_column is None:
-			log.info("Selected FFT column is empty, not plotting")
-			return
-
-		plot_xlim = self.settings_model.plot_domain_limrange
-		cols = ["DateTime", self.settings_model.fft_column]
-		fft_df = self.data_model.df[cols] #type: ignore #Assertion is done on replot()-call, so ignore none-possibility
-		fft_df = fft_df.sort_values("DateTime", ascending=True).dropna() #TODO: make this more elegant
-
-
-		if plot_xlim.left_val is not None: #if xmin specified
-			fft_df = fft_df[ fft_df["DateTime"] >= plot_xlim.left_val]
-		if plot_xlim.right_val is not None:  #If xmax specified
-			fft_df = fft_df[ fft_df["DateTime"] <= plot_xlim.right_val]
-
-		if fft_df.empty:
-			log.info("Could not create fft_data, as the fft dataframe of selection is empty")
-			self.fft_data=(None, None, None)
-			return
-
-
-		y_len = self.settings_model.fft_line_range_right - self.settings_model.fft_line_range_left
-		y_res_reduction = int(51 - 50*math.pow(self.settings_model.fft_quality, 1/5))
-		fft_x, fft_y, fft_z = [], [], []
-		fft_x = fft_df["DateTime"].to_numpy()
-		fft_y = np.array(
-			[i/ math.ceil(y_len/y_res_reduction) for i in range(math.ceil(y_len/y_res_reduction))]
-		) #TODO: Don't hardcode 1601, change based on amount of lines
-		# print(fft_df[self.settings_model.fft_column].tolist())
-		fft_z = np.array(
-			fft_df[self.settings_model.fft_column].tolist()
-		)[:, self.settings_model.fft_line_range_left : self.settings_model.fft_line_range_right]
-
-		# fft_column] creates an array of lists
-		fft_z = np.swapaxes(fft_z, 0, 1)
-
-		if y_res_reduction > 1:
-			try:
-				from skimage.measure import block_reduce #pylint: disable=import-outside-toplevel
-			except ImportError as err:
-				log.warning(f"Could not import skimage, please install scikit-image to use y-resolution reduction ({err})")
-				create_qt_warningbox(
-					f"<b>Could not import skimage, please make sure the 'scikit-image' package is installed when using "
-					f"y-resolution reduction <b><br>{err}"
-				)
-				y_res_reduction = 1
-			fft_z = block_reduce(fft_z, block_size=(y_res_reduction,1), func=np.mean) #type:ignore reduce y-resolution
-
-		log.debug(f"FFT max is : {np.max(fft_z)}")
-		log.debug(f"Reduction factor: {y_res_reduction}  --- Z size is: {fft_z.shape}   Y shape is: {fft_y.shape}")
-
-		fft_z = (fft_z / fft_z.mean() * pow(self.settings_model.fft_brightness * 2, 5))
-		self.fft_data = (fft_x, fft_y, fft_z)
-
-
-
 	def _replot_colorbars(self):
 		"""Function used for plotting colorbar, indicating the class for each time-period
 
@@ -508,43 +635,24 @@ class QPlotter(QtWidgets.QWidget):
 			Defaults to {}.
 		"""
 		before= time.perf_counter()
+		self.label_hover.clear() #The previous tracks are removed
 		label_columns = self.settings_model.plotted_labels_list #Get list of plotted label-columns
 		log.debug(f"Label columns: {label_columns}")
 
-		if len(label_columns) == 0 or self.selected_data is None:
-			return
-
-		all_classes = set({})
-		before1= time.perf_counter()
-		dt_lbl_df = self.selected_data[["DateTime", *label_columns]].sort_values("DateTime", ascending=True)
-		dt_lbl_df.fillna(np.nan) #To make sure <nans> are processed properly
-		if len(dt_lbl_df) == 0:
-			log.info("Not plotting colorbar as length of dataframe is 0")
+		tracks = None
+		if len(label_columns) > 0 and self.selected_data is not None:
+			before1= time.perf_counter()
+			tracks = self._get_label_tracks(label_columns) #Per column: (x_bars, codes, categories, used codes)
+			log.debug(f"Getting label runs took: {time.perf_counter() - before1}")
+			if tracks is None:
+				log.info("Not plotting colorbar as length of dataframe is 0")
+		#Only creates/removes the axes of label-columns that were (not) plotted before, the others are kept
+		self.canvas.set_axes([] if tracks is None else list(label_columns),
+			[0.3 for _ in range(0 if tracks is None else len(label_columns))])
+		if tracks is None:
 			return
 
-		log.debug(f"Sorting and replacing None took: {time.perf_counter() - before1}")
-
-		for col in label_columns:
-			all_classes.update(list(dt_lbl_df[col].unique())) #Use this for only classes in current view
-		all_classes = [i for i in all_classes if i is not None
-			and not pd.isna(i)
-			and(not isinstance(i, numbers.Number) or not np.isnan(i)) and i != "nan" #type: ignore
-		] #All classes except NaN (numpy), <NA> (pandas) (make sure to check for <NA> first)
-
-
-		all_classes = set([i for i in all_classes if i != "None"])
-		log.debug(f"Found classes: {all_classes}")
-		#get new color for each class
-		colors = matplotlib.cm.rainbow(np.linspace(0,1,len(all_classes))) #pylint: disable=no-member #type:ignore
-
-		#====== Manually add "None" string ==============
-		all_classes = ["None"] + list(all_classes)
-		colors = np.insert(colors, 0, np.array((0.5, 0.5, 0.5, 0.3)), axis=0)
-
-		all_classes_dict = { item : nr for (nr,item) in enumerate(all_classes)}
-		all_classes = np.array(list(all_classes)) #Set back to numpy for indexing options
-		self.canvas.add_axes(
-			label_columns, [i+1 for i in range(len(label_columns))], [0.3 for i in range(len(label_columns))])
+		all_classes, colors, class_runs = self._get_label_classes(tracks)
 		color_map = matplotlib.colors.ListedColormap(colors) #type: ignore
 
 
@@ -554,97 +662,21 @@ class QPlotter(QtWidgets.QWidget):
 
 		for ax, label_col in zip(axes, label_columns): #Go over label columns #pylint: disable=invalid-name
 			log.debug(f"Now plotting colorbar for column '{label_col}'")
-			before1= time.perf_counter()
-			dt_lbl_original = dt_lbl_df[["DateTime", label_col]].copy() #.to_numpy() #Should already be sorted
-				#descending, as such this should be more efficient
-				# TODO: make sure this stays this way - als: na_value can be used instead of fillna earlier
-			dt_lbl = dt_lbl_original.copy()
-			#Replace all entries by a number indicating its class (Use Object because this will fit every datatype),
-			#	(or None/NaN), then it should all be Integers (Int64 instead of in64 due to Nones)
-			dt_lbl[label_col] = dt_lbl[label_col].astype("object").replace(to_replace=all_classes_dict).astype("Int64")
-			mask = ~(dt_lbl[label_col].isnull() & dt_lbl[label_col].shift(1).isnull()) #Remove repeating Nones
-			mask = mask & ((dt_lbl[label_col].shift(1) != dt_lbl[label_col]).fillna(value=True))
-			mask.iloc[0] = True #Always take first
-			mask.iloc[-1] = True #And always take last
-			dt_lbl = dt_lbl.loc[mask] #Shift by 1 and compare with itself -> repeating values after first will be deleted
-			dt_lbl = dt_lbl.fillna(value=0)
-			#TODO: commented following line:
-			# 	dt_lbl[label_col] = dt_lbl[label_col].astype(np.int64) #No nones should remain -> this should succeed.
-			# 	NOTE: pd.Int64Dtype() created errors, even when first converting to numpy, this makes sure everything
-			# 	works before plotting
-
-			x_bars, z_bars = [], []
-
-			log.debug(f"Unique values in label column {label_col} : {dt_lbl[label_col].unique()}")
-
-
-			x_bars = dt_lbl["DateTime"].to_numpy()
-			z_bars = dt_lbl[label_col].astype("int64").to_numpy() #Added 20221021 -> every class (including None =0 )should
-				#be an integer now -> make sure interpreted as such
-			log.debug(f"Calculating least squares pcolormesh for {label_col} took : {time.perf_counter() - before1}")
+			x_bars, codes, categories, _ = tracks[label_col]
+			z_bars = class_runs[label_col]
 
 			before1 = time.perf_counter()
-
-			ax.pcolormesh(x_bars, [0,1], [np.array(z_bars)[:-1]], cmap=color_map, vmin=0, vmax=len(all_classes))
+			if len(x_bars) > 1:
+				ax.pcolormesh(x_bars, [0,1], [z_bars], cmap=color_map, vmin=0, vmax=len(all_classes))
 			log.debug(f"Creating pcolormesh of size {len(x_bars)} took: {time.perf_counter() - before1}s")
 			ax.set(yticklabels=[])
 			ax.set_ylabel(label_col, rotation=0, fontsize=self.settings_model.font_size, ha='right', va='center')
 
 
 			# ======== Annotation on hover ===============
-			ax.annotate("", xy=(0,0), xytext=(0,0 ),textcoords="offset points", ha='center', va='center',
+			annotation = ax.annotate("", xy=(0,0), xytext=(0,0 ),textcoords="offset points", ha='center', va='center',
 						bbox=dict(boxstyle="round", fc="w"))
-
-
-
-						#arrowprops=dict(arrowstyle="->"))
-			#Show dt_lbl string when hovering over pcolumesh:
-			# def update_annot(x, y, newtext, annot):
-			# 	annot.set_visible(True)
-			# 	annot.xy = (x,y)
-			# 	annot.set_text(newtext)
-			# 	annot.get_bbox_patch().set_alpha(1)
-			# 	self.canvas.draw_idle()
-
-			# def on_axis_leave(event, annot):
-			# 	#check if annotation is visible (otherwise lag when moving away from plot)
-			# 	if annot.get_visible():
-			# 		annot.set_visible(False)
-			# 		self.canvas.draw_idle()
-			# def on_axis_hover(event, ax, original_labels, original_dts, annot):
-			# 	#NOTE: merged this function with format_coord -> might not be necceasary anymore
-			# 	if event.inaxes == ax:
-			# 		x, y = event.xdata, 0.5
-			# 		dt = matplotlib.dates.num2date(x).replace(tzinfo=None)
-			# 		label = original_labels[original_dts.sub(dt).abs().idxmin()]
-			# 		update_annot(x, y, label, annot)
-
-			def format_coord(x_coord, y_coord, original_labels, original_dts): #pylint: disable=unused-argument
-				py_dt = matplotlib.dates.num2date(x_coord).replace(tzinfo=None)
-				label = original_labels[original_dts.sub(py_dt).abs().idxmin()]
-				return f"x={py_dt} 		class={label}"
-
-
-
-			#NOTE: turn on to get labeling... But takes some time when moving over plot
-			# self.canvas.mpl_connect("motion_notify_event",
-			# 		lambda x,
-			# 		ax=ax,
-			# 		original_labels=dt_lbl_original[label_col],
-			# 		original_dts=dt_lbl_original['DateTime'],
-			# 		annot=annot: on_axis_hover(x, ax, original_labels, original_dts, annot)
-			# )
-			# self.canvas.mpl_connect("axes_leave_event", lambda x, annot=annot: on_axis_leave(x, annot))
-			ax.format_coord = (lambda x,y, original_labels=dt_lbl_original[label_col], original_dts=dt_lbl_original['DateTime']:
-				format_coord(x,y, original_labels=original_labels, original_dts=original_dts )) #pylint: disable=cell-var-from-loop
-
-			# annot = ax.annotate("", xy=(0,0), xytext=(20,20),textcoords="offset points",
-			#         bbox=dict(boxstyle="round", fc="w"),
-			#         arrowprops=dict(arrowstyle="->"))
-
-
-
-
+			self.label_hover.add_track(ax, x_bars, codes, categories, annotation)
 
 		log.debug(f"REPLOT COLORBARS (Total time): {time.perf_counter() - before}")
 
@@ -657,69 +689,77 @@ class QPlotter(QtWidgets.QWidget):
 		legend_names = np.array(legend_names)[sort_index]
 		legend_colors = legend_colors[sort_index]
 
-		self._colorbar_legend = axes[-1].legend(legend_colors,
-			legend_names,
-			loc='upper center',
-			bbox_to_anchor=(0.5, -1.5),
-			ncol = min(10, len(legend_names)),
-			frameon = False
-		)
-
+		self._create_colorbar_legend(axes[-1], legend_colors, legend_names)
 
 
 
 
 
-	def _recolor_selection_scatter(self, plt_ax, ind_selection, collection, base_colors): #pylint: disable=unused-argument
-		"""Recolor the selection in a scatterplot
-		"""
-		face_color = base_colors.copy()
 
-		if len(ind_selection) == 0: #Color normally if no selection
-			face_color[ind_selection] = base_colors[ind_selection]
-		else:
-			face_color[:, :3] = 0.75 * (1.0 - face_color[:, :3]) + face_color[:, :3] #Lighten everything except selected points
-			face_color[ind_selection] = base_colors[ind_selection]
-
-		collection.set_facecolors(face_color)
-		collection.set_edgecolors(face_color)
-		self.canvas.draw_idle()
+	@staticmethod
+	def _get_color_buffer(collection : matplotlib.collections.Collection,
+				base_colors : np.ndarray,
+				face : bool = False
+			) -> np.ndarray:
+		"""Returns the edge (or face) color array of a collection, so it can be edited in place. If the collection
+		does not (yet) use per-item colors of the same shape as base_colors, these are set first."""
+		colors = collection.get_facecolor() if face else collection.get_edgecolor()
+		if not isinstance(colors, np.ndarray) or colors.shape != base_colors.shape:
+			if face:
+				collection.set_facecolor(base_colors)
+			else:
+				collection.set_edgecolor(base_colors)
+			colors = collection.get_facecolor() if face else collection.get_edgecolor()
+		return colors
 
-	def _recolor_selection_lineplot(self, ind_selection, collection, base_colors):
-		# unpacked =
-		# raise NotImplementedError("Recolor lineplot not implemented")
-		face_colors = base_colors.copy()
-		# slice = [i for i in range(length) if i not in ind_selection]
-		nextselection = [i - 1 for i in ind_selection if i !=0] #Always take the line after the selected item
+	def _recolor_selection_scatter(self, plt_ax, selected, collection, base_colors, unselected_colors): #pylint: disable=unused-argument
+		"""Recolor the selection in a scatterplot (in place)
 
-		if len(nextselection) == 0:
-			face_colors[nextselection] = base_colors[nextselection]
-		else:
-			face_colors[:, :3] = 0.75 * (1.0 - face_colors[:, :3]) + face_colors[:, :3] #Brighten except selected points
-			# fc[ind_selection] = base_colors[ind_selection]
-			face_colors[nextselection] = base_colors[nextselection]
+		Args:
+			plt_ax (matplotlib.axes.Axes): The axis of the collection
+			selected (np.ndarray): Boolean mask with an entry for every drawn point
+			collection (matplotlib.collections.Collection): The scatter collection
+			base_colors (np.ndarray): The normal colors of the points
+			unselected_colors (np.ndarray): The colors of points that are not selected (when at least 1 is selected)
+		"""
+		for face in (True, False):
+			colors = self._get_color_buffer(collection, base_colors, face=face)
+			self._fill_selection_colors(colors, selected, base_colors, unselected_colors)
+		collection.stale = True
 
-		collection.set_facecolors(face_colors)
-		collection.set_edgecolors(face_colors)
-		self.canvas.draw_idle()
+	def _recolor_selection_lineplot(self, selected, collection, base_colors, unselected_colors):
+		"""Recolor the selection in a lineplot (in place), a line segment is colored as selected if the point at its
+		end is selected.
 
+		Args:
+			selected (np.ndarray): Boolean mask with an entry for every drawn point
+			collection (matplotlib.collections.LineCollection): The line collection
+			base_colors (np.ndarray): The normal colors of the points
+			unselected_colors (np.ndarray): The colors of points that are not selected (when at least 1 is selected)
+		"""
+		colors = self._get_color_buffer(collection, base_colors)
+		self._fill_selection_colors(colors, self._get_segment_selected(selected), base_colors, unselected_colors)
+		collection.stale = True
 
 
 
 
-	def _set_selection(self, loc_selection):
-		self.cur_pd_selection = set(loc_selection)
-		for ax_idx, (ax, loc, colors) in enumerate(zip(self.data_axes, self.data_locs, self.data_colors)): #pylint: disable=invalid-name
-			plot_ind = []
 
-			for i in range(len(loc)): #pylint: disable=consider-using-enumerate
-				if loc[i] in self.cur_pd_selection:
-					plot_ind.append(i) #Append all indexes of values that have been selected
+	def _set_selection(self, selection : typing.Union[np.ndarray, set]):
+		"""Recolor the plotted data according to the passed selection
 
+		Args:
+			selection (np.ndarray | set): Boolean mask aligned with the dataframe (see GraphData.selection_mask) or a set
+				of pandas-idxes
+		"""
+		for ax_idx, selected in enumerate(self._get_series_selections(selection)):
+			colors, unselected = self.data_colors[ax_idx], self.unselected_colors[ax_idx]
 			if self.cur_plot_type == "Scatter":
-				self._recolor_selection_scatter(ax, plot_ind, self.collections[ax_idx], colors)
+				self._recolor_selection_scatter(self.data_axes[ax_idx], selected, self.collections[ax_idx], colors,
+					unselected)
 			else:
-				self._recolor_selection_lineplot(plot_ind, self.collections[ax_idx], colors)
+				self._recolor_selection_lineplot(selected, self.collections[ax_idx], colors, unselected)
+		self.canvas.blit_manager.update() #Only redraws the (animated) collections
 
 
 	def _replot_selected_data(self):
@@ -727,180 +767,64 @@ class QPlotter(QtWidgets.QWidget):
 		main_ax = self.canvas.get_axis("main")
 		main_ax.set_ylim(0, 1) #Normalize
 
-		self.legend_names = []
-		self.legend_colors_dict = {}
-
-		color_based_on_col = self.settings_model.plot_color_method == self.settings_model.plot_color_method_options[0]
-		if color_based_on_col:
-			self.legend_names = self.settings_model.plot_list
-		else:
-			color_col = self.settings_model.plot_color_column
-			try:
-				self.legend_names = set([])
-				for name in  self.data_model.df[color_col].unique(): #type: ignore
-					if isinstance(name, float) and np.isnan(name) or pd.isna(name): #Treat NaN as None
-						self.legend_names.add(None)
-						continue #Don't add nan
-					self.legend_names.add(name)
-				self.legend_names = list(self.legend_names)
-			except Exception as ex: #pylint: disable=broad-exception-caught
-				log.warning(f"Cannot create color legend for this plot: {ex}")
-
-		log.debug(f"Legend names {self.legend_names}")
-
-		#Default color scheme (but only works up to 10 colors)
-		col_colors = matplotlib.cm.tab10.colors #pylint: disable=no-member #type: ignore
-		col_colors : list[list[float]] = [[*color, 1.0] for color in col_colors] #Alpha is missing by default #type: ignore
-		if len(self.legend_names) > 10: #Otherwise create a linear separation
-			#get new color for each class
-			col_colors = matplotlib.cm.rainbow(np.linspace(0,1,len(self.legend_names))) #pylint: disable=no-member #type: ignore
-
-		assert len(col_colors) >= len(self.legend_names), "Too many items in the legend - not enough colors for legend."
-
-		color_dict = {name : np.array(color) for name, color in zip(self.legend_names, col_colors)}
-		color_dict[None] = np.array([.8, .8, 0.8, 1]) #type: ignore
-
-		self.legend_colors_dict = color_dict
-
-		log.debug(f"Trying to plot columns: {list(self.settings_model.plot_list)}")
-
-
-
 		minmaxes = []
 		XYs = [] #pylint: disable=invalid-name
-		self.data_locs = []
 		self.data_axes = []
 		self.collections = [] #in the case of scatterplots
-		self.cur_plot_type = self.settings_model.plot_type
 
-
-		self.data_colors = []
-
-		previous_ax_rect_loc = (0,0)
+		self._twin_rectangles = []
+		for drag_detector in self._drag_detectors:
+			drag_detector.disconnect()
 		self._drag_detectors = []
 
-		assert(self.selected_data is not None), "Selected data is None, cannot replot. This should have been caught earlier."
-		# exit(0)
-		for col, col_color in zip(list(self.settings_model.plot_list), col_colors): #go over columns (and color them)
-
-			if col is None or col == "": #skip empty colnames
-				continue
-
-			nan_mask = np.isfinite(self.selected_data[col])
-
-			cur_locs = self.selected_data.index.to_numpy()[nan_mask]
-			self.data_locs.append(cur_locs) #To translate in-graph selection back to pandas selection
-			x_vals = self.selected_data[self.settings_model.x_axis].to_numpy()[nan_mask] #Remove nan entries
-			y_vals = self.selected_data[col].to_numpy()[nan_mask]
-
-			if len(x_vals) == 0 or len(y_vals) == 0: #Skip if no data
-				log.info(f"Columns {col} contained no data... Skipping plotting")
-				continue
+		for series in self._reload_plot_series(): #go over columns (and color them)
+			col, col_color = series.column, series.color
+			x_vals, y_vals = series.x_vals, series.y_vals
 
 			cur_ax : matplotlib.axes.Axes = self.canvas.get_twinx("main", col) #Get
-			if isinstance(x_vals[0], pd.Timestamp)\
-					or isinstance(x_vals[0], np.datetime64)\
-					or pd.api.types.is_datetime64_any_dtype(x_vals[0]):
-				x_vals : np.ndarray = matplotlib.dates.date2num(x_vals) #type: ignore
-
-
-
-
-			XYs.append( np.vstack((x_vals, y_vals)).T)
+			XYs.append( np.vstack((x_vals, y_vals)).T) #Full resolution, so selections map back to all locs
 			self.data_axes.append(cur_ax)
 			cur_ax.yaxis.label.set_color(col_color) #type: ignore #(r, g, b, a)
 			cur_ax.spines['right'].set_color(col_color) #type: ignore
 
-			diff =  abs((max(y_vals) - min(y_vals))* 0.05) #type: ignore
-			minmax = ( min(y_vals) - diff, max(y_vals) + diff) #Take some leeway in the plot to better see edges
-			cur_ax.set_ylim(minmax) #type: ignore
-			minmaxes.append(minmax)
+			cur_ax.set_ylim(series.minmax) #type: ignore
+			minmaxes.append(series.minmax)
 
+			cur_ax.tick_params(axis='y', colors=col_color, labelrotation=90)
 			x_transform = mtransforms.IdentityTransform() \
 				+ mtransforms.ScaledTranslation(1,0, cur_ax.transAxes) #Set axes-based offset (right outer edge of axis)
 			transform = mtransforms.blended_transform_factory(
 				x_transform, cur_ax.transAxes) #x-axis in pixels, y-axis in axes coords
-
-			dpi = self.canvas.figure.get_dpi()
-
-			cur_ax.spines['right'].set_position(
-				('outward', previous_ax_rect_loc[0]/(0.013888*dpi)) #NOTE: 1.388=@100dpi, probabably amount of inches?
-				# 	This fix `should` work on all dpi's
-			) #each axis 60 pixels to the right #TODO: constant?
-			cur_ax.tick_params(axis='y', colors=col_color, labelrotation=90)
-			spine_width = cur_ax.spines['right'].get_tightbbox(
-				self.canvas.get_renderer()).width + self.settings_model.font_size
-			#Also add the width of the ticklabels
-			spine_width += cur_ax.yaxis.get_ticklabels()[0].get_window_extent().width
-
-
-			self.rectangle = matplotlib.patches.Rectangle(
-				(previous_ax_rect_loc[0], previous_ax_rect_loc[1]),
-				spine_width,
-				1,
-				fc=col_color,
-				alpha=0.15,
-				transform=transform,
-				clip_on=False
-			) #TODO: Not sure shy a factor is neccesary here,
-
-			previous_ax_rect_loc = ( #Get top right corner of rectangl
-				self.rectangle.get_bbox().get_points()[1][0], #x1y1-> pick x1
-				self.rectangle.get_bbox().get_points()[0][1] #x0y0 -> pick y0 -> results in top right
-			)
+			self.rectangle = matplotlib.patches.Rectangle((0, 0), 0, 1, fc=col_color, alpha=0.15, transform=transform,
+				clip_on=False) #Positioned by _layout_twin_spines
 			cur_ax.add_artist(self.rectangle)
+			self._twin_rectangles.append(self.rectangle)
 
 
 			self._drag_detectors.append(
 				DragDetector(canvas = self.canvas, ax=cur_ax, rect = self.rectangle, toolbar=self.toolbar)
 			)
-
-			if color_based_on_col: #If all datapoints same color
-				self.data_colors.append(np.tile(
-					np.array([col_color[0], col_color[1], col_color[2], 1.0]), (len(x_vals), 1)), )
-			else: #If color based on class
-				color_col = "ERR"
-				try:
-					color_col = self.settings_model.plot_color_column
-					color_arr = self.selected_data.loc[nan_mask, color_col].fillna(np.nan).replace(
-						{np.nan:None, nan:None, None: None, pd.NaT : None, pd.NA: None}
-					) #NOTE/TODO: Inserting np.nan in a separate dictionary and then calling replace does
-					# 	not work and results in only the first Nan value being replaced, only if np.nan is in the
-					# 	constructore inside .replace() as denoted here
-					color_arr = np.array(color_arr.map(color_dict).tolist())#[nan_mask]
-					self.data_colors.append(color_arr)
-
-
-				except KeyError as err:
-					raise KeyError(f"KeyError: Selected color-column ({color_col}) resulted in error: {err}, please "
-		    			f"make sure an existing column is selected under Plot Colors") from err
-			# idx_sorted = np.argsort(self.legend_names)
 			log.debug(f"Plotting column: {col}")
 
 
 			if self.cur_plot_type == "Scatter":
-				self.collections.append(cur_ax.scatter(x_vals, y_vals, c=self.data_colors[-1], label=col, s=1)) #Always plt scatter
+				self.collections.append(cur_ax.scatter(x_vals, y_vals, c=series.colors, label=col, s=1)) #Always plt scatter
 			else:
-
-				#========== Set color for points far from eachother =========
-				dts = self.selected_data["DateTime"].to_numpy()[nan_mask] #TODO: "DateTime is hardcoded here"
-				dt_distances = (dts[:-1] - dts[1:]) / np.timedelta64(1, 's')
-				dt_distances_mask = dt_distances > 100 #If more than 100 seconds
-				#Select data colors => skip last value => all where threshold is true => set alpha (-1) to 0.1
-				self.data_colors[-1][:-1][dt_distances_mask] = self.data_colors[-1][:-1][dt_distances_mask] * [1, 1, 1, 0.1]
-
 				#===============0.298 lineplot ====================
-				line_starts = np.expand_dims(np.vstack((x_vals[:-1], y_vals[:-1])), axis=1)
-				line_ends = np.expand_dims(np.vstack((x_vals[1:], y_vals[1:])), axis=1)
+				x_plot, y_plot = x_vals[series.positions], y_vals[series.positions]
+				line_starts = np.expand_dims(np.vstack((x_plot[:-1], y_plot[:-1])), axis=1)
+				line_ends = np.expand_dims(np.vstack((x_plot[1:], y_plot[1:])), axis=1)
 				lines = np.vstack((line_starts, line_ends)).T
-				lines = lines.reshape(len(x_vals) - 1, 2, 2)
-				line_coll = matplotlib.collections.LineCollection(lines, colors=self.data_colors[-1]) #type: ignore
+				lines = lines.reshape(len(x_plot) - 1, 2, 2)
+				line_coll = matplotlib.collections.LineCollection(lines, colors=series.colors) #type: ignore
 				cur_ax.add_collection(line_coll) #type: ignore
 				self.collections.append(line_coll)
+			self.canvas.blit_manager.add_artist(self.collections[-1]) #Recolored on selection changes
 
 			log.debug("Data collections created and added to matplotlib")
 
 
+		self._layout_twin_spines()
 		self.canvas.ax_dict["main"].set_facecolor([0, 0, 0, 0]) #Make main axis transparent #type: ignore
 
 		#set rspline of main axis invisible
@@ -911,11 +835,63 @@ class QPlotter(QtWidgets.QWidget):
 
 		self.selector.reset_all(self.canvas.ax_dict["main"], XYs, minmaxes, self.data_locs) #type: ignore
 
-		if self.data_model.df_selection is not None and len(self.data_model.df_selection) > 0: #If at least 1 points slected
-			self._set_selection(self.data_model.df_selection)
+		if self.data_model.selection_count > 0: #If at least 1 points slected
+			self._set_selection(self.data_model.selection_mask)
 
 		log.debug(f"legend colors: {self.legend_colors_dict}")
 
+	def _create_colorbar_legend(self, ax : matplotlib.axes.Axes, handles : np.ndarray, names : np.ndarray): #pylint: disable=invalid-name
+		"""(Re)create the legend of the label classes below the (last) label track"""
+		if self._colorbar_legend is not None and self._colorbar_legend.axes is not None:
+			self._colorbar_legend.remove()
+		self._colorbar_legend = ax.legend(handles,
+			names,
+			loc='upper center',
+			bbox_to_anchor=(0.5, -1.5),
+			ncol = min(10, len(names)),
+			frameon = False
+		)
+		self._colorbar_legend_entries = (handles, names)
+
+	def _layout_twin_spines(self):
+		"""Place the spines of the twin-axes of the plotted series next to each other (and the rectangles behind them,
+		used to drag the axes), the offsets depend on the width of the tick labels (e.g. after a font size change)"""
+		previous_ax_rect_loc = (0,0)
+		dpi = self.canvas.figure.get_dpi()
+		for cur_ax, rectangle in zip(self.data_axes, self._twin_rectangles):
+			cur_ax.spines['right'].set_position(
+				('outward', previous_ax_rect_loc[0]/(0.013888*dpi)) #NOTE: 1.388=@100dpi, probabably amount of inches?
+				# 	This fix `should` work on all dpi's
+			) #each axis 60 pixels to the right #TODO: constant?
+			spine_width = cur_ax.spines['right'].get_tightbbox(
+				self.canvas.get_renderer()).width + self.settings_model.font_size
+			#Also add the width of the ticklabels
+			spine_width += cur_ax.yaxis.get_ticklabels()[0].get_window_extent().width
+
+			rectangle.set_xy(previous_ax_rect_loc)
+			rectangle.set_width(spine_width)
+			previous_ax_rect_loc = ( #Get top right corner of rectangl
+				rectangle.get_bbox().get_points()[1][0], #x1y1-> pick x1
+				rectangle.get_bbox().get_points()[0][1] #x0y0 -> pick y0 -> results in top right
+			)
+
+	def _apply_font_size(self):
+		"""Apply the font size to the (kept) axes, existing tick and axis labels do not follow rcParams"""
+		font_size = self.settings_model.font_size
+		matplotlib.rcParams.update({'font.size' : font_size}) #For newly created text (e.g. legends, titles)
+		for name, ax in self.canvas.ax_dict.items(): #pylint: disable=invalid-name
+			for cur_ax in [ax, *self.canvas.twinxes.get(name, {}).values()]:
+				cur_ax.tick_params(labelsize=font_size)
+				cur_ax.xaxis.label.set_size(font_size)
+				cur_ax.yaxis.label.set_size(font_size)
+				cur_ax.xaxis.get_offset_text().set_size(font_size)
+				cur_ax.yaxis.get_offset_text().set_size(font_size)
+		if self._plotted_font_size is not None and font_size != self._plotted_font_size:
+			self._layout_twin_spines()
+			if self._colorbar_legend is not None: #The size of the entries is fixed when the legend is created
+				self._create_colorbar_legend(self._colorbar_legend.axes, *self._colorbar_legend_entries)
+		self._plotted_font_size = font_size
+
 	# def _set_ylim_factor(self, ax_name : str, )
 
 
@@ -931,7 +907,7 @@ class QPlotter(QtWidgets.QWidget):
 
 		log.debug(f"legend colors: {self.legend_colors_dict}")
 
-
+		self._apply_font_size()
 		self.canvas.figure.suptitle(self.plot_title)
 
 		self.canvas.ax_dict["main"].set_xlim(
@@ -953,6 +929,7 @@ class QPlotter(QtWidgets.QWidget):
 			self.canvas.ax_dict[name].tick_params(labelbottom=False)#Remove ticks
 
 
+		self.canvas.ax_dict[self.canvas.ax_order[-1]].tick_params(labelbottom=True) #Might not have been the last axis
 		if self.settings_model.x_axis == "DateTime":
 			temp = matplotlib.dates.AutoDateLocator()
 			self.canvas.ax_dict[self.canvas.ax_order[-1]].xaxis.set_major_formatter(matplotlib.dates.ConciseDateFormatter(temp))
@@ -964,6 +941,8 @@ class QPlotter(QtWidgets.QWidget):
 		if self.settings_model.plotted_labels_list is not None and len(self.settings_model.plotted_labels_list) > 0:
 			#Make sure y-labels don't overlap with label
 			plt.setp(self.canvas.ax_dict["main"].get_yticklabels(), va="bottom")
+		else: #The axis is kept between replots, restore the default alignment of a previous label-plot
+			plt.setp(self.canvas.ax_dict["main"].get_yticklabels(), va="center_baseline")
 
 			# #Also put x-axis label in the bottom left corner
 			# self.canvas.ax_dict[self.canvas.ax_order[-1]].xaxis.set_label_coords(0, -0.1, align="left")
@@ -973,89 +952,33 @@ class QPlotter(QtWidgets.QWidget):
 		self.canvas.figure.tight_layout()
 
 
-	def _reload_selected_data(self):
-		"""Reload the main """
-		#===========Plot xlim===================== TODO: xlim implementation
-		x_axis = self.settings_model.x_axis
-		plot_xlim = self.settings_model.plot_domain_limrange
-		self.plot_title = ""
-		self.selected_data = self.data_model.df #Create dataframe view of data that is to be plotted
-
-		for filt in self.settings_model.plot_filters:
-			try:
-				temp = filt(self.selected_data)
-				self.selected_data = temp
-			except Exception as err: #pylint: disable=broad-exception-caught
-				msg = f"Issue while filtering data in view : {err}"
-				log.error(msg)
-				create_qt_warningbox(msg)
-
-		assert self.selected_data is not None
-		self.selected_data = self.selected_data.loc[
-			self.selected_data.index.difference(list(self.data_model.hidden_datapoints))]
-
-
-		if plot_xlim is not None and x_axis is not None:
-			log.info(f"Setting plot xlim to : {plot_xlim}")
-
-			if plot_xlim.left_val is not None: #if xmin specified
-				log.info(f"Setting xlim to min {plot_xlim.left_val}")
-				self.selected_data = self.selected_data[ self.selected_data[x_axis] >= plot_xlim.left_val ]
-
-				#If x_axis reformatted left val is float, round to 2 decimal places in title
-				if isinstance(plot_xlim.left_val, float): #TODO: create a title formatter - is more neat
-					self.plot_title += str(round(plot_xlim.left_val, 2)) + "  -  "
-				else:
-					self.plot_title += self.plot_title_reformatter(plot_xlim.left_val) + "  -  "
-
-
-			else:
-				self.plot_title += "x  -  "
-
-			if plot_xlim.right_val is not None:  #If xmax specified
-				log.info(f"Setting xlim to max {plot_xlim.right_val}")
-
-				if isinstance(plot_xlim.right_val, float):
-					self.plot_title += str(round(plot_xlim.right_val, 2))
-				else:
-					self.plot_title += self.plot_title_reformatter(plot_xlim.right_val)
-
-
-				self.selected_data = self.selected_data[ self.selected_data[x_axis] <= plot_xlim.right_val ]
-			else:
-				self.plot_title += "x"
-			# if plot_xlim[0] is not None and plot_xlim[1] is not None: #TODO: do this in-plot
-			# 	self.canvas.ax.set_xlim(plot_xlim[0], plot_xlim[1])
-		else:
-			log.info(f"Plot xlim {self.settings_model.plot_domain_limrange} not used for axis {x_axis} due to <None> "
-	    		"value (either left/right/xname)")
-
-
-		#=============== Plot datetime ===================
-
-
 	@catch_show_exception_in_popup_decorator(custom_error_msg="<b>Plotting Failed</b>", re_raise=False)
-	def _replot(self):
+	def _replot(self, is_stale : typing.Optional[typing.Callable[[], bool]] = None) -> bool:
+		"""Replot everything, if is_stale is passed, replotting stops as soon as it returns True (a newer replot was
+		requested). Returns whether the replot completed."""
+		is_stale = is_stale if is_stale is not None else lambda: False
+		self._plot_state = None #Only set once the replot completes
 		self._colorbar_legend = None
-		if self.data_model.df is None:
-			log.error("Replot failed: no dataframe loaded")
-			raise PlotError("No dataframe loaded")
-		if self.settings_model.x_axis is None:
-			log.error("Replot failed: No x-axis selected")
-			raise PlotError("No x-axis selected")
-		if self.settings_model.plot_list is None or len(self.settings_model.plot_list) == 0:
-			if self.settings_model.plotted_labels_list is None or len(self.settings_model.plotted_labels_list) == 0:
-				log.error("Replot failed: No columns selected")
-				raise PlotError("No plot or label columns selected")
+		self._fft_artist, self._fft_image_values = None, None #Removed when the axes are cleared
+		self._check_plottable()
 
 		matplotlib.rcParams.update({'font.size' : self.settings_model.font_size}) #Setting font size
-		self.canvas.remove_axes(except_main=True) #Only keep main axis
+		if self._layout_x_axis != self.settings_model.x_axis: #Units/formatters of the shared x-axis can not be reset
+			self.canvas.reset_axes()
+			self._layout_x_axis = self.settings_model.x_axis
+		else: #Keep the axes (and twinxes), only remove their artists
+			self.canvas.clear_axes()
+		main_ax = self.canvas.get_axis("main")
+		main_ax.yaxis.set_visible(True) #Hidden while the fft is plotted
+		main_ax.set_zorder(0)
 
 		self.canvas.figure.subplots_adjust(hspace=0.0)
 		before = time.perf_counter()
 		self._reload_selected_data()
 		log.debug(f"Reloading selected data took: {time.perf_counter() - before}")
 		self._replot_colorbars()
+		if is_stale():
+			return False
 
 
 		if self.settings_model.fft_toggle: #if fft is toggled on
@@ -1065,16 +988,25 @@ class QPlotter(QtWidgets.QWidget):
 			else:
 				self._reload_fft_data()
 				self._replot_fft()
+			if is_stale(): #E.g. requested while the warning was shown
+				return False
 		else:
 			self.canvas.ax_dict["main"].set_zorder(10) #Draw main axis on top for selection purposes (though this seems
 			#	to make it so pcolormesh is drawn over all other plots so only do this if fft is off )
 		before = time.perf_counter()
 		self._replot_selected_data()
+		self.canvas.remove_unused_twinxes() #E.g. of columns that are no longer plotted
 		log.debug(f"Replotting selected data took: {time.perf_counter() - before}")
 		self._replot_ax_style()
 
 		before = time.perf_counter()
+		if is_stale():
+			return False
 
 		# self.canvas.ax_dict["main"].patch.set_visible(False)
 		self.canvas.draw() #Redraw everything
 		log.debug(f"Drawingdata took: {time.perf_counter() - before}")
+		self._plot_state = self._get_plot_state()
+		self._plotted_fft_key = self._get_fft_key()
+		self._plotted_series_key = self._get_series_key()
+		return True
@@ -0,0 +1,782 @@
+"""
+Implements the backend-independent part of the plotters.
+
+PlotterBase - Uses the datamodel and settingsmodel to prepare the data that is plotted (the plotted domain, the drawn
+	points of each series and their colors, the label tracks and the fft-data) and handles the selections made in the
+	plot. The plotting backends (see plot_backends) derive from this class and only implement the drawing:
+		- QPlotter (plot_wrapper) draws using matplotlib, used by default and for export-quality figures
+		- PyQtGraphPlotter (pyqtgraph_plotter) draws using pyqtgraph on an OpenGL-surface, for large amounts of points
+
+And:
+PlotSeries - The data of a single plotted series (column)
+"""
+import datetime
+import logging
+import math
+import numbers
+import traceback
+import typing
+from cmath import nan
+
+import keyboard
+import matplotlib
+import matplotlib.cm
+import matplotlib.colors
+import matplotlib.dates
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from PySide6 import QtWidgets
+
+from mvts_analyzer.graphing.graph_data import GraphData, OperationType
+from mvts_analyzer.graphing.graph_settings_model import GraphSettingsModel
+from mvts_analyzer.graphing.plotter.replot_scheduler import (ReplotScheduler,
+                                                             ReplotStage)
+from mvts_analyzer.graphing.plotter.spectrogram_cache import \
+    SpectrogramTileCache
+from mvts_analyzer.utility import downsampling, label_runs
+from mvts_analyzer.utility.gui_utility import create_qt_warningbox
+
+log = logging.getLogger(__name__)
+
+
+class PlotError(Exception):
+	"""Exception raised when plotting fails"""
+
+
+class PlotSeries(typing.NamedTuple):
+	"""The data of a plotted series (column), only the points at positions are drawn"""
+	column : str
+	color : typing.List[float] #(r, g, b, a) color of the column
+	locs : np.ndarray #The pandas idx of each (non-NaN) row
+	x_vals : np.ndarray #(float) x-values of each row, datetimes are converted using date2num
+	y_vals : np.ndarray
+	positions : np.ndarray #The positions (in locs/x_vals/y_vals) of the drawn points
+	colors : np.ndarray #(RGBA) color of each drawn point, for lines: of the segment that starts at this point
+	minmax : typing.Tuple[float, float] #The y-limits of the series
+
+
+class PlotterBase(QtWidgets.QWidget):
+	"""
+	Base class of the plotters, prepares the plotted data using the data/settings-models, the drawing itself is done by
+	the derived classes, which should implement _replot, _set_selection, _get_plot_width and the methods used by the
+	controller/view (restyle_fft, get_view_xlim, get_view_ylim, save_figure and open_save_popup).
+	"""
+	def __init__(self,
+				data_model : GraphData,
+				settings_model : GraphSettingsModel,
+				*args,
+				**kwargs
+			):
+		super().__init__(*args, **kwargs)
+		self.settings_model = settings_model
+		self.data_model = data_model
+
+		self.model = None
+		self.selected_data = None #The intermediate dataframe used to plot the main data
+		self._dt_rows = None #(start, stop) DateTime-sorted rows if selected_data is exactly these sorted rows
+		self._selected_positions = None #Positions (iloc) in the dataframe of each row in selected_data (if known)
+		self._selected_data_sorted = False #Whether selected_data is sorted by DateTime (and restricted to the domain)
+		self.selection_exclusion_brightness = 0.75 #The brightness factor for the points not selected
+		self.plot_title = "-"
+		self.fft_data = (None, None, None) #(times, frequencies, raw (lines x rows) data)
+		self.fft_tile_cache = SpectrogramTileCache(self.data_model)
+		self.replot_scheduler = ReplotScheduler(self._render_scheduled, parent=self) #Coalesces replot-requests
+		self.replot_scheduler.invalidate(ReplotStage.ALL) #Nothing has been plotted yet
+		self._fft_stats : typing.Optional[typing.Tuple[float, float]] = None #(min, mean) of the fft-data
+
+		self.cur_pd_selection = np.zeros(0, dtype=bool) #Boolean mask (aligned with the dataframe) of the current selection
+		self.data_model.dfSelectionChanged.connect(self._set_selection)
+
+		#============== Other ==================
+		self.legend_names = []
+		self.legend_colors_dict = {}
+		self.data_locs = []
+		self.plotted_positions = [] #Per axis: positions (in data_locs) of the points that are actually drawn
+		self.plotted_df_positions = [] #Per axis: positions (iloc) in the dataframe of the drawn points (or None)
+		self.unselected_colors = [] #Per axis: the (lightened) colors of drawn points that are not selected
+		self.plotted_columns = [] #Per axis: the plotted column
+		self.cur_plot_type = self.settings_model.plot_type
+		self.data_colors = []
+
+		#============== Level of detail ==================
+		self.lod_enabled = True #Whether to reduce line-plots to a few points per pixel (min/max decimation)
+		self.lod_pixels_per_bucket = 1 #Horizontal pixels per min/max bucket
+		self.fft_raster_enabled = True #Whether to draw regularly sampled fft-data as a canvas-sized image instead of a mesh
+		self.fft_uniform_tolerance = 0.05 #Max relative deviation of the time-steps to be seen as regularly sampled
+
+	#======================== Implemented by the plotting backends ========================
+
+	def _replot(self, is_stale : typing.Optional[typing.Callable[[], bool]] = None) -> bool:
+		"""Replot everything, if is_stale is passed, replotting stops as soon as it returns True (a newer replot was
+		requested). Returns whether the replot completed."""
+		raise NotImplementedError()
+
+	def _set_selection(self, selection : typing.Union[np.ndarray, set]):
+		"""Recolor the plotted data according to the passed selection (see get_series_selections)"""
+		raise NotImplementedError()
+
+	def _get_plot_width(self) -> float:
+		"""The width (in pixels) of the plot-area, used to determine the amount of drawn points (see LOD)"""
+		raise NotImplementedError()
+
+	def restyle_fft(self):
+		"""Only update the colors (colormap, transparency and brightness) of the drawn fft-data, without reloading or
+		redrawing the data itself"""
+		raise NotImplementedError()
+
+	def get_view_xlim(self) -> typing.Tuple[float, float]:
+		"""The currently visible x-range of the plot, datetimes as matplotlib date-numbers"""
+		raise NotImplementedError()
+
+	def get_view_ylim(self) -> typing.Tuple[float, float]:
+		"""The currently visible y-range of the main axis, normalized (0.0-1.0 is the plotted range)"""
+		raise NotImplementedError()
+
+	def save_figure(self, target : typing.Union[str, typing.BinaryIO], file_format : typing.Optional[str] = None):
+		"""Save the figure to a file(-name) or buffer, if no file-format is passed, it is derived from the file-name
+		(png for buffers)"""
+		raise NotImplementedError()
+
+	def open_save_popup(self):
+		"""Show popup to save figure to file"""
+		raise NotImplementedError()
+
+	#=========================================================================================
+
+	def _render_scheduled(self, stages : ReplotStage, is_stale : typing.Callable[[], bool]) -> bool:
+		"""Render a scheduled replot (see ReplotScheduler), by default, everything is replotted"""
+		log.debug(f"Now rendering scheduled replot (stages: {stages})")
+		return self._replot(is_stale=is_stale) is not False #Failed replots (None) are shown in a popup by _replot
+
+	def _check_plottable(self):
+		"""Raises a PlotError if the current data/settings can not be plotted"""
+		if self.data_model.df is None:
+			log.error("Replot failed: no dataframe loaded")
+			raise PlotError("No dataframe loaded")
+		if self.settings_model.x_axis is None:
+			log.error("Replot failed: No x-axis selected")
+			raise PlotError("No x-axis selected")
+		if self.settings_model.plot_list is None or len(self.settings_model.plot_list) == 0:
+			if self.settings_model.plotted_labels_list is None or len(self.settings_model.plotted_labels_list) == 0:
+				log.error("Replot failed: No columns selected")
+				raise PlotError("No plot or label columns selected")
+
+	def handle_selection_change(self, new_selection : set):
+		"""Handle selection change, detect which key is being pressed and update the selection accordingly"""
+		mode = OperationType.OVERWRITE
+		try:  # used try so that if user pressed other than the given key error will not be shown
+			if keyboard.is_pressed('ctrl') or keyboard.is_pressed('shift'):  # if key 'q' is pressed
+				mode = OperationType.APPEND
+			elif keyboard.is_pressed('alt'):
+				mode = OperationType.COMPLEMENT
+		except Exception: #pylint: disable=broad-exception-caught
+			pass
+		self.data_model.set_df_selection(new_selection, mode, fill_gaps_ms=self.settings_model.selection_gap_fill_ms)
+
+	@staticmethod
+	def plot_title_reformatter(val):
+		"""Formats the title according to type of data"""
+		if isinstance(val, datetime.datetime):
+			val = val.strftime("%Y-%m-%d %H:%M:%S") #up until seconds precision
+		else:
+			val = str(val)
+
+		return val
+
+	def replot(self,):
+		"""Replots the data using the current settings.
+		Note that we should not change the (plot)settings/data while replotting, as this could lead to unexpected
+		behaviour.
+
+		The replotting process consists of:
+			- Clearing the axes
+			- Plotting the main data
+			- Plotting the fft data
+			- Plotting the selection
+			- Plotting the annotations
+			- Plotting the selectors
+			etc.
+		"""
+		log.debug("Now trying to replot...")
+		try:
+			self._replot()
+		except Exception as err: #pylint: disable=broad-exception-caught
+			log.error(traceback.format_exc(), err)
+			create_qt_warningbox(str(err), "Exception during replot: {err}")
+
+	def schedule_replot(self, stages : ReplotStage = ReplotStage.NONE):
+		"""Request a replot, all requests made before control returns to the event loop are combined into a single
+		replot (see ReplotScheduler). Backends that support partial replots (see QPlotter) only re-execute the stages
+		that were invalidated since the last replot (by changed settings or data) and the passed stages."""
+		self.replot_scheduler.request(stages)
+
+	def _get_fft_cmap(self) -> matplotlib.colors.Colormap:
+		"""Get the colormap of the fft-data using the current colormap/transparency settings"""
+		log.debug(f"Chose for fft_color {self.settings_model.fft_color_map}")
+		if self.settings_model.fft_color_map == "BlueYellowRed":
+
+			colordict = [
+				(0, "Blue"),
+				(0.9999, "Yellow"),
+				(1.0, "Red")
+			]
+			fft_cmap = matplotlib.colors.LinearSegmentedColormap.from_list("custom", colordict, N=256)
+
+		else:
+			fft_cmap = plt.get_cmap(self.settings_model.fft_color_map) #type: ignore
+
+
+
+		fft_cmap = fft_cmap(np.arange(fft_cmap.N)) #type: ignore
+		fft_cmap[:, -1] = self.settings_model.fft_transparency #type: ignore
+		return matplotlib.colors.ListedColormap(fft_cmap) #type: ignore
+
+	def _get_fft_clim(self) -> typing.Tuple[float, typing.Optional[float]]:
+		"""Get the color limits of the raw fft-data using the current brightness. This is equal to normalizing the data
+		by its mean and multiplying it by pow(brightness * 2, 5), then mapping [min, 1.0] onto the colormap.
+		"""
+		z_min, z_mean = self._fft_stats if self._fft_stats is not None else (0.0, 1.0)
+		factor = pow(self.settings_model.fft_brightness * 2, 5)
+		if factor <= 0 or z_mean <= 0:
+			return z_min, None #Autoscale
+		vmax = z_mean / factor
+		return min(z_min, vmax), vmax
+
+	def _get_fft_rgba(self, values : np.ndarray, fft_cmap : matplotlib.colors.Colormap) -> np.ndarray:
+		"""Map (lines x columns) fft-values to an RGBA (uint8) image using the current brightness"""
+		vmin, vmax = self._get_fft_clim()
+		norm = matplotlib.colors.Normalize(vmin=vmin, vmax=vmax if vmax is not None else float(values.max()))
+		return fft_cmap(norm(values), bytes=True)
+
+	def _get_fft_raster(self,
+				fft_x : np.ndarray,
+				fft_z : np.ndarray,
+				size : typing.Tuple[float, float]
+			) -> typing.Optional[typing.Tuple[np.ndarray, typing.Tuple[float, float, float, float]]]:
+		"""If the fft-data is regularly sampled (gaps are allowed), average it down to (at most) the pixel-size of the
+		axis.
+
+		Args:
+			fft_x (np.ndarray): The (sorted) times of the fft-data
+			fft_z (np.ndarray): The (lines x rows) fft-data
+			size (typing.Tuple[float, float]): The (width, height) in pixels of the axis the data will be drawn on
+
+		Returns:
+			typing.Optional[typing.Tuple[np.ndarray, typing.Tuple[float, float, float, float]]]: The (lines x columns)
+				averaged values and the (left, right, bottom, top) extent of the image. None if the times are not
+				regularly sampled.
+		"""
+		times = pd.DatetimeIndex(fft_x).asi8 #(UTC) nanoseconds
+		grid = downsampling.get_grid_positions(times, self.fft_uniform_tolerance)
+		if grid is None:
+			return None
+		step, positions = grid
+		n_lines = fft_z.shape[0]
+		n_grid = int(positions[-1]) + 1
+		x_factor = max(1, math.ceil(n_grid / max(1, int(size[0]))))
+		y_factor = max(1, math.ceil(n_lines / max(1, int(size[1]))))
+
+		#Average the rows within each column (x_factor grid-steps) and the lines within each pixel-row of the image
+		n_columns = math.ceil(n_grid / x_factor)
+		if n_grid == len(positions): #No gaps -> equally sized bins
+			values = downsampling.bin_mean(fft_z.T, x_factor, y_factor) #(rows x lines) is contiguous
+		else:
+			starts = np.searchsorted(positions, np.arange(n_columns) * x_factor, side="left")
+			counts = np.diff(np.append(starts, len(positions)))
+			filled = np.flatnonzero(counts > 0)
+			values = downsampling.bin_mean(downsampling.grouped_mean(fft_z.T, starts[filled]), 1, y_factor)
+			if len(filled) < n_columns: #Use the nearest column with data (as pcolormesh would)
+				columns = np.arange(n_columns)
+				prev_filled = np.maximum(np.searchsorted(filled, columns, side="right") - 1, 0)
+				next_filled = np.minimum(prev_filled + 1, len(filled) - 1)
+				use_next = np.abs(filled[next_filled] - columns) < np.abs(columns - filled[prev_filled])
+				values = values[np.where(use_next, next_filled, prev_filled)]
+		values = values.T
+
+		#Same extent as the (nearest-shaded) mesh, the last column/row is stretched by less than a pixel
+		left, right = times[0] - step / 2, times[-1] + step / 2
+		left, right = matplotlib.dates.date2num(np.array([left, right], dtype="int64").astype("datetime64[ns]"))
+		bottom, top = -0.5 / n_lines, (n_lines - 0.5) / n_lines #Line-centers are at i/n_lines
+		return np.ascontiguousarray(values), (left, right, bottom, top)
+
+	@staticmethod
+	def _bin_fft_mesh(
+				fft_x : np.ndarray,
+				fft_y : np.ndarray,
+				fft_z : np.ndarray,
+				size : typing.Tuple[float, float]
+			) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+		"""Average (irregularly sampled) fft-data down to (about) the pixel-size of the axis, groups of consecutive rows
+		are drawn at their mean time and groups of lines at their mean frequency. Size is the (width, height) in pixels
+		of the axis the data will be drawn on."""
+		x_factor = math.ceil(len(fft_x) / max(1, int(size[0])))
+		y_factor = math.ceil(len(fft_y) / max(1, int(size[1])))
+		if x_factor <= 1 and y_factor <= 1:
+			return fft_x, fft_y, fft_z
+		times = pd.DatetimeIndex(fft_x).asi8.astype(np.float64)[:, np.newaxis]
+		fft_x = downsampling.bin_mean(times, x_factor, dtype=np.float64)[:, 0].astype("int64").astype("datetime64[ns]")
+		fft_y = downsampling.bin_mean(fft_y[:, np.newaxis], y_factor, dtype=np.float64)[:, 0]
+		return fft_x, fft_y, downsampling.bin_mean(fft_z.T, x_factor, y_factor).T
+
+	def _reload_fft_data(self):
+		log.info("Now reloading FFT data")
+
+
+		# cur_ax.spines['left'].set_visible(True)
+		self.fft_data, self._fft_stats = (None, None, None), None
+		if self.settings_model.fft_column == "" or self.settings_model.fft_column is None:
+			log.info("Selected FFT column is empty, not plotting")
+			return
+
+		plot_xlim = self.settings_model.plot_domain_limrange
+		line_left, line_right = self.settings_model.fft_line_range_left, self.settings_model.fft_line_range_right
+		y_res_reduction = int(51 - 50*math.pow(self.settings_model.fft_quality, 1/5))
+
+		fft_window = None
+		if self.data_model.dt_sort_order is not None: #Use the cached (already reduced) tiles of the contiguous matrix
+			fft_window = self.fft_tile_cache.get_window(self.settings_model.fft_column,
+				line_left, line_right, y_res_reduction, plot_xlim.left_val, plot_xlim.right_val,
+				max_columns=int(self._get_plot_width())) #Time-binned to about the resolution of the plot
+
+		if fft_window is not None:
+			fft_x, fft_z = fft_window
+		else:
+			cols = ["DateTime", self.settings_model.fft_column]
+			fft_df = self.data_model.df[cols] #type: ignore #Assertion is done on replot()-call, so ignore none-possibility
+
+			if self.data_model.dt_sort_order is not None: #Binary search the domain in the sorted rows
+				fft_df = fft_df.iloc[self.data_model.get_dt_indexer(plot_xlim.left_val, plot_xlim.right_val)].dropna()
+			else:
+				fft_df = fft_df.sort_values("DateTime", ascending=True).dropna() #TODO: make this more elegant
+				if plot_xlim.left_val is not None: #if xmin specified
+					fft_df = fft_df[ fft_df["DateTime"] >= plot_xlim.left_val]
+				if plot_xlim.right_val is not None:  #If xmax specified
+					fft_df = fft_df[ fft_df["DateTime"] <= plot_xlim.right_val]
+			fft_x = fft_df["DateTime"].to_numpy()
+			fft_z = np.array(
+				fft_df[self.settings_model.fft_column].tolist()
+			)[:, line_left : line_right] if not fft_df.empty else np.zeros((0, 0))
+
+			if y_res_reduction > 1 and len(fft_x) > 0:
+				fft_z = downsampling.bin_mean(fft_z, 1, y_res_reduction) #reduce y-resolution
+
+		if len(fft_x) == 0:
+			log.info("Could not create fft_data, as the fft dataframe of selection is empty")
+			return
+
+		# fft_column] creates an array of lists
+		fft_z = np.swapaxes(fft_z, 0, 1) #(lines x rows)
+		fft_y = np.arange(fft_z.shape[0]) / fft_z.shape[0] #TODO: Don't hardcode 1601, change based on amount of lines
+
+		log.debug(f"FFT max is : {np.max(fft_z)}")
+		log.debug(f"Reduction factor: {y_res_reduction}  --- Z size is: {fft_z.shape}   Y shape is: {fft_y.shape}")
+
+		self._fft_stats = (float(fft_z.min()), float(fft_z.mean()))
+		self.fft_data = (fft_x, fft_y, fft_z)
+
+	def _get_label_tracks(self,
+				label_columns : typing.List[str]
+			) -> typing.Optional[typing.Dict[str, typing.Tuple[np.ndarray, np.ndarray, typing.List[typing.Any], np.ndarray]]]:
+		"""Get the runs of each label column within the plotted data
+
+		Returns:
+			typing.Optional[typing.Dict[str, typing.Tuple[np.ndarray, np.ndarray, typing.List[typing.Any], np.ndarray]]]:
+				Per column: the edges (times) of the runs, the code of each run, the label of each code and all codes in
+				the plotted data. None if there is no plotted data.
+		"""
+		tracks = {}
+		if self._dt_rows is not None: #Plotted data is exactly the sorted rows -> clip the (cached) runs of the columns
+			start, stop = self._dt_rows
+			if stop <= start:
+				return None
+			for col in label_columns:
+				runs = self.data_model.get_label_runs(col)
+				if runs is None:
+					break
+				edges, codes = runs.clip(start, stop)
+				x_bars = self.data_model.dt_sorted_times[edges].view("datetime64[ns]") #type: ignore
+				tracks[col] = (x_bars, codes, runs.categories, runs.get_codes(start, stop))
+			else:
+				return tracks
+
+		#Filtered/hidden data -> encode the runs of the plotted data
+		if self._selected_positions is not None: #Take the labels from the dataframe, they might have changed since
+			dt_lbl_df = self.data_model.df[["DateTime", *label_columns]].iloc[self._selected_positions] #type: ignore
+		else:
+			dt_lbl_df = self.selected_data[["DateTime", *label_columns]] #type: ignore
+		if not self._selected_data_sorted:
+			dt_lbl_df = dt_lbl_df.sort_values("DateTime", ascending=True)
+		if len(dt_lbl_df) == 0:
+			return None
+		dts = dt_lbl_df["DateTime"].to_numpy()
+		for col in label_columns:
+			runs = label_runs.LabelRuns.from_values(dt_lbl_df[col])
+			edges, codes = runs.clip(0, len(dt_lbl_df))
+			tracks[col] = (dts[edges], codes, runs.categories, runs.codes)
+		return tracks
+
+	def _get_label_classes(self,
+				tracks : typing.Dict[str, typing.Tuple[np.ndarray, np.ndarray, typing.List[typing.Any], np.ndarray]]
+			) -> typing.Tuple[np.ndarray, np.ndarray, typing.Dict[str, np.ndarray]]:
+		"""Get the classes of the label tracks (see _get_label_tracks) and the color of each class
+
+		Returns:
+			typing.Tuple[np.ndarray, np.ndarray, typing.Dict[str, np.ndarray]]: The classes ("None" first), the (RGBA)
+				color of each class and per column: the class-number (index in the classes) of each run
+		"""
+		all_classes = set({})
+		for _, _, categories, used_codes in tracks.values(): #Use this for only classes in current view
+			all_classes.update(categories[code] for code in np.unique(used_codes) if code != label_runs.MISSING_CODE)
+		all_classes = [i for i in all_classes if i is not None
+			and not pd.isna(i)
+			and(not isinstance(i, numbers.Number) or not np.isnan(i)) and i != "nan" #type: ignore
+		] #All classes except NaN (numpy), <NA> (pandas) (make sure to check for <NA> first)
+
+
+		all_classes = set([i for i in all_classes if i != "None"])
+		log.debug(f"Found classes: {all_classes}")
+		#get new color for each class
+		colors = matplotlib.cm.rainbow(np.linspace(0,1,len(all_classes))) #pylint: disable=no-member #type:ignore
+
+		#====== Manually add "None" string ==============
+		all_classes = ["None"] + list(all_classes)
+		colors = np.insert(colors, 0, np.array((0.5, 0.5, 0.5, 0.3)), axis=0)
+
+		all_classes_dict = { item : nr for (nr,item) in enumerate(all_classes)}
+		class_runs = {}
+		for label_col, (_, codes, categories, _) in tracks.items():
+			#Map the codes of the runs to the class-number (None/NaN/"None" -> 0), last entry is for MISSING_CODE
+			class_numbers = np.array([all_classes_dict.get(cat, 0) for cat in categories] + [0], dtype=np.int64)
+			class_runs[label_col] = class_numbers[codes]
+		return np.array(all_classes), colors, class_runs
+
+	@staticmethod
+	def _get_categorical_colors(
+				categories : pd.Index,
+				codes : np.ndarray,
+				color_dict : typing.Dict[typing.Any, np.ndarray]
+			) -> np.ndarray:
+		"""Get the color of each code of a categorical column, labels without a color (and missing labels, code -1)
+		get the color of None"""
+		color_table = np.array([color_dict.get(category, color_dict[None]) for category in categories] \
+			+ [color_dict[None]], dtype=np.float64) #Last entry is used for code -1
+		return color_table.take(codes, axis=0)
+
+	@staticmethod
+	def _get_unselected_colors(base_colors : np.ndarray, brightness : float = 0.75) -> np.ndarray:
+		"""Returns the lightened version of base_colors, used for all points that are not selected"""
+		unselected = base_colors.copy()
+		unselected[:, :3] = brightness * (1.0 - unselected[:, :3]) + unselected[:, :3]
+		return unselected
+
+	@staticmethod
+	def _fill_selection_colors(colors : np.ndarray,
+				selected : np.ndarray,
+				base_colors : np.ndarray,
+				unselected_colors : np.ndarray
+			):
+		"""Fill colors (in place) with base_colors for selected items and unselected_colors for all others. If nothing
+		is selected, everything is colored normally."""
+		if selected.any():
+			np.copyto(colors, unselected_colors)
+			np.copyto(colors, base_colors, where=selected[:, np.newaxis]) #Lighten everything except selected points
+		else:
+			np.copyto(colors, base_colors) #Color normally if no selection
+
+	def _get_numeric_domain(self) -> typing.Optional[typing.Tuple[float, float]]:
+		"""Returns the current plot-domain (left, right) in plot-coordinates (datetimes are converted using date2num)
+		or None if (one of) the values is not set"""
+		domain = self.settings_model.plot_domain_limrange
+		if domain is None or domain.left_val is None or domain.right_val is None:
+			return None
+		left, right = domain.left_val, domain.right_val
+		if isinstance(left, (datetime.datetime, np.datetime64)):
+			left = matplotlib.dates.date2num(left)
+		if isinstance(right, (datetime.datetime, np.datetime64)):
+			right = matplotlib.dates.date2num(right)
+		return (float(left), float(right))
+
+	def _get_lod_positions(self,
+				x_vals : np.ndarray,
+				y_vals : np.ndarray,
+				column : typing.Optional[str] = None,
+				valid_rows : typing.Optional[np.ndarray] = None
+			) -> np.ndarray:
+		"""Get the positions of the points that should be drawn for a line-plot. If LOD is enabled and x_vals is
+		monotonic, the series is reduced to a few points per horizontal pixel of the plot using min/max decimation.
+		If the selected data was sliced from the summary pyramid, the precomputed summaries of column are used instead.
+
+		Args:
+			x_vals (np.ndarray): The (numeric) x-values of the series
+			y_vals (np.ndarray): The y-values of the series (without NaNs)
+			column (str | None, optional): The plotted column, used to look up the summary pyramid. Defaults to None.
+			valid_rows (np.ndarray | None, optional): The positions of x_vals/y_vals in selected_data (the non-NaN rows)
+				Defaults to None.
+
+		Returns:
+			np.ndarray: Sorted positions (in x_vals/y_vals) of the points to draw
+		"""
+		if not self.lod_enabled:
+			return np.arange(len(x_vals))
+		n_buckets = int(self._get_plot_width() / max(1, self.lod_pixels_per_bucket))
+
+		pyramid = self.data_model.get_summary_pyramid()
+		if self._dt_rows is not None and pyramid is not None and pyramid.has_column(column) \
+				and valid_rows is not None:
+			start, stop = self._dt_rows
+			rows = pyramid.query_positions(column, start, stop, n_buckets) - start #Rows in selected_data
+			positions = np.searchsorted(valid_rows, rows).clip(0, max(len(valid_rows) - 1, 0))
+			return positions[valid_rows[positions] == rows] if len(valid_rows) > 0 else positions[:0] #E.g. skip inf
+
+		monotonic, _ = downsampling.is_monotonic(x_vals)
+		if not monotonic: #Decimation only makes sense for monotonic x-values (e.g. time)
+			return np.arange(len(x_vals))
+		return downsampling.m4_downsample_positions(x_vals, y_vals, n_buckets, self._get_numeric_domain())
+
+	def _reload_series_colors(self) -> typing.List[typing.Any]:
+		"""Set the legend names and the color of each legend name using the current color method, returns the color of
+		each column of the plot list"""
+		self.legend_names = []
+		self.legend_colors_dict = {}
+
+		color_based_on_col = self.settings_model.plot_color_method == self.settings_model.plot_color_method_options[0]
+		if color_based_on_col:
+			self.legend_names = self.settings_model.plot_list
+		else:
+			color_col = self.settings_model.plot_color_column
+			try:
+				self.legend_names = set([])
+				for name in  self.data_model.df[color_col].unique(): #type: ignore
+					if isinstance(name, float) and np.isnan(name) or pd.isna(name): #Treat NaN as None
+						self.legend_names.add(None)
+						continue #Don't add nan
+					self.legend_names.add(name)
+				self.legend_names = list(self.legend_names)
+			except Exception as ex: #pylint: disable=broad-exception-caught
+				log.warning(f"Cannot create color legend for this plot: {ex}")
+
+		log.debug(f"Legend names {self.legend_names}")
+
+		#Default color scheme (but only works up to 10 colors)
+		col_colors = matplotlib.cm.tab10.colors #pylint: disable=no-member #type: ignore
+		col_colors : list[list[float]] = [[*color, 1.0] for color in col_colors] #Alpha is missing by default #type: ignore
+		if len(self.legend_names) > 10: #Otherwise create a linear separation
+			#get new color for each class
+			col_colors = matplotlib.cm.rainbow(np.linspace(0,1,len(self.legend_names))) #pylint: disable=no-member #type: ignore
+
+		assert len(col_colors) >= len(self.legend_names), "Too many items in the legend - not enough colors for legend."
+
+		color_dict = {name : np.array(color) for name, color in zip(self.legend_names, col_colors)}
+		color_dict[None] = np.array([.8, .8, 0.8, 1]) #type: ignore
+
+		self.legend_colors_dict = color_dict
+		return col_colors
+
+	def _get_point_colors(self, values : pd.Series, color_dict : typing.Dict[typing.Any, np.ndarray]) -> np.ndarray:
+		"""Get the color of each value of the color-column (based on labels)"""
+		if isinstance(values.dtype, pd.CategoricalDtype): #Take the color of each code from a table
+			return self._get_categorical_colors(values.cat.categories, values.cat.codes.to_numpy(), color_dict)
+		color_arr = values.fillna(np.nan).replace(
+			{np.nan:None, nan:None, None: None, pd.NaT : None, pd.NA: None}
+		) #NOTE/TODO: Inserting np.nan in a separate dictionary and then calling replace does
+		# 	not work and results in only the first Nan value being replaced, only if np.nan is in the
+		# 	constructore inside .replace() as denoted here
+		return np.array(color_arr.map(color_dict).tolist())
+
+	@staticmethod
+	def _get_segment_selected(selected : np.ndarray) -> np.ndarray:
+		"""Get which line segments (segment i starts at point i) are selected, a line segment is selected if the point
+		at its end is selected"""
+		segment_selected = np.zeros(len(selected), dtype=bool)
+		segment_selected[:-1] = selected[1:] #Always take the line after the selected item
+		return segment_selected
+
+	def _get_series_selections(self, selection : typing.Union[np.ndarray, set]) -> typing.List[np.ndarray]:
+		"""Set the current selection and get which of the drawn points of each plotted series are selected
+
+		Args:
+			selection (np.ndarray | set): Boolean mask aligned with the dataframe (see GraphData.selection_mask) or a set
+				of pandas-idxes
+
+		Returns:
+			typing.List[np.ndarray]: Per plotted series: boolean mask with an entry for every drawn point
+		"""
+		self.cur_pd_selection = self.data_model.to_mask(selection)
+		selected_locs = None
+		selections = []
+		for locs, positions, df_positions in zip(self.data_locs, self.plotted_positions, self.plotted_df_positions):
+			if df_positions is not None and len(self.cur_pd_selection) > 0:
+				selected = self.cur_pd_selection[df_positions] #Only recolor the points that are actually drawn
+			else: #Fallback: look up by pandas-idx
+				if selected_locs is None:
+					selected_locs = self.data_model.df.index[self.cur_pd_selection] #type: ignore
+				selected = pd.Index(locs[positions]).isin(selected_locs)
+			selections.append(selected)
+		return selections
+
+	def _reload_plot_series(self) -> typing.List[PlotSeries]:
+		"""Get the series of the columns in the plot list (columns without data are skipped), the drawn points of each
+		series and their colors. Also resets the per-series state (data_locs, plotted_positions, data_colors etc.)."""
+		color_based_on_col = self.settings_model.plot_color_method == self.settings_model.plot_color_method_options[0]
+		col_colors = self._reload_series_colors()
+		color_dict = self.legend_colors_dict
+
+		log.debug(f"Trying to plot columns: {list(self.settings_model.plot_list)}")
+		self.data_locs = []
+		self.plotted_positions = []
+		self.plotted_df_positions = []
+		self.unselected_colors = []
+		self.plotted_columns = []
+		self.data_colors = []
+		self.cur_plot_type = self.settings_model.plot_type
+
+		assert(self.selected_data is not None), "Selected data is None, cannot replot. This should have been caught earlier."
+		series = []
+		for col, col_color in zip(list(self.settings_model.plot_list), col_colors): #go over columns (and color them)
+			if col is None or col == "": #skip empty colnames
+				continue
+
+			nan_mask = np.isfinite(self.selected_data[col])
+
+			cur_locs = self.selected_data.index.to_numpy()[nan_mask]
+			x_vals = self.selected_data[self.settings_model.x_axis].to_numpy()[nan_mask] #Remove nan entries
+			y_vals = self.selected_data[col].to_numpy()[nan_mask]
+
+			if len(x_vals) == 0 or len(y_vals) == 0: #Skip if no data
+				log.info(f"Columns {col} contained no data... Skipping plotting")
+				continue
+
+			if isinstance(x_vals[0], pd.Timestamp)\
+					or isinstance(x_vals[0], np.datetime64)\
+					or pd.api.types.is_datetime64_any_dtype(x_vals[0]):
+				x_vals : np.ndarray = matplotlib.dates.date2num(x_vals) #type: ignore
+
+			if self.cur_plot_type == "Scatter":
+				plot_positions = np.arange(len(x_vals))
+			else:
+				plot_positions = self._get_lod_positions(x_vals, y_vals, col, np.flatnonzero(nan_mask))
+			log.debug(f"Drawing {len(plot_positions)} of {len(x_vals)} points for column {col}")
+
+			diff = abs((np.max(y_vals) - np.min(y_vals)) * 0.05)
+			minmax = (np.min(y_vals) - diff, np.max(y_vals) + diff) #Take some leeway in the plot to better see edges
+
+			if color_based_on_col: #If all datapoints same color
+				colors = np.tile(np.array([col_color[0], col_color[1], col_color[2], 1.0]), (len(plot_positions), 1))
+			else: #If color based on class
+				color_col = "ERR"
+				try:
+					color_col = self.settings_model.plot_color_column
+					color_values = self.selected_data[color_col].loc[nan_mask].iloc[plot_positions]
+					colors = self._get_point_colors(color_values, color_dict)
+				except KeyError as err:
+					raise KeyError(f"KeyError: Selected color-column ({color_col}) resulted in error: {err}, please "
+		    			f"make sure an existing column is selected under Plot Colors") from err
+
+			if self.cur_plot_type != "Scatter":
+				#========== Set color for points far from eachother =========
+				dts = self.selected_data["DateTime"].to_numpy()[nan_mask] #TODO: "DateTime is hardcoded here"
+				dt_distances = np.abs(dts[:-1] - dts[1:]) / np.timedelta64(1, 's')
+				#If more than 100 seconds between any of the (full resolution) points that a drawn line replaces
+				dt_distances_mask = downsampling.segment_contains_flag(dt_distances > 100, plot_positions)
+				#Select data colors => skip last value => all where threshold is true => set alpha (-1) to 0.1
+				colors[:-1][dt_distances_mask] = colors[:-1][dt_distances_mask] * [1, 1, 1, 0.1]
+
+			self.data_locs.append(cur_locs) #To translate in-graph selection back to pandas selection
+			self.plotted_positions.append(plot_positions)
+			self.plotted_df_positions.append(None if self._selected_positions is None
+				else self._selected_positions[np.asarray(nan_mask)][plot_positions])
+			self.plotted_columns.append(col)
+			self.data_colors.append(colors)
+			self.unselected_colors.append(self._get_unselected_colors(colors, self.selection_exclusion_brightness))
+			series.append(PlotSeries(column=col, color=col_color, locs=cur_locs, x_vals=x_vals, y_vals=y_vals,
+				positions=plot_positions, colors=colors, minmax=minmax))
+		return series
+
+	def _reload_selected_data(self):
+		"""Reload the main """
+		#===========Plot xlim===================== TODO: xlim implementation
+		x_axis = self.settings_model.x_axis
+		plot_xlim = self.settings_model.plot_domain_limrange
+		self.plot_title = ""
+		self.selected_data = self.data_model.df #Create dataframe view of data that is to be plotted
+		self._dt_rows = None
+		self._selected_data_sorted = False
+		self._selected_positions = None
+
+		if x_axis == self.data_model.dt_col and self.data_model.dt_sort_order is not None \
+				and len(self.settings_model.plot_filters) == 0:
+			#Fast path: binary search the domain in the DateTime-sorted rows instead of masking the whole dataframe
+			left = plot_xlim.left_val if plot_xlim is not None else None
+			right = plot_xlim.right_val if plot_xlim is not None else None
+			indexer = self.data_model.get_dt_indexer(left, right)
+			self.selected_data = self.data_model.df.iloc[indexer] #type: ignore
+			self._selected_positions = np.arange(len(self.data_model.df))[indexer] #type: ignore
+			self._dt_rows = self.data_model.get_dt_row_range(left, right)
+			self._selected_data_sorted = True
+			if self.data_model.hidden_count > 0:
+				visible = ~self.data_model.hidden_mask[indexer]
+				self.selected_data = self.selected_data[visible]
+				self._selected_positions = self._selected_positions[visible]
+				self._dt_rows = None #Rows no longer line up with the sorted rows
+
+		for filt in self.settings_model.plot_filters:
+			try:
+				temp = filt(self.selected_data)
+				self.selected_data = temp
+			except Exception as err: #pylint: disable=broad-exception-caught
+				msg = f"Issue while filtering data in view : {err}"
+				log.error(msg)
+				create_qt_warningbox(msg)
+
+		assert self.selected_data is not None
+		if not self._selected_data_sorted and self.data_model.hidden_count > 0: #NOTE: filters might reorder the data
+			self.selected_data = self.selected_data[
+				~self.selected_data.index.isin(self.data_model.df.index[self.data_model.hidden_mask])] #type: ignore
+
+
+		if plot_xlim is not None and x_axis is not None:
+			log.info(f"Setting plot xlim to : {plot_xlim}")
+
+			if plot_xlim.left_val is not None: #if xmin specified
+				log.info(f"Setting xlim to min {plot_xlim.left_val}")
+				if not self._selected_data_sorted: #Otherwise already sliced
+					self.selected_data = self.selected_data[ self.selected_data[x_axis] >= plot_xlim.left_val ]
+
+				#If x_axis reformatted left val is float, round to 2 decimal places in title
+				if isinstance(plot_xlim.left_val, float): #TODO: create a title formatter - is more neat
+					self.plot_title += str(round(plot_xlim.left_val, 2)) + "  -  "
+				else:
+					self.plot_title += self.plot_title_reformatter(plot_xlim.left_val) + "  -  "
+
+
+			else:
+				self.plot_title += "x  -  "
+
+			if plot_xlim.right_val is not None:  #If xmax specified
+				log.info(f"Setting xlim to max {plot_xlim.right_val}")
+
+				if isinstance(plot_xlim.right_val, float):
+					self.plot_title += str(round(plot_xlim.right_val, 2))
+				else:
+					self.plot_title += self.plot_title_reformatter(plot_xlim.right_val)
+
+
+				if not self._selected_data_sorted:
+					self.selected_data = self.selected_data[ self.selected_data[x_axis] <= plot_xlim.right_val ]
+			else:
+				self.plot_title += "x"
+			# if plot_xlim[0] is not None and plot_xlim[1] is not None: #TODO: do this in-plot
+			# 	self.canvas.ax.set_xlim(plot_xlim[0], plot_xlim[1])
+		else:
+			log.info(f"Plot xlim {self.settings_model.plot_domain_limrange} not used for axis {x_axis} due to <None> "
+	    		"value (either left/right/xname)")
+
+		if self._selected_positions is None and self.data_model.df.index.is_unique: #type: ignore
+			#Positions of the selected data in the dataframe, used to look up selection/hidden masks
+			self._selected_positions = self.data_model.df.index.get_indexer(self.selected_data.index) #type: ignore
+			if (self._selected_positions < 0).any(): #E.g. filters that created new rows
+				self._selected_positions = None
+
+
+		#=============== Plot datetime ===================
@@ -0,0 +1,600 @@
+"""
+Implements a plotter that draws using pyqtgraph instead of matplotlib.
+
+Matplotlib rasterizes the whole figure on the CPU (Agg), which becomes the bottleneck past a few million drawn points.
+This plotter draws the same plot as QPlotter (a twin y-axis per plotted column, label tracks, the spectrogram and the
+lasso/span/rectangle selectors) as items of a Qt graphics-scene, which is rendered on an OpenGL-surface. On systems
+without (hardware) OpenGL, Qt falls back on software rendering (e.g. Mesa llvmpipe on headless Linux, QT_OPENGL=software
+on Windows), set MVTS_ANALYZER_PLOT_OPENGL=0 to not use OpenGL at all.
+
+Only the drawing is implemented here, the plotted data is prepared by PlotterBase. Saved figures are images of the
+scene (or SVG), use the matplotlib backend for export-quality figures.
+
+Requires the optional dependency pyqtgraph (see plot_backends).
+
+And:
+SelectionViewBox - The viewbox of the main plot, draws the lasso/span/rectangle selectors
+"""
+import logging
+import os
+import time
+import typing
+
+import matplotlib.dates
+import numpy as np
+import pandas as pd
+import pyqtgraph as pg
+from PySide6 import QtCore, QtGui, QtSvg, QtWidgets
+
+from mvts_analyzer.graphing.graph_data import GraphData
+from mvts_analyzer.graphing.graph_settings_model import GraphSettingsModel
+from mvts_analyzer.graphing.plotter.collection_selector import \
+    CollectionSelector
+from mvts_analyzer.graphing.plotter.label_hover import LabelTrack
+from mvts_analyzer.graphing.plotter.plotter_base import PlotterBase
+from mvts_analyzer.utility.gui_utility import (
+    catch_show_exception_in_popup_decorator, create_qt_warningbox)
+
+log = logging.getLogger(__name__)
+
+USE_OPENGL = os.environ.get("MVTS_ANALYZER_PLOT_OPENGL", "1") != "0" #Whether to render the scene using OpenGL
+SECONDS_PER_DAY = 86400.0 #Datetimes are drawn as (UTC) timestamps, the plotter uses matplotlib date-numbers (days)
+
+
+def is_opengl_available() -> bool:
+	"""Whether an OpenGL-context can be created (e.g. not on the offscreen Qt-platform)"""
+	context = QtGui.QOpenGLContext()
+	return context.create()
+
+
+class SeriesColorGroup(typing.NamedTuple):
+	"""The drawn points of a series that share a (base) color, drawn using an item for the selected and an item for the
+	unselected points. The items are created once per replot and only updated when the selection changes."""
+	positions : np.ndarray #The positions (in the drawn points of the series) of the points of this group
+	connect : typing.Optional[np.ndarray] #For lines: whether the segment starting at each point belongs to this group
+	selected_item : pg.GraphicsObject #Drawn in the base color
+	unselected_item : pg.GraphicsObject #Drawn in the unselected (lightened) color
+
+
+class SelectionViewBox(pg.ViewBox):
+	"""
+	ViewBox of the main plot. Dragging with the left/middle/right mouse button draws a lasso/rectangle/span, which is
+	emitted (in view coordinates) on release. The x-range can be zoomed using the mouse-wheel and panned by dragging the
+	x-axis.
+	"""
+	lassoSelected = QtCore.Signal(object) #(n x 2) array of the vertices of the lasso
+	rectSelected = QtCore.Signal(float, float, float, float) #x_min, x_max, y_min, y_max
+	spanSelected = QtCore.Signal(float, float) #x_min, x_max
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, enableMenu=False, **kwargs)
+		self.setMouseEnabled(x=True, y=False)
+		pen = pg.mkPen((255, 0, 0), width=1)
+		self._lasso = QtWidgets.QGraphicsPathItem()
+		self._lasso.setPen(pen)
+		self._rect = QtWidgets.QGraphicsRectItem()
+		self._rect.setPen(pen)
+		self._span = pg.LinearRegionItem(movable=False, brush=(255, 0, 0, 50), pen=pen)
+		for item in (self._lasso, self._rect, self._span):
+			item.setVisible(False)
+			item.setZValue(1000)
+			self.addItem(item, ignoreBounds=True)
+		self._lasso_verts : typing.List[typing.Tuple[float, float]] = []
+
+	def mouseDragEvent(self, ev, axis=None):
+		"""Draw the selector of the dragged mouse button, dragging an axis (axis is not None) pans it"""
+		if axis is not None:
+			super().mouseDragEvent(ev, axis=axis)
+			return
+		button = ev.button()
+		if button not in (QtCore.Qt.MouseButton.LeftButton, QtCore.Qt.MouseButton.MiddleButton,
+				QtCore.Qt.MouseButton.RightButton):
+			ev.ignore()
+			return
+		ev.accept()
+		start, pos = self.mapToView(ev.buttonDownPos()), self.mapToView(ev.pos())
+
+		if button == QtCore.Qt.MouseButton.LeftButton:
+			if ev.isStart():
+				self._lasso_verts = [(start.x(), start.y())]
+			self._lasso_verts.append((pos.x(), pos.y()))
+			path = QtGui.QPainterPath(QtCore.QPointF(*self._lasso_verts[0]))
+			for vert in self._lasso_verts[1:]:
+				path.lineTo(*vert)
+			path.closeSubpath()
+			self._lasso.setPath(path)
+			self._lasso.setVisible(not ev.isFinish())
+			if ev.isFinish() and len(self._lasso_verts) > 2:
+				self.lassoSelected.emit(np.array(self._lasso_verts))
+		elif button == QtCore.Qt.MouseButton.MiddleButton:
+			rect = QtCore.QRectF(start, pos).normalized()
+			self._rect.setRect(rect)
+			self._rect.setVisible(not ev.isFinish())
+			if ev.isFinish():
+				self.rectSelected.emit(rect.left(), rect.right(), rect.top(), rect.bottom())
+		else:
+			x_min, x_max = sorted((start.x(), pos.x()))
+			self._span.setRegion((x_min, x_max))
+			self._span.setVisible(not ev.isFinish())
+			if ev.isFinish():
+				self.spanSelected.emit(x_min, x_max)
+
+
+class PyQtGraphPlotter(PlotterBase):
+	"""
+	Plotter that draws using pyqtgraph. The main plot shows the normalized y-range (0.0-1.0), the series of each column
+	are drawn in their own viewbox (linked to the x-range of the main plot) with their own y-axis on the right, the
+	spectrogram is drawn in a viewbox behind the series, with the frequency-axis on the left. The y-range of a column
+	can be panned/zoomed by dragging its axis or using the mouse-wheel on it.
+	"""
+	def __init__(self,
+				data_model : GraphData,
+				settings_model : GraphSettingsModel,
+				*args,
+				**kwargs
+			):
+		super().__init__(data_model, settings_model, *args, **kwargs)
+		log.debug("Reloading PyQtGraphPlotter")
+		self.layout_widget = pg.GraphicsLayoutWidget()
+		if USE_OPENGL and is_opengl_available():
+			try:
+				self.layout_widget.useOpenGL(True)
+			except ImportError as err: #E.g. Qt without OpenGL-support
+				log.warning(f"Could not create an OpenGL-surface, drawing without OpenGL instead ({err})")
+		elif USE_OPENGL:
+			log.warning("Could not create an OpenGL-context, drawing without OpenGL instead")
+		self.layout_widget.setBackground("w")
+		layout = QtWidgets.QVBoxLayout()
+		layout.addWidget(self.layout_widget)
+		self.setLayout(layout)
+
+		self.main_view : typing.Optional[SelectionViewBox] = None
+		self.main_plot : typing.Optional[pg.PlotItem] = None
+		self.series_views : typing.List[pg.ViewBox] = [] #Per plotted series: the viewbox it is drawn in
+		self._series_groups : typing.List[typing.List[SeriesColorGroup]] = [] #Per plotted series: the drawn items
+		self._series_xy : typing.List[typing.Tuple[np.ndarray, np.ndarray]] = [] #Per plotted series: drawn x/y
+		self.fft_view : typing.Optional[pg.ViewBox] = None
+		self._fft_item : typing.Optional[pg.ImageItem] = None
+		self._fft_image_values : typing.Optional[np.ndarray] = None #The (view-sized) values of the drawn fft-image
+		self._fft_freq_range : typing.Optional[typing.Tuple[float, float]] = None #Frequencies of y=0.0 and y=1.0
+		self._label_tracks : typing.Dict[str, typing.Tuple[pg.PlotItem, LabelTrack, pg.TextItem]] = {}
+		self._hovered : typing.Optional[typing.Tuple[str, int]] = None #(label column, run) of the shown label
+		self._x_scale = 1.0 #Plot x-coordinates -> drawn x-coordinates (seconds for datetimes)
+
+		self.selector = CollectionSelector(None, [], [], [])
+		self.selector.pdSelectionEdited.connect(self.handle_selection_change)
+		self.layout_widget.scene().sigMouseMoved.connect(self._on_mouse_moved)
+
+	def _get_plot_width(self) -> float:
+		if self.main_view is not None and self.main_view.width() > 0:
+			return self.main_view.width()
+		return self.layout_widget.width()
+
+	def get_view_xlim(self) -> typing.Tuple[float, float]:
+		if self.main_view is None:
+			return (0.0, 1.0)
+		left, right = self.main_view.viewRange()[0]
+		return (left / self._x_scale, right / self._x_scale)
+
+	def get_view_ylim(self) -> typing.Tuple[float, float]:
+		if self.fft_view is not None and self._fft_freq_range is not None: #Use the (panned/zoomed) frequency-range
+			bottom, top = self.fft_view.viewRange()[1]
+			freq_bottom, freq_top = self._fft_freq_range
+			scale = (freq_top - freq_bottom) if freq_top != freq_bottom else 1.0
+			return ((bottom - freq_bottom) / scale, (top - freq_bottom) / scale)
+		if self.main_view is None:
+			return (0.0, 1.0)
+		bottom, top = self.main_view.viewRange()[1]
+		return (bottom, top)
+
+	def save_figure(self, target : typing.Union[str, typing.BinaryIO], file_format : typing.Optional[str] = None):
+		if file_format is None:
+			file_format = os.path.splitext(target)[1][1:] if isinstance(target, str) else "png"
+		file_format = file_format.lower()
+		if file_format == "svg":
+			buffer = QtCore.QBuffer()
+			generator = QtSvg.QSvgGenerator()
+			generator.setOutputDevice(buffer)
+			generator.setSize(self.layout_widget.size())
+			generator.setViewBox(self.layout_widget.rect())
+			painter = QtGui.QPainter(generator)
+			self.layout_widget.render(painter)
+			painter.end()
+			if isinstance(target, str):
+				with open(target, "wb") as file:
+					file.write(buffer.data().data())
+			else:
+				target.write(buffer.data().data())
+			return
+
+		image = self.layout_widget.grab().toImage()
+		if isinstance(target, str):
+			if not image.save(target, file_format.upper()):
+				raise OSError(f"Could not save figure as {target}")
+			return
+		buffer = QtCore.QBuffer()
+		buffer.open(QtCore.QIODevice.OpenModeFlag.WriteOnly)
+		image.save(buffer, file_format.upper())
+		target.write(buffer.data().data())
+
+	def open_save_popup(self):
+		"""Show popup to save figure to file, use the matplotlib backend for other formats/export-quality figures"""
+		try:
+			fname = QtWidgets.QFileDialog.getSaveFileName(
+						None, #type: ignore
+						'Save As...',
+						os.getcwd(),
+						"Portable Network Graphics (*.png);;Joint Photographic Experts Group (*.jpeg *.jpg);;"
+						"Scalable Vector Graphics (*.svg)"
+					)
+			log.debug(f"Trying to save figure as: {fname}")
+			if fname[0]:
+				self.save_figure(fname[0])
+		except Exception as err: #pylint: disable=broad-exception-caught
+			log.warning(f"Could not save figure - {err}")
+
+	def restyle_fft(self):
+		if self._fft_item is None or self._fft_image_values is None:
+			return
+		try:
+			fft_cmap = self._get_fft_cmap()
+		except ValueError as err: #E.g. unknown colormap
+			log.warning(f"Could not restyle fft-data: {err}")
+			return
+		self._fft_item.setImage(self._get_fft_rgba(self._fft_image_values, fft_cmap), autoLevels=False)
+
+	def _set_selection(self, selection : typing.Union[np.ndarray, set]):
+		"""Recolor the plotted data according to the passed selection
+
+		Args:
+			selection (np.ndarray | set): Boolean mask aligned with the dataframe (see GraphData.selection_mask) or a set
+				of pandas-idxes
+		"""
+		for ax_idx, selected in enumerate(self._get_series_selections(selection)):
+			self._recolor_series(ax_idx, selected)
+
+	def _clear(self):
+		"""Remove all plots, axes and viewboxes"""
+		for view in [*self.series_views, *([self.fft_view] if self.fft_view is not None else [])]:
+			self.layout_widget.scene().removeItem(view)
+		self.series_views, self._series_groups, self._series_xy = [], [], []
+		self.fft_view, self._fft_item, self._fft_image_values, self._fft_freq_range = None, None, None, None
+		self._label_tracks, self._hovered = {}, None
+		self.layout_widget.clear()
+		self.main_view, self.main_plot = None, None
+
+	def _create_axis(self, orientation : str) -> pg.AxisItem:
+		if orientation == "bottom" and self._x_scale != 1.0:
+			axis = pg.DateAxisItem(orientation="bottom", utcOffset=0) #Date-numbers are naive (UTC) datetimes
+		else:
+			axis = pg.AxisItem(orientation)
+		font = QtGui.QFont()
+		font.setPointSizeF(self.settings_model.font_size)
+		axis.setStyle(tickFont=font)
+		axis.setPen("k")
+		axis.setTextPen("k")
+		return axis
+
+	def _create_layout(self, label_columns : typing.List[str]):
+		"""Create the main plot and a plot for each label-column below it, only the last plot shows the x-axis"""
+		self._clear()
+		self.main_view = SelectionViewBox()
+		self.main_view.lassoSelected.connect(self._on_select_lasso)
+		self.main_view.rectSelected.connect(self._on_select_rect)
+		self.main_view.spanSelected.connect(self._on_select_span)
+		self.main_view.sigResized.connect(self._update_views)
+		self.main_plot = self.layout_widget.addPlot(row=0, col=0, viewBox=self.main_view,
+			axisItems={"left" : self._create_axis("left"), "bottom" : self._create_axis("bottom")})
+		self.main_view.setYRange(0, 1, padding=0) #Normalize
+		self.layout_widget.ci.layout.setRowStretchFactor(0, 100)
+
+		for row, label_col in enumerate(label_columns, start=1):
+			plot = self.layout_widget.addPlot(row=row, col=0,
+				axisItems={"left" : self._create_axis("left"), "bottom" : self._create_axis("bottom")})
+			plot.setMenuEnabled(False)
+			plot.vb.setMouseEnabled(x=True, y=False)
+			plot.setXLink(self.main_plot)
+			plot.setYRange(0, 1, padding=0)
+			plot.getAxis("left").setStyle(showValues=False)
+			plot.getAxis("left").setLabel(label_col)
+			self.layout_widget.ci.layout.setRowStretchFactor(row, 3)
+			self._label_tracks[label_col] = (plot, None, None) #type: ignore #Track is set by _replot_colorbars
+
+		plots = [self.main_plot, *[plot for plot, _, _ in self._label_tracks.values()]]
+		for plot in plots[:-1]:
+			plot.hideAxis("bottom")
+		plots[-1].setLabel("bottom", self.settings_model.x_axis)
+		for plot in plots: #Same width, so the x-axes line up
+			plot.getAxis("left").setWidth(int(4 * self.settings_model.font_size + 20))
+
+	def _add_view(self, z_value : float) -> pg.ViewBox:
+		"""Add a viewbox behind the main plot, with the same geometry and x-range"""
+		view = pg.ViewBox(enableMenu=False)
+		view.setZValue(z_value)
+		view.setMouseEnabled(x=False, y=True) #Only panned/zoomed using its axis
+		self.layout_widget.scene().addItem(view)
+		view.setXLink(self.main_view)
+		view.setGeometry(self.main_view.sceneBoundingRect()) #type: ignore
+		return view
+
+	def _update_views(self):
+		"""Keep the geometry of the viewboxes behind the main plot in sync with the main plot"""
+		for view in [*self.series_views, *([self.fft_view] if self.fft_view is not None else [])]:
+			view.setGeometry(self.main_view.sceneBoundingRect()) #type: ignore
+			view.linkedViewChanged(self.main_view, view.XAxis)
+
+	def _replot_colorbars(self, tracks):
+		"""Draw the runs of each label column as bars, colored by class"""
+		if tracks is None:
+			return
+		before = time.perf_counter()
+		all_classes, colors, class_runs = self._get_label_classes(tracks)
+		for label_col, (plot, _, _) in list(self._label_tracks.items()):
+			x_bars, codes, categories, _ = tracks[label_col]
+			edges = np.asarray(matplotlib.dates.date2num(x_bars), dtype=np.float64) if len(x_bars) > 0 \
+				else np.zeros(0, dtype=np.float64)
+			z_bars = class_runs[label_col]
+			if len(edges) > 1:
+				for class_nr in np.unique(z_bars): #One item per class
+					mask = z_bars == class_nr
+					plot.addItem(pg.BarGraphItem(x0=edges[:-1][mask] * self._x_scale, x1=edges[1:][mask] * self._x_scale,
+						y0=0, height=1, pen=None, brush=pg.mkBrush(*(np.array(colors[class_nr]) * 255))))
+			annotation = pg.TextItem(anchor=(0.5, 0.5), color="k", fill=pg.mkBrush("w"), border=pg.mkPen("k"))
+			annotation.setVisible(False)
+			plot.addItem(annotation, ignoreBounds=True)
+			self._label_tracks[label_col] = (plot, LabelTrack(edges, codes, categories, None), annotation)
+		log.debug(f"Drawing label tracks took: {time.perf_counter() - before}")
+
+		if len(self._label_tracks) > 0:
+			sort_index = np.argsort(all_classes)
+			legend = self._create_legend(all_classes[sort_index], colors[sort_index])
+			legend.setSizePolicy(QtWidgets.QSizePolicy.Policy.Fixed, QtWidgets.QSizePolicy.Policy.Fixed)
+			self.layout_widget.addItem(legend, row=len(self._label_tracks) + 1, col=0) #Below the label tracks
+			self.layout_widget.ci.layout.setAlignment(legend, QtCore.Qt.AlignmentFlag.AlignHCenter)
+
+	@staticmethod
+	def _create_legend(names : typing.Iterable[typing.Any], colors : typing.Iterable[typing.Any]) -> pg.LegendItem:
+		"""Create a legend with a (RGBA, 0.0-1.0) colored line for each name"""
+		names, colors = list(names), list(colors)
+		legend = pg.LegendItem(colCount=max(1, min(10, len(names))), labelTextColor="k")
+		for name, color in zip(names, colors):
+			legend.addItem(pg.PlotDataItem(pen=pg.mkPen(*(np.array(color) * 255), width=4)), str(name))
+		return legend
+
+	@staticmethod
+	def _get_cell_edges(centers : np.ndarray) -> np.ndarray:
+		"""The edges of cells around (sorted) centers, each edge lies halfway between 2 centers"""
+		if len(centers) == 1:
+			return np.array([centers[0] - 0.5, centers[0] + 0.5])
+		mids = (centers[1:] + centers[:-1]) / 2
+		return np.concatenate(([2 * centers[0] - mids[0]], mids, [2 * centers[-1] - mids[-1]]))
+
+	def _rasterize_fft_mesh(self,
+				fft_x : np.ndarray,
+				fft_y : np.ndarray,
+				fft_z : np.ndarray,
+				size : typing.Tuple[float, float]
+			) -> typing.Tuple[np.ndarray, typing.Tuple[float, float, float, float]]:
+		"""Draw irregularly sampled fft-data as an image, each column of the image takes the nearest row (as the
+		nearest-shaded mesh of QPlotter would)
+
+		Returns:
+			typing.Tuple[np.ndarray, typing.Tuple[float, float, float, float]]: The (lines x columns) values and the
+				(left, right, bottom, top) extent of the image
+		"""
+		fft_x, fft_y, fft_z = self._bin_fft_mesh(fft_x, fft_y, fft_z, size)
+		x_edges = self._get_cell_edges(matplotlib.dates.date2num(fft_x))
+		y_edges = self._get_cell_edges(fft_y)
+		n_columns = max(1, int(size[0]), len(fft_x))
+		column_centers = x_edges[0] + (np.arange(n_columns) + 0.5) * (x_edges[-1] - x_edges[0]) / n_columns
+		rows = np.searchsorted(x_edges, column_centers, side="right") - 1
+		values = fft_z[:, np.clip(rows, 0, len(fft_x) - 1)]
+		return np.ascontiguousarray(values), (x_edges[0], x_edges[-1], y_edges[0], y_edges[-1])
+
+	def _replot_fft(self):
+		"""Draw the fft-data as an image in a viewbox behind the series, the left axis shows its frequencies"""
+		if self.fft_data is None or self.fft_data[0] is None:
+			log.info("FFT data is none, could not replot")
+			return
+		X, Y, Z = self.fft_data #pylint: disable=invalid-name
+		size = (self.main_view.width(), self.main_view.height()) #type: ignore
+		raster = self._get_fft_raster(X, Z, size) if self.fft_raster_enabled else None
+		if raster is None: #Irregular sampling (e.g. gaps)
+			raster = self._rasterize_fft_mesh(X, Y, Z, size)
+		values, (left, right, bottom, top) = raster
+		log.debug(f"Creating image of dimensions: {values.shape} from fft-data of dimensions {Z.shape}")
+
+		freq_bottom = 1000 * self.settings_model.fft_line_range_left / self.settings_model.fft_line_range_max
+		freq_top = 1000 * self.settings_model.fft_line_range_right / self.settings_model.fft_line_range_max
+		self._fft_freq_range = (freq_bottom, freq_top)
+		self.fft_view = self._add_view(-20)
+		self._fft_image_values = values
+		self._fft_item = pg.ImageItem(axisOrder="row-major")
+		self._fft_item.setImage(self._get_fft_rgba(values, self._get_fft_cmap()), autoLevels=False)
+		self._fft_item.setRect(QtCore.QRectF(
+			left * self._x_scale,
+			freq_bottom + bottom * (freq_top - freq_bottom),
+			(right - left) * self._x_scale,
+			(top - bottom) * (freq_top - freq_bottom)
+		))
+		self.fft_view.addItem(self._fft_item)
+		self.fft_view.setYRange(freq_bottom, freq_top, padding=0)
+
+		axis = self.main_plot.getAxis("left") #type: ignore
+		axis.linkToView(self.fft_view)
+		axis.setLabel("Frequency (Hz)")
+
+	@staticmethod
+	def _group_colors(colors : np.ndarray) -> typing.List[typing.Tuple[int, np.ndarray]]:
+		"""Group (RGBA) colors, drawing an item per color is much faster than using a pen/brush per point
+
+		Returns:
+			typing.List[typing.Tuple[int, np.ndarray]]: Per unique color: the index of its first item and a boolean mask
+				of the items with this color
+		"""
+		rgba = np.ascontiguousarray(np.round(np.asarray(colors) * 255).astype(np.uint8))
+		if len(rgba) == 0:
+			return []
+		uniques, first, inverse = np.unique(rgba.view(np.uint32)[:, 0], return_index=True, return_inverse=True)
+		return [(first[i], inverse == i) for i in range(len(uniques))]
+
+	def _create_series_items(self, ax_idx : int):
+		"""Create the items of a plotted series, an item per (base) color for the selected and the unselected points.
+		The colors are only grouped here, selections only update the data of the items (see _recolor_series)."""
+		view = self.series_views[ax_idx]
+		x_plot, y_plot = self._series_xy[ax_idx]
+		base_colors, unselected_colors = self.data_colors[ax_idx], self.unselected_colors[ax_idx]
+		groups = []
+		if self.cur_plot_type == "Scatter":
+			for first, mask in self._group_colors(base_colors):
+				items = [pg.ScatterPlotItem(size=2, pen=None, brush=pg.mkBrush(*np.round(colors[first] * 255)),
+					pxMode=True) for colors in (base_colors, unselected_colors)]
+				groups.append(SeriesColorGroup(np.flatnonzero(mask), None, *items))
+		else:
+			for first, mask in self._group_colors(base_colors[:-1]): #Segment i connects point i and i + 1
+				positions = np.flatnonzero(np.append(mask, False) | np.insert(mask, 0, False)) #Start or end points
+				connect = np.append(mask, False)[positions]
+				connect[:-1] &= np.diff(positions) == 1 #Do not connect points of different segments
+				items = [pg.PlotCurveItem(x_plot[positions], y_plot[positions],
+					pen=pg.mkPen(*np.round(colors[first] * 255)), skipFiniteCheck=True)
+					for colors in (base_colors, unselected_colors)]
+				groups.append(SeriesColorGroup(positions, connect, *items))
+		for group in groups:
+			view.addItem(group.unselected_item)
+		for group in groups: #Draw the selected points on top
+			view.addItem(group.selected_item)
+		self._series_groups[ax_idx] = groups
+
+	def _recolor_series(self, ax_idx : int, selected : np.ndarray):
+		"""Update the items of a plotted series (see _create_series_items) to the selection of its drawn points, if
+		nothing is selected, everything is colored normally"""
+		x_plot, y_plot = self._series_xy[ax_idx]
+		if not selected.any():
+			selected = np.ones(len(selected), dtype=bool)
+		if self.cur_plot_type != "Scatter":
+			selected = self._get_segment_selected(selected)
+		for group in self._series_groups[ax_idx]:
+			group_selected = selected[group.positions]
+			if group.connect is None:
+				for item, mask in ((group.selected_item, group_selected), (group.unselected_item, ~group_selected)):
+					item.setData(x_plot[group.positions[mask]], y_plot[group.positions[mask]])
+			else:
+				for item, mask in ((group.selected_item, group_selected), (group.unselected_item, ~group_selected)):
+					item.setData(*item.getData(), connect=group.connect & mask) #Only the connected segments change
+
+	def _replot_selected_data(self):
+		log.debug("Now replotting selected data")
+		XYs = [] #pylint: disable=invalid-name
+		minmaxes = []
+		for col_nr, series in enumerate(self._reload_plot_series()):
+			view = self._add_view(-10)
+			view.setYRange(*series.minmax, padding=0)
+			axis = self._create_axis("right")
+			axis.linkToView(view)
+			axis.setPen(pg.mkPen(*(np.array(series.color) * 255)))
+			axis.setTextPen(pg.mkPen(*(np.array(series.color) * 255)))
+			axis.setLabel(series.column)
+			self.layout_widget.addItem(axis, row=0, col=1 + col_nr)
+
+			self.series_views.append(view)
+			self._series_groups.append([])
+			self._series_xy.append((series.x_vals[series.positions] * self._x_scale, series.y_vals[series.positions]))
+			XYs.append(np.vstack((series.x_vals, series.y_vals)).T) #Full resolution, so selections map back to all locs
+			minmaxes.append(series.minmax)
+
+		for ax_idx, selected in enumerate(self._get_series_selections(self.data_model.selection_mask)):
+			self._create_series_items(ax_idx)
+			self._recolor_series(ax_idx, selected)
+		self.selector.reset_all(None, XYs, minmaxes, self.data_locs) #type: ignore
+
+	def _replot_ax_style(self):
+		self.main_plot.setTitle(self.plot_title, color="k") #type: ignore
+		if len(self.legend_names) > 0:
+			legend = self._create_legend(self.legend_names, [self.legend_colors_dict[name] for name in self.legend_names])
+			legend.setParentItem(self.main_view)
+			legend.anchor(itemPos=(0.5, 0), parentPos=(0.5, 0)) #Top center
+
+		domain = self._get_numeric_domain()
+		if domain is None: #Use the range of the plotted data
+			x_vals = [x_plot for x_plot, _ in self._series_xy if len(x_plot) > 0]
+			domain = (min(float(x_plot.min()) for x_plot in x_vals) / self._x_scale,
+				max(float(x_plot.max()) for x_plot in x_vals) / self._x_scale) if len(x_vals) > 0 else None
+		if domain is not None:
+			self.main_view.setXRange(domain[0] * self._x_scale, domain[1] * self._x_scale, padding=0) #type: ignore
+		self._update_views()
+
+	@catch_show_exception_in_popup_decorator(custom_error_msg="<b>Plotting Failed</b>", re_raise=False)
+	def _replot(self, is_stale : typing.Optional[typing.Callable[[], bool]] = None) -> bool:
+		is_stale = is_stale if is_stale is not None else lambda: False
+		self._check_plottable()
+
+		before = time.perf_counter()
+		self._reload_selected_data()
+		log.debug(f"Reloading selected data took: {time.perf_counter() - before}")
+		assert self.selected_data is not None
+		is_datetime = pd.api.types.is_datetime64_any_dtype(self.selected_data[self.settings_model.x_axis])
+		self._x_scale = SECONDS_PER_DAY if is_datetime else 1.0
+
+		label_columns = list(self.settings_model.plotted_labels_list)
+		tracks = self._get_label_tracks(label_columns) if len(label_columns) > 0 else None
+		self._create_layout([] if tracks is None else label_columns)
+		self._replot_colorbars(tracks)
+		if is_stale():
+			return False
+
+		if self.settings_model.fft_toggle: #if fft is toggled on
+			if self.settings_model.x_axis != "DateTime": #TODO: do not hardcode "Datetime"? Maybe check pd.type
+				create_qt_warningbox("Warning: could not plot fft diagram because X-axis is not Datetime - Pleas turn "
+			 		"off FFT or select DateTime for x-axis and replot")
+			else:
+				self._reload_fft_data()
+				self._replot_fft()
+			if is_stale(): #E.g. requested while the warning was shown
+				return False
+
+		before = time.perf_counter()
+		self._replot_selected_data()
+		self._replot_ax_style()
+		log.debug(f"Replotting selected data took: {time.perf_counter() - before}")
+		return True
+
+	def _update_selector_minmaxes(self):
+		"""The y-range of the series might have been panned/zoomed, selections should use the visible ranges"""
+		self.selector.set_minmaxes([tuple(view.viewRange()[1]) for view in self.series_views])
+
+	def _on_select_lasso(self, verts : np.ndarray):
+		self._update_selector_minmaxes()
+		self.selector.on_select_lasso([(x_coord / self._x_scale, y_coord) for x_coord, y_coord in verts])
+
+	def _on_select_rect(self, x_min : float, x_max : float, y_min : float, y_max : float):
+		self._update_selector_minmaxes()
+		self.selector.select_rect(x_min / self._x_scale, x_max / self._x_scale, y_min, y_max)
+
+	def _on_select_span(self, x_min : float, x_max : float):
+		self.selector.on_select_span(x_min / self._x_scale, x_max / self._x_scale)
+
+	def _on_mouse_moved(self, pos : QtCore.QPointF):
+		"""Show the label under the cursor when hovering over a label track"""
+		for label_col, (plot, track, annotation) in self._label_tracks.items():
+			if track is None or not plot.vb.sceneBoundingRect().contains(pos):
+				continue
+			run = track.find_run(plot.vb.mapSceneToView(pos).x() / self._x_scale)
+			if run < 0 or self._hovered == (label_col, run):
+				return
+			self._hide_label()
+			left, right = (val / self._x_scale for val in plot.vb.viewRange()[0])
+			center = (max(track.edges[run], left) + min(track.edges[run + 1], right)) / 2
+			annotation.setText(str(track.get_label(run)))
+			annotation.setPos(center * self._x_scale, 0.5)
+			annotation.setVisible(True)
+			self._hovered = (label_col, run)
+			return
+		self._hide_label()
+
+	def _hide_label(self):
+		if self._hovered is None:
+			return
+		track = self._label_tracks.get(self._hovered[0], None)
+		self._hovered = None
+		if track is not None:
+			track[2].setVisible(False)
@@ -0,0 +1,119 @@
+"""
+Implements a scheduler that coalesces replot-requests into a single render.
+
+Several UI-actions request a replot more than once (e.g. a signal connected to both a settings-update and a replot),
+and every replot used to redraw the whole figure. Instead, requests only mark the stages of the replot that need to be
+re-executed as dirty and start a zero-timeout timer: all requests made within the same event-loop iteration result in
+one render of the combined dirty stages. Every request increments a generation counter, so a render that is still
+running when newer requests arrive (e.g. because a popup runs a nested event loop) can detect it has become stale and
+stop early, the newer render then takes over.
+"""
+import enum
+import logging
+import typing
+
+from PySide6 import QtCore
+
+log = logging.getLogger(__name__)
+
+
+class ReplotStage(enum.Flag):
+	"""The stages of a replot"""
+	NONE = 0
+	DATA = enum.auto() #(Re)load the plotted data (domain, columns, x-axis or the dataframe changed)
+	COLORBARS = enum.auto() #The label tracks
+	FFT = enum.auto() #The spectrogram
+	SERIES = enum.auto() #The plotted series (line-collections/scatters) and their colors
+	STYLE = enum.auto() #Fonts, legends, titles and layout
+	ALL = DATA | COLORBARS | FFT | SERIES | STYLE
+
+
+class ReplotScheduler(QtCore.QObject):
+	"""
+	Collects the dirty stages of replot-requests and renders them once control returns to the event loop.
+
+	The render-callback is called with the dirty stages and a function that returns whether a newer request was made
+	since the render started. The callback returns whether it completed, if not, its stages stay dirty.
+	"""
+	renderFinished = QtCore.Signal(object) #The stages (ReplotStage) that were rendered
+
+	def __init__(self,
+				render : typing.Callable[[ReplotStage, typing.Callable[[], bool]], bool],
+				parent : typing.Optional[QtCore.QObject] = None
+			):
+		super().__init__(parent)
+		self._render = render
+		self._dirty = ReplotStage.NONE
+		self._generation = 0
+		self._rendering = False
+		self._pending_after_render = False #A request was made during a render, schedule a new render once it is done
+		self._timer = QtCore.QTimer(self)
+		self._timer.setSingleShot(True)
+		self._timer.setInterval(0) #Run once all events of the current event-loop iteration are processed
+		self._timer.timeout.connect(self._run)
+
+	@property
+	def dirty_stages(self) -> ReplotStage:
+		"""The stages that will be re-executed on the next render"""
+		return self._dirty
+
+	@property
+	def generation(self) -> int:
+		"""The amount of requests made so far"""
+		return self._generation
+
+	@property
+	def is_pending(self) -> bool:
+		"""Whether a render is scheduled"""
+		return self._timer.isActive()
+
+	def invalidate(self, stages : ReplotStage):
+		"""Mark stages as dirty without scheduling a render, they are re-executed on the next (requested) render"""
+		self._dirty |= stages
+
+	def request(self, stages : ReplotStage = ReplotStage.ALL):
+		"""Mark the passed stages as dirty and schedule a render (requests made before the render are coalesced)"""
+		self._dirty |= stages
+		self._generation += 1
+		if self._rendering: #E.g. from a nested event loop, polling the timer would busy-loop until the render is done
+			self._pending_after_render = True
+		elif not self._timer.isActive():
+			self._timer.start()
+
+	def flush(self):
+		"""Render the pending request right away (e.g. when the result is needed before returning to the event loop)"""
+		if self._timer.isActive() and not self._rendering:
+			self._timer.stop()
+			self._run()
+
+	def cancel(self):
+		"""Cancel the pending render, the dirty stages are kept"""
+		self._timer.stop()
+		self._pending_after_render = False
+
+	def _run(self):
+		if self._rendering: #Should not happen (requests during a render are deferred), render again once it is done
+			self._pending_after_render = True
+			return
+		stages, self._dirty = self._dirty, ReplotStage.NONE
+		generation = self._generation
+		self._rendering = True
+		try:
+			completed = self._render(stages, lambda: self._generation != generation)
+		except Exception: #Keep the stages dirty, so the next request re-executes them
+			self._dirty |= stages
+			raise
+		finally:
+			self._rendering = False
+			if self._pending_after_render: #Requested from within the render (nested event loop) -> render again
+				self._pending_after_render = False
+				if not self._timer.isActive():
+					self._timer.start()
+
+		if not completed:
+			log.debug(f"Render of {stages} was superseded by a newer request")
+			self._dirty |= stages
+			if self._generation != generation and not self._timer.isActive():
+				self._timer.start()
+			return
+		self.renderFinished.emit(stages)
@@ -0,0 +1,146 @@
+"""
+Spatial indexes for the points of a plotted series, used to speed up selections (span, rectangle and lasso).
+
+Instead of testing every point of every series, a selection first retrieves the candidates inside its bounding box:
+a sorted-x index is used for (horizontal) spans and a uniform grid (stored in CSR-form: points sorted by grid cell)
+for rectangles and lassos. Only these candidates are then tested exactly. If the x-values are already sorted (e.g.
+time series), the bounding box is resolved using a binary search on x, so no grid has to be built at all.
+"""
+import logging
+import math
+import typing
+
+import matplotlib.path
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+class PointIndex():
+	"""
+	Spatial index of a set of 2D points (e.g. the [x, y] values of a plotted series). Non-finite points are never
+	returned. The index structures are built on the first query that needs them, so a replot without selections does
+	not pay for them.
+	"""
+	POINTS_PER_CELL = 64 #Average amount of points per grid cell
+
+	def __init__(self, xys : np.ndarray):
+		"""
+		Args:
+			xys (np.ndarray): Array of shape (n, 2) with the x/y-coordinates of the points
+		"""
+		self._xys = xys
+
+		self._x_is_sorted : typing.Optional[bool] = None #Whether all x-values are finite and sorted ascending
+		self._x_order : typing.Optional[np.ndarray] = None #Index that sorts the (finite) points by x (None=identity)
+		self._sorted_x : typing.Optional[np.ndarray] = None
+
+		self._grid_built = False
+		self._grid_origin = (0.0, 0.0)
+		self._grid_cell_size = (1.0, 1.0)
+		self._grid_shape = (0, 0) #(n_x, n_y) cells
+		self._grid_order : typing.Optional[np.ndarray] = None #Point indexes, sorted by cell
+		self._grid_cell_starts : typing.Optional[np.ndarray] = None #Start of each cell in _grid_order (CSR-offsets)
+
+	def __len__(self):
+		return len(self._xys)
+
+	@property
+	def x_is_sorted(self) -> bool:
+		"""Whether all x-values are finite and sorted ascending (e.g. time series)"""
+		if self._x_is_sorted is None:
+			x_vals = self._xys[:, 0]
+			self._x_is_sorted = bool(np.isfinite(x_vals).all() and np.all(x_vals[1:] >= x_vals[:-1]))
+		return self._x_is_sorted
+
+	def _build_x_index(self):
+		x_vals = self._xys[:, 0]
+		if self.x_is_sorted: #No need to sort
+			self._x_order = None
+			self._sorted_x = x_vals
+			return
+		finite_idx = np.flatnonzero(np.isfinite(x_vals))
+		self._x_order = finite_idx[np.argsort(x_vals[finite_idx], kind="stable")]
+		self._sorted_x = x_vals[self._x_order]
+
+	def _build_grid(self):
+		self._grid_built = True
+		finite_idx = np.flatnonzero(np.isfinite(self._xys).all(axis=1))
+		if len(finite_idx) == 0:
+			self._grid_shape = (0, 0)
+			return
+		pts = self._xys[finite_idx]
+		mins, maxes = pts.min(axis=0), pts.max(axis=0)
+		n_cells_side = max(1, int(math.sqrt(len(pts) / self.POINTS_PER_CELL)))
+		self._grid_shape = (n_cells_side, n_cells_side)
+		self._grid_origin = (float(mins[0]), float(mins[1]))
+		spans = np.where(maxes > mins, maxes - mins, 1.0)
+		self._grid_cell_size = (float(spans[0] / n_cells_side), float(spans[1] / n_cells_side))
+
+		cell_ids = self._get_cells(pts[:, 0], pts[:, 1]).astype(np.int32) #At most len(pts) / POINTS_PER_CELL cells
+		order = np.argsort(cell_ids) #Order within a cell does not matter
+		self._grid_order = finite_idx[order]
+		self._grid_cell_starts = np.searchsorted(
+			cell_ids[order], np.arange(n_cells_side * n_cells_side + 1), side="left")
+
+	def _get_cell_coords(self, coords : np.ndarray, axis : int) -> np.ndarray:
+		"""Get the (clipped) cell coordinate along an axis (0=x, 1=y)"""
+		cells = np.floor((coords - self._grid_origin[axis]) / self._grid_cell_size[axis])
+		return np.clip(cells, 0, self._grid_shape[axis] - 1).astype(np.int64)
+
+	def _get_cells(self, x_vals : np.ndarray, y_vals : np.ndarray) -> np.ndarray:
+		"""Get the (row-major) cell id of each point"""
+		return self._get_cell_coords(y_vals, 1) * self._grid_shape[0] + self._get_cell_coords(x_vals, 0)
+
+	def query_x_range(self, left : float, right : float) -> np.ndarray:
+		"""Get the indexes of all points with left <= x <= right using a binary search
+
+		Returns:
+			np.ndarray: The (unsorted if the x-values are unsorted) indexes of the points in the range
+		"""
+		if self._sorted_x is None:
+			self._build_x_index()
+		start = int(np.searchsorted(self._sorted_x, left, side="left")) #type: ignore
+		stop = int(np.searchsorted(self._sorted_x, right, side="right")) #type: ignore
+		if stop <= start:
+			return np.zeros(0, dtype=np.int64)
+		if self._x_order is None:
+			return np.arange(start, stop)
+		return self._x_order[start:stop]
+
+	def query_bbox_candidates(self, x_min : float, x_max : float, y_min : float, y_max : float) -> np.ndarray:
+		"""Get the indexes of all points in the grid cells that overlap with the passed bounding box (or all points in
+		the x-range if the x-values are sorted). This is a superset of the points inside the bounding box.
+		"""
+		if self.x_is_sorted: #A binary search is cheaper than building a grid
+			return self.query_x_range(x_min, x_max)
+		if not self._grid_built:
+			self._build_grid()
+		n_x, n_y = self._grid_shape
+		if n_x == 0 or x_max < x_min or y_max < y_min:
+			return np.zeros(0, dtype=np.int64)
+		x_0, x_1 = self._get_cell_coords(np.array([x_min, x_max]), 0)
+		y_0, y_1 = self._get_cell_coords(np.array([y_min, y_max]), 1)
+		row_starts = np.arange(y_0, y_1 + 1) * n_x
+		#Cells x_0..x_1 of a single row are contiguous in the CSR-layout -> one slice per row
+		starts = self._grid_cell_starts[row_starts + x_0] #type: ignore
+		stops = self._grid_cell_starts[row_starts + x_1 + 1] #type: ignore
+		if len(starts) == 0:
+			return np.zeros(0, dtype=np.int64)
+		return np.concatenate([self._grid_order[start:stop] for start, stop in zip(starts, stops)]) #type: ignore
+
+	def query_bbox(self, x_min : float, x_max : float, y_min : float, y_max : float) -> np.ndarray:
+		"""Get the indexes of all points inside the (closed) bounding box"""
+		candidates = self.query_bbox_candidates(x_min, x_max, y_min, y_max)
+		pts = self._xys[candidates]
+		inside = (pts[:, 0] >= x_min) & (pts[:, 0] <= x_max) & (pts[:, 1] >= y_min) & (pts[:, 1] <= y_max)
+		return candidates[inside]
+
+	def query_path(self, path : matplotlib.path.Path) -> np.ndarray:
+		"""Get the indexes of all points inside the passed path (e.g. a lasso), only the points inside the bounding box
+		of the path are tested"""
+		bbox = path.get_extents()
+		candidates = self.query_bbox(bbox.x0, bbox.x1, bbox.y0, bbox.y1)
+		if len(candidates) == 0:
+			return candidates
+		return candidates[path.contains_points(self._xys[candidates])]
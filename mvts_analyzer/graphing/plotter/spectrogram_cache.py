@@ -0,0 +1,221 @@
+"""
+Implements a cache of (quality-reduced) spectrogram tiles, used by the plotter to draw fft-columns.
+
+The DateTime-sorted rows of the dataframe are averaged into time-bins of 2^level consecutive rows, the level is picked
+per window so the window holds (about) one to two bins per pixel. Each level is split into tiles of a fixed amount of
+bins. A tile holds the fft-lines (within the line range, reduced in y-resolution) of its bins as a float32 block, so a
+tile is small no matter how many rows it covers. A time window (e.g. the plot domain) is assembled from the tiles that
+cover it, so replotting the same window, or panning over rows that were already plotted at the same zoom level, does
+not have to convert/reduce the fft-data again. The tiles contain the raw (not normalized) data, brightness/colormap
+changes only change how the data is mapped to colors.
+"""
+import collections
+import logging
+import math
+import typing
+
+import numpy as np
+
+from mvts_analyzer.graphing.graph_data import GraphData
+from mvts_analyzer.utility import downsampling
+
+log = logging.getLogger(__name__)
+
+
+class SpectrogramTile(typing.NamedTuple):
+	"""The (time-binned) fft-data of a range of DateTime-sorted rows, bins without fft-data are dropped"""
+	bins : np.ndarray #The (level-)bin of each kept bin, bin i contains the sorted rows [i << level, (i + 1) << level)
+	times : np.ndarray #The DateTime of each kept bin (the center of its rows)
+	z : np.ndarray #(kept bins x reduced lines) float32 block
+
+	@property
+	def nbytes(self) -> int:
+		"""The memory used by this tile"""
+		return self.bins.nbytes + self.times.nbytes + self.z.nbytes
+
+
+class SpectrogramTileCache():
+	"""
+	LRU-cache of spectrogram tiles, keyed by (column, line_left, line_right, y_reduction, level, tile). The cache is
+	only used for fft-columns that are stored as a contiguous matrix (see GraphData.get_fft_matrix) and is cleared when
+	the matrix, its rows or the DateTime-order of the dataframe change.
+	"""
+	TILE_BINS = 512 #Time-bins per tile
+	MAX_CACHE_BYTES = 256 * 1024**2 #Least recently used tiles are dropped once this size is exceeded
+	CHUNK_ROWS = 4096 #Rows are gathered from the matrix (and averaged into their bins) in chunks of this size
+
+	def __init__(self, data_model : GraphData):
+		self.data_model = data_model
+		self._tiles : typing.OrderedDict[tuple, SpectrogramTile] = collections.OrderedDict()
+		self._cached_bytes = 0
+		self._sources : typing.Dict[str, typing.Tuple[np.ndarray, np.ndarray, np.ndarray]] = {} #(matrix, rows, order)
+		self._last_window : typing.Optional[tuple] = None #(key, (times, z)) of the last assembled window
+		self.data_model.dfChanged.connect(self._on_df_changed)
+
+	@property
+	def cached_bytes(self) -> int:
+		"""The memory used by the cached tiles"""
+		return self._cached_bytes
+
+	def clear(self):
+		"""Remove all tiles"""
+		self._tiles.clear()
+		self._cached_bytes = 0
+		self._sources.clear()
+		self._last_window = None
+
+	def _on_df_changed(self):
+		self._last_window = None #The DateTime-column might have changed in place, tiles are validated on the next get
+		changed_columns = self.data_model.changed_columns
+		for column in list(self._sources):
+			if changed_columns is None or column in changed_columns: #E.g. the fft-data was edited in place
+				self._drop_column(column)
+
+	@staticmethod
+	def get_level(n_rows : int, max_columns : typing.Optional[int]) -> int:
+		"""Get the binning level of a window of n_rows rows, so it holds between max_columns and 2 * max_columns bins
+		(or all rows if max_columns is None or there are fewer rows)"""
+		if max_columns is None or max_columns <= 0 or n_rows <= max_columns:
+			return 0
+		return int(math.floor(math.log2(n_rows / max_columns)))
+
+	def get_window(self,
+				column : str,
+				line_left : int,
+				line_right : int,
+				y_reduction : int,
+				left : typing.Any = None,
+				right : typing.Any = None,
+				max_columns : typing.Optional[int] = None
+			) -> typing.Optional[typing.Tuple[np.ndarray, np.ndarray]]:
+		"""Get the fft-data of all rows with left <= DateTime <= right, sorted by DateTime.
+
+		Args:
+			column (str): The fft-column
+			line_left (int): The first fft-line (inclusive)
+			line_right (int): The last fft-line (exclusive)
+			y_reduction (int): The amount of lines that are averaged into one (>=1)
+			left (typing.Any, optional): The left bound of the time window. Defaults to None (no bound).
+			right (typing.Any, optional): The right bound of the time window. Defaults to None (no bound).
+			max_columns (int | None, optional): If passed, consecutive rows are averaged into time-bins, so the window
+				holds between max_columns and 2 * max_columns bins (e.g. the width of the plot in pixels). The bins at
+				the edges of the window may contain some rows just outside of it. Defaults to None (all rows).
+
+		Returns:
+			typing.Optional[typing.Tuple[np.ndarray, np.ndarray]]: The times and the (bins x reduced lines) float32 data
+				or None if the column is not available as a matrix (or there is no DateTime index)
+		"""
+		fft_matrix = self.data_model.get_fft_matrix(column)
+		sort_order = self.data_model.dt_sort_order
+		if fft_matrix is None or sort_order is None or self.data_model.dt_sorted_times is None:
+			return None
+		matrix, matrix_rows = fft_matrix
+		source = self._sources.get(column, None)
+		if source is None or source[0] is not matrix or source[1] is not matrix_rows or source[2] is not sort_order:
+			self._drop_column(column) #Matrix/rows/order were rebuilt
+			self._sources[column] = (matrix, matrix_rows, sort_order)
+
+		start, stop = self.data_model.get_dt_row_range(left, right)
+		level = self.get_level(stop - start, max_columns)
+		window_key = (column, line_left, line_right, y_reduction, level, start, stop)
+		if self._last_window is not None and self._last_window[0] == window_key:
+			return self._last_window[1]
+
+		first_bin, stop_bin = start >> level, -(-stop >> level) #Bins that (partially) overlap the window
+		tile_bins = self.TILE_BINS
+		keys, tiles = [], []
+		for tile_idx in range(first_bin // tile_bins, -(-stop_bin // tile_bins)):
+			key = (column, line_left, line_right, y_reduction, level, tile_idx)
+			tile = self._tiles.get(key, None)
+			if tile is None:
+				tile = self._create_tile(matrix, matrix_rows, level, tile_idx, line_left, line_right, y_reduction)
+				self._tiles[key] = tile
+				self._cached_bytes += tile.nbytes
+			else:
+				self._tiles.move_to_end(key)
+			keys.append(key)
+			tiles.append(tile)
+		self._evict(set(keys)) #Never drop the tiles of this window
+
+		#Copy the overlapping part of each tile into the (canvas-sized) window
+		ranges = [(int(np.searchsorted(tile.bins, first_bin, side="left")),
+			int(np.searchsorted(tile.bins, stop_bin, side="left"))) for tile in tiles]
+		n_bins = sum(last - first for first, last in ranges)
+		n_lines = len(range(line_left, line_right)[::y_reduction]) #Amount of reduced lines
+		times, z = np.empty(n_bins, dtype="datetime64[ns]"), np.empty((n_bins, n_lines), dtype=np.float32)
+		pos = 0
+		for tile, (first, last) in zip(tiles, ranges):
+			times[pos : pos + last - first] = tile.times[first:last]
+			z[pos : pos + last - first] = tile.z[first:last]
+			pos += last - first
+		window = (times, z)
+		self._last_window = (window_key, window)
+		return window
+
+	def _create_tile(self,
+				matrix : np.ndarray,
+				matrix_rows : np.ndarray,
+				level : int,
+				tile_idx : int,
+				line_left : int,
+				line_right : int,
+				y_reduction : int
+			) -> SpectrogramTile:
+		n_sorted = len(self.data_model.dt_sort_order) #type: ignore
+		bin_size = 1 << level
+		start = min(tile_idx * self.TILE_BINS * bin_size, n_sorted)
+		stop = min(start + self.TILE_BINS * bin_size, n_sorted)
+		positions = self.data_model.dt_sort_order[start:stop] #type: ignore
+		rows = matrix_rows[positions]
+		keep = np.flatnonzero(rows >= 0) #Drop rows without fft-data
+		sorted_times = self.data_model.dt_sorted_times[start:stop] #type: ignore
+		if len(keep) == 0:
+			return SpectrogramTile(bins=np.zeros(0, dtype=np.int64), times=np.zeros(0, dtype="datetime64[ns]"),
+				z=np.zeros((0, len(range(line_left, line_right)[::y_reduction])), dtype=np.float32))
+
+		#Reduce the y-resolution while gathering the rows, rows are gathered (and summed per bin) one chunk at a time, so
+		#	no full-resolution copy of the tile is made
+		values = matrix[:, line_left : line_right]
+		row_bins = keep >> level #Bin of each kept row (relative to the tile)
+		bin_starts = np.flatnonzero(np.diff(row_bins, prepend=-1)) #First kept row of each bin with fft-data
+		bins = row_bins[bin_starts]
+		if bin_size == 1:
+			z = downsampling.bin_mean(values, 1, y_reduction, rows=rows[keep])
+		else:
+			bin_idx = np.repeat(np.arange(len(bins)), np.diff(np.append(bin_starts, len(keep))))
+			sums = np.zeros((len(bins), len(range(line_left, line_right)[::y_reduction])), dtype=np.float64)
+			for chunk_start in range(0, len(keep), self.CHUNK_ROWS):
+				chunk_bins = bin_idx[chunk_start : chunk_start + self.CHUNK_ROWS]
+				chunk = downsampling.bin_mean(values, 1, y_reduction,
+					rows=rows[keep[chunk_start : chunk_start + self.CHUNK_ROWS]])
+				starts = np.flatnonzero(np.diff(chunk_bins, prepend=-1))
+				sums[chunk_bins[starts]] += np.add.reduceat(chunk, starts, axis=0)
+			z = (sums / np.bincount(bin_idx, minlength=len(bins))[:, np.newaxis]).astype(np.float32)
+
+		#The time of a bin is the center of all of its rows (also those without fft-data), so regularly sampled rows
+		#	result in regularly sampled bins. The last bin of the data might be partial, its center is extrapolated.
+		first_rows = bins * bin_size
+		last_rows = np.minimum(first_rows + bin_size, stop - start) - 1
+		first_times, last_times = sorted_times[first_rows], sorted_times[last_rows]
+		n_rows = last_rows - first_rows + 1
+		step = (last_times - first_times) / np.maximum(n_rows - 1, 1)
+		if np.any(n_rows == 1) and len(sorted_times) > 1: #Single-row bins: use the median step of the tile
+			step = np.where(n_rows == 1, float(np.median(np.diff(sorted_times))), step)
+		times = (first_times + np.rint(step * (bin_size - 1) / 2).astype(np.int64)).view("datetime64[ns]")
+		return SpectrogramTile(bins=bins + (start >> level), times=times, z=z)
+
+	def _evict(self, protected : typing.Set[tuple]):
+		"""Drop the least recently used tiles (that are not protected) until the cache fits in MAX_CACHE_BYTES"""
+		while self._cached_bytes > self.MAX_CACHE_BYTES and len(self._tiles) > 0:
+			key = next(iter(self._tiles))
+			if key in protected: #Protected tiles were used last, so all remaining tiles are protected
+				break
+			self._cached_bytes -= self._tiles.pop(key).nbytes
+
+	def _drop_column(self, column : str):
+		for key in [key for key in self._tiles if key[0] == column]:
+			self._cached_bytes -= self._tiles.pop(key).nbytes
+		self._sources.pop(column, None)
+		if self._last_window is not None and self._last_window[0][0] == column:
+			self._last_window = None
+		log.debug(f"Dropped cached spectrogram tiles of column {column}")
@@ -64,6 +64,7 @@ class Ui_ApplyPythonWindow(object):
         font = QFont()
         font.setItalic(True)
         self.label.setFont(font)
+        self.label.setWordWrap(True)
 
         self.verticalLayout_2.addWidget(self.label)
 
@@ -149,7 +150,7 @@ class Ui_ApplyPythonWindow(object):
         self.actionSave.setShortcut(QCoreApplication.translate("ApplyPythonWindow", u"Ctrl+S", None))
 #endif // QT_CONFIG(shortcut)
         self.actionactionExecutePythonCode.setText(QCoreApplication.translate("ApplyPythonWindow", u"actionExecutePythonCode", None))
-        self.label.setText(QCoreApplication.translate("ApplyPythonWindow", u"Note: the main dataframe is accesible in this window using self.df (and optionally self.df_selection)", None))
+        self.label.setText(QCoreApplication.translate("ApplyPythonWindow", u"Note: the main dataframe is accesible in this window using self.df (and optionally self.df_selection). Label columns are stored as categoricals, use self.set_lbls(column, mask, label) to set new labels", None))
         self.ExecuteButton.setText(QCoreApplication.translate("ApplyPythonWindow", u"Execute", None))
         self.ExecuteAndUpdateButton.setText(QCoreApplication.translate("ApplyPythonWindow", u"Execute + Update", None))
         self.CancelButton.setText(QCoreApplication.translate("ApplyPythonWindow", u"Cancel", None))
@@ -0,0 +1,578 @@
+"""
+Implements a streaming (chunked) csv reader for large (log) files.
+
+Instead of reading the whole file at once and converting every string-column to datetime afterwards (which keeps
+several copies of the data in memory and infers the datetime format per column, per value), the datetime columns and
+their formats are detected once on a sample of the file. The file is then parsed in chunks of rows, parsing the
+datetime columns of each chunk with the detected explicit format. The values of each chunk are copied into
+preallocated (and when needed, grown) typed arrays, so only a single chunk of intermediate data exists at any time.
+Float columns are downcast to float32 when this is exact for all values, integer columns are downcast to the smallest
+integer type that holds all of their values.
+
+Large files can also be parsed in parallel (read_csv_parallel): the file is split into pieces at line boundaries, which
+are parsed by a pool of processes. Each process writes its piece as an Arrow IPC file, so the pieces are passed back
+as columnar buffers instead of pickled dataframes, after which they are concatenated once. This requires the optional
+dependency pyarrow, without it (or for small files) the streaming reader is used.
+"""
+import concurrent.futures
+import io
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import typing
+import warnings
+
+import numpy as np
+import pandas as pd
+
+try:
+	from pandas.tseries.api import guess_datetime_format #type: ignore #pandas>=2.2
+except ImportError:
+	from pandas._libs.tslibs.parsing import guess_datetime_format #type: ignore #pylint: disable=no-name-in-module
+
+log = logging.getLogger(__name__)
+
+SAMPLE_BYTES = 1024**2 #The first part of the file that is used to detect the separator, columns and datetime formats
+DEFAULT_CHUNK_ROWS = 250_000
+DATETIME_SAMPLE_SIZE = 1000 #The amount of (non-null) sample values that must parse using the detected format
+DEFAULT_MIN_PARALLEL_BYTES = 64 * 1024**2 #Smaller files are read using the streaming reader (process startup is slow)
+DEFAULT_PIECE_BYTES = 32 * 1024**2 #Approximate size of the pieces that are parsed in parallel
+
+
+class ProgressReader():
+	"""Wraps a (binary) file handle and reports the amount of bytes read to a progress callback on each read, so
+	the parser (e.g. pd.read_csv, which reads in chunks) can be followed and cancelled from the callback."""
+	def __init__(self, handle : typing.BinaryIO, progress_callback : typing.Callable[[int, int], None]):
+		self._handle = handle
+		self._progress_callback = progress_callback
+		self.bytes_read = 0
+		self.rows_parsed = 0
+
+	def read(self, size : int = -1) -> bytes:
+		data = self._handle.read(size)
+		self.bytes_read += len(data)
+		self._progress_callback(self.bytes_read, self.rows_parsed)
+		return data
+
+	def readline(self, size : int = -1) -> bytes:
+		data = self._handle.readline(size)
+		self.bytes_read += len(data)
+		return data
+
+	def __iter__(self):
+		return iter(self.readline, b"")
+
+	def report_rows(self, rows_parsed : int):
+		"""Set the amount of rows parsed so far and report it to the progress callback"""
+		self.rows_parsed = rows_parsed
+		self._progress_callback(self.bytes_read, self.rows_parsed)
+
+	def rewind(self):
+		"""Go back to the start of the file (e.g. to re-parse with different settings)"""
+		self._handle.seek(0)
+		self.bytes_read = 0
+		self.rows_parsed = 0
+
+
+def detect_separator(sample : str) -> str:
+	"""Detect the separator of a csv-file: ";" if it occurs more than "," in the sample, else ","  """
+	return ";" if sample.count(";") > sample.count(",") else ","
+
+
+def detect_datetime_columns(sample_df : pd.DataFrame) -> typing.Dict[str, typing.Optional[str]]:
+	"""Detect which (string) columns of a sample contain datetimes, and their format. A column is a datetime column
+	if its first value is a string and (up to DATETIME_SAMPLE_SIZE of) its non-null values can all be parsed.
+
+	Args:
+		sample_df (pd.DataFrame): The sample (the first rows of the file, parsed without datetime conversion)
+
+	Returns:
+		typing.Dict[str, typing.Optional[str]]: {column : format}, the format is None if it could not be guessed (in
+			which case pandas infers it while parsing)
+	"""
+	datetime_columns = {}
+	for col in sample_df.select_dtypes(include=["object"]).columns:
+		values = sample_df[col].dropna()
+		if len(values) == 0 or not isinstance(sample_df[col].iloc[0], str):
+			continue
+		values = values.iloc[:DATETIME_SAMPLE_SIZE]
+		fmt = guess_datetime_format(values.iloc[0])
+		for try_fmt in ([fmt, None] if fmt is not None else [None]):
+			try:
+				with warnings.catch_warnings(): #E.g. "could not infer format" for non-datetime columns
+					warnings.simplefilter("ignore")
+					parsed = pd.to_datetime(values, format=try_fmt)
+			except (ValueError, TypeError, OverflowError):
+				continue
+			if pd.api.types.is_datetime64_any_dtype(parsed.dtype): #E.g. mixed timezones result in object-dtype
+				datetime_columns[col] = try_fmt
+				break
+	log.debug(f"Detected datetime columns (and formats): {datetime_columns}")
+	return datetime_columns
+
+
+def downcast_lossless(values : np.ndarray) -> np.ndarray:
+	"""Downcast float64 values to float32 if this is exact for all values (e.g. integers with missing values, or values
+	with few significant digits like 0.5), and signed integer values to the smallest signed integer type (int8, int16
+	or int32) that holds their min and max. Otherwise returns the values as-is.
+	"""
+	if len(values) == 0:
+		return values
+	if values.dtype.kind == "i":
+		min_value, max_value = values.min(), values.max()
+		for int_type in (np.int8, np.int16, np.int32):
+			if np.dtype(int_type).itemsize >= values.dtype.itemsize:
+				break
+			if np.iinfo(int_type).min <= min_value and max_value <= np.iinfo(int_type).max:
+				return values.astype(int_type)
+		return values
+	if values.dtype != np.float64:
+		return values
+	downcast = values.astype(np.float32)
+	with np.errstate(invalid="ignore", over="ignore"):
+		if np.array_equal(downcast.astype(np.float64), values, equal_nan=True):
+			return downcast
+	return values
+
+
+class _ColumnBuffer():
+	"""Preallocated array to which the values of subsequent chunks are copied, the array is grown (doubled) when it is
+	full and its dtype is promoted when a chunk has a different dtype (e.g. int -> float when NaNs occur)."""
+	def __init__(self, capacity : int):
+		self._capacity = max(capacity, 1)
+		self._values : typing.Optional[np.ndarray] = None
+		self._len = 0
+
+	def append(self, values : np.ndarray):
+		"""Copy the values of a chunk to the end of the buffer"""
+		if self._values is None:
+			self._values = np.empty(max(self._capacity, len(values)), dtype=values.dtype)
+		else:
+			dtype = np.result_type(self._values.dtype, values.dtype)
+			capacity = len(self._values)
+			while capacity < self._len + len(values):
+				capacity *= 2
+			if dtype != self._values.dtype or capacity != len(self._values):
+				new_values = np.empty(capacity, dtype=dtype)
+				new_values[:self._len] = self._values[:self._len]
+				self._values = new_values
+		self._values[self._len:self._len + len(values)] = values
+		self._len += len(values)
+
+	@property
+	def dtype(self) -> typing.Optional[np.dtype]:
+		"""The dtype of the buffer (None if nothing has been appended yet)"""
+		return None if self._values is None else self._values.dtype
+
+	def get(self) -> np.ndarray:
+		"""Returns the filled part of the buffer (a view)"""
+		if self._values is None:
+			return np.zeros(0, dtype=object)
+		return self._values[:self._len]
+
+
+class _ColumnReparseError(Exception):
+	"""A chunk of a column is not consistent with the previous chunks, e.g. a detected datetime column could not be
+	parsed (using the detected format) or a numeric column contains strings, the file has to be re-parsed with this
+	column as a (non-datetime) string column."""
+	def __init__(self, column : str):
+		super().__init__(column) #Only pass the column, so the error can be pickled (raised in worker processes)
+		self.column = column
+
+	def __str__(self):
+		return f"Column {self.column} has to be re-parsed as a string column"
+
+
+def _mixes_numbers_and_strings(buffer_dtype : typing.Optional[np.dtype], values : np.ndarray) -> bool:
+	"""Whether the values of a chunk mix numbers and strings with the previous chunks. When reading the whole file at
+	once, pandas parses such a column as strings, so the file should be re-parsed with the column as strings."""
+	if buffer_dtype is None or (buffer_dtype == object) == (values.dtype == object):
+		return False
+	numeric_kind = (values.dtype if buffer_dtype == object else buffer_dtype).kind
+	if numeric_kind not in "iuf": #E.g. bool + object(bool/NaN) is also what pandas produces
+		return False
+	if buffer_dtype == object and values.dtype.kind == "f" and np.isnan(values).all(): #Only missing values
+		return False
+	return True
+
+
+def _parse_datetime_column(column : str, values : pd.Series, fmt : typing.Optional[str]) -> pd.Series:
+	"""Parse a (chunk of a) datetime column using the detected format, raises _ColumnReparseError if this fails"""
+	try:
+		parsed = pd.to_datetime(values, format=fmt)
+	except (ValueError, TypeError, OverflowError) as err:
+		raise _ColumnReparseError(column) from err
+	if not pd.api.types.is_datetime64_any_dtype(parsed.dtype):
+		raise _ColumnReparseError(column)
+	return parsed
+
+
+def _parse_datetime_chunk(
+			column : str,
+			values : pd.Series,
+			fmt : typing.Optional[str]
+		) -> typing.Tuple[np.ndarray, typing.Any]:
+	"""Parse a chunk of a datetime column to int64 nanoseconds (UTC for timezone-aware columns)
+
+	Returns:
+		typing.Tuple[np.ndarray, typing.Any]: the int64 values and the timezone of the chunk
+	"""
+	parsed = _parse_datetime_column(column, values, fmt)
+	chunk_timezone = parsed.dt.tz
+	if chunk_timezone is not None:
+		parsed = parsed.dt.tz_convert(None) #Naive UTC
+	return parsed.to_numpy(dtype="datetime64[ns]").view(np.int64), chunk_timezone
+
+
+class _CsvLayout(typing.NamedTuple):
+	"""The layout of a csv-file, as detected on a sample (the first part) of the file"""
+	sep : str
+	columns : typing.List[str]
+	datetime_columns : typing.Dict[str, typing.Optional[str]] #{column : format}
+	header : bytes #The first line (including newline)
+	file_size : int
+	estimated_rows : int
+	has_quotes : bool #Whether the sample contains quotes (quoted fields can contain newlines)
+
+
+def _inspect_csv(file : typing.BinaryIO) -> _CsvLayout:
+	"""Detect the layout of an opened csv-file using a sample of the file, the file is rewound afterwards"""
+	sample = file.read(SAMPLE_BYTES)
+	file_size = file.seek(0, io.SEEK_END)
+	file.seek(0)
+	sample_text = sample.decode("utf-8", errors="ignore")
+	sep = detect_separator(sample_text[:1000])
+	if len(sample) < file_size and b"\n" in sample: #Only use complete lines
+		sample = sample[:sample.rindex(b"\n") + 1]
+	sample_df = pd.read_csv(io.BytesIO(sample), sep=sep)
+	bytes_per_row = len(sample) / max(len(sample_df), 1)
+	header = sample[:sample.index(b"\n") + 1] if b"\n" in sample else sample
+	return _CsvLayout(
+		sep=sep,
+		columns=list(sample_df.columns),
+		datetime_columns=detect_datetime_columns(sample_df),
+		header=header,
+		file_size=file_size,
+		estimated_rows=int(file_size / bytes_per_row * 1.05) + 1, #Overestimate a bit to prevent regrowing
+		has_quotes=b'"' in sample
+	)
+
+
+def _build_dataframe(data : typing.Dict[str, pd.Series], index_col : str, downcast : bool) -> pd.DataFrame:
+	"""Create the resulting dataframe from the parsed columns, using index_col (if it exists) as index"""
+	if downcast:
+		for col, series in data.items():
+			if col != index_col and (series.dtype == np.float64 or series.dtype.kind == "i"):
+				data[col] = pd.Series(downcast_lossless(series.to_numpy()), copy=False)
+	index = pd.Index(data.pop(index_col), name=index_col) if index_col in data else None
+	new_df = pd.DataFrame(data, copy=False)
+	if index is not None:
+		new_df.index = index
+	return new_df
+
+
+def read_csv_streaming(
+			file_source : str,
+			progress_callback : typing.Optional[typing.Callable[[int, int], None]] = None,
+			chunk_rows : int = DEFAULT_CHUNK_ROWS,
+			index_col : str = "Index",
+			downcast : bool = True
+		) -> pd.DataFrame:
+	"""Read a csv-file in chunks, parsing the (automatically detected) datetime columns using a fixed format.
+
+	Args:
+		file_source (str): The csv file
+		progress_callback (typing.Callable[[int, int], None] | None, optional): Called with (bytes_read, rows_parsed)
+			during reading, exceptions raised by the callback (e.g. to cancel) are propagated. Defaults to None.
+		chunk_rows (int, optional): The amount of rows parsed at once. Defaults to DEFAULT_CHUNK_ROWS.
+		index_col (str, optional): If this column exists, it is used as the index. Defaults to "Index".
+		downcast (bool, optional): Whether to downcast float columns to float32 where this is exact, and integer
+			columns to the smallest integer type that holds their values. Defaults to True.
+
+	Returns:
+		pd.DataFrame: The parsed dataframe
+	"""
+	if progress_callback is None:
+		progress_callback = lambda *_: None #pylint: disable=unnecessary-lambda-assignment
+	with open(file_source, "rb") as file:
+		layout = _inspect_csv(file)
+		datetime_columns = dict(layout.datetime_columns)
+		reader = ProgressReader(file, progress_callback)
+		string_columns : typing.Set[str] = set()
+		while True: #Re-parse if a column turns out to be inconsistent (e.g. unparseable datetimes) in a later chunk
+			try:
+				return _read_chunks(reader, layout.sep, layout.columns, datetime_columns, string_columns,
+					chunk_rows, layout.estimated_rows, index_col, downcast)
+			except _ColumnReparseError as err:
+				log.info(f"Column {err.column} is inconsistent between chunks (e.g. not all values are datetimes or "
+					f"numbers), re-parsing the file with {err.column} as a string column")
+				datetime_columns.pop(err.column, None)
+				string_columns.add(err.column)
+				reader.rewind()
+
+
+def _read_chunks(
+			reader : ProgressReader,
+			sep : str,
+			sample_columns : typing.List[str],
+			datetime_columns : typing.Dict[str, typing.Optional[str]],
+			string_columns : typing.Set[str],
+			chunk_rows : int,
+			estimated_rows : int,
+			index_col : str,
+			downcast : bool
+		) -> pd.DataFrame:
+	buffers : typing.Dict[str, _ColumnBuffer] = {}
+	timezones : typing.Dict[str, typing.Any] = {}
+	columns = None
+	with pd.read_csv(reader, sep=sep, chunksize=chunk_rows, #type: ignore
+			dtype={**{col : object for col in datetime_columns}, **{col : str for col in string_columns}}) as chunks:
+		for chunk in chunks:
+			if columns is None:
+				columns = list(chunk.columns)
+				buffers = {col : _ColumnBuffer(estimated_rows) for col in columns}
+			for col in columns:
+				if col in datetime_columns:
+					values, timezone = _parse_datetime_chunk(col, chunk[col], datetime_columns[col])
+					if str(timezones.setdefault(col, timezone)) != str(timezone): #All chunks must have the same tz
+						raise _ColumnReparseError(col)
+				else:
+					values = chunk[col].to_numpy()
+					if _mixes_numbers_and_strings(buffers[col].dtype, values):
+						raise _ColumnReparseError(col)
+				buffers[col].append(values)
+			reader.report_rows(reader.rows_parsed + len(chunk))
+
+	if columns is None: #No rows
+		return pd.DataFrame(columns=sample_columns).set_index(index_col) if index_col in sample_columns \
+			else pd.DataFrame(columns=sample_columns)
+
+	data = {}
+	for col in columns:
+		values = buffers.pop(col).get()
+		if col in datetime_columns:
+			series = pd.Series(values.view("datetime64[ns]"), copy=False)
+			if timezones.get(col, None) is not None:
+				series = series.dt.tz_localize("UTC").dt.tz_convert(timezones[col])
+			data[col] = series
+		else:
+			data[col] = pd.Series(values, copy=False)
+	return _build_dataframe(data, index_col, downcast)
+
+
+def _split_at_lines(
+			file : typing.BinaryIO,
+			start : int,
+			stop : int,
+			n_pieces : int
+		) -> typing.List[typing.Tuple[int, int]]:
+	"""Split the byte-range [start, stop) of a file into (about) n_pieces (start, stop)-ranges that begin at a line"""
+	bounds = [start]
+	for i in range(1, n_pieces):
+		pos = start + (stop - start) * i // n_pieces
+		file.seek(max(pos - 1, 0))
+		file.readline() #Move to the start of the next line (or stay if pos already is the start of a line)
+		pos = file.tell()
+		if bounds[-1] < pos < stop:
+			bounds.append(pos)
+	bounds.append(stop)
+	return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _parse_csv_piece(
+			file_source : str,
+			start : int,
+			stop : int,
+			layout : _CsvLayout,
+			string_columns : typing.Set[str],
+			out_path : str
+		) -> typing.Tuple[int, typing.Dict[str, typing.Any]]:
+	"""Parse the lines in the byte-range [start, stop) of a csv-file and write them as an Arrow IPC file to out_path.
+	Runs in a worker process. Timezone-aware datetime columns are stored as naive UTC.
+
+	Returns:
+		typing.Tuple[int, typing.Dict[str, typing.Any]]: The amount of parsed rows and the timezone of each datetime
+			column
+	"""
+	import pyarrow #pylint: disable=import-outside-toplevel #Optional dependency, only needed for parallel parsing
+	import pyarrow.ipc #pylint: disable=import-outside-toplevel
+
+	with open(file_source, "rb") as file:
+		file.seek(start)
+		data = file.read(stop - start)
+	piece = pd.read_csv(io.BytesIO(layout.header + data), sep=layout.sep, low_memory=False,
+		dtype={**{col : object for col in layout.datetime_columns}, **{col : str for col in string_columns}})
+	del data
+
+	arrays = []
+	timezones = {}
+	for col in piece.columns:
+		values = piece[col]
+		if col in layout.datetime_columns:
+			values = _parse_datetime_column(col, values, layout.datetime_columns[col])
+			timezones[col] = values.dt.tz
+			if timezones[col] is not None:
+				values = values.dt.tz_convert(None) #Naive UTC
+		try:
+			arrays.append(pyarrow.array(values, from_pandas=True))
+		except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError) as err: #E.g. a mix of numbers and strings
+			raise _ColumnReparseError(col) from err
+	table = pyarrow.Table.from_arrays(arrays, names=[str(col) for col in piece.columns])
+	with pyarrow.OSFile(out_path, "wb") as sink, pyarrow.ipc.new_file(sink, table.schema) as writer:
+		writer.write_table(table)
+	return len(piece), timezones
+
+
+def _unify_piece_types(tables : list) -> list:
+	"""Cast the columns of the (Arrow) tables of all pieces to the same type. Integers and floats are promoted to
+	float64 (e.g. when a piece contains NaNs), other mixes (e.g. strings and numbers) raise _ColumnReparseError.
+	"""
+	import pyarrow #pylint: disable=import-outside-toplevel
+	names = tables[0].schema.names
+	for i, col in enumerate(names):
+		types = {table.schema.field(i).type for table in tables if table.column(i).null_count < len(table)}
+		if len(types) == 0: #Only missing values -> pandas parses this as a float column
+			target = pyarrow.float64()
+		elif len(types) == 1:
+			target = types.pop()
+		elif all(pyarrow.types.is_integer(cur_type) or pyarrow.types.is_floating(cur_type) for cur_type in types):
+			target = pyarrow.float64()
+		else:
+			raise _ColumnReparseError(col)
+		tables = [
+			table if table.schema.field(i).type == target else table.set_column(i, col, table.column(i).cast(target))
+				for table in tables
+		]
+	return tables
+
+
+def _read_pieces_parallel(
+			file_source : str,
+			layout : _CsvLayout,
+			ranges : typing.List[typing.Tuple[int, int]],
+			string_columns : typing.Set[str],
+			n_workers : int,
+			progress_callback : typing.Callable[[int, int], None],
+			index_col : str,
+			downcast : bool
+		) -> pd.DataFrame:
+	import pyarrow #pylint: disable=import-outside-toplevel
+	import pyarrow.ipc #pylint: disable=import-outside-toplevel
+
+	tmp_dir = tempfile.mkdtemp(prefix="mvts_analyzer_csv_")
+	try:
+		out_paths = [os.path.join(tmp_dir, f"{i}.arrow") for i in range(len(ranges))]
+		#NOTE: spawn instead of fork, forking a (multi-threaded) GUI-process is not safe
+		with concurrent.futures.ProcessPoolExecutor(
+				max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+			futures = {
+				executor.submit(_parse_csv_piece, file_source, start, stop, layout, string_columns, out_path) : i
+					for i, ((start, stop), out_path) in enumerate(zip(ranges, out_paths))
+			}
+			try:
+				bytes_parsed, rows_parsed = len(layout.header), 0
+				timezones : typing.Dict[str, typing.Any] = {}
+				pending = set(futures)
+				while len(pending) > 0:
+					done, pending = concurrent.futures.wait(
+						pending, timeout=0.1, return_when=concurrent.futures.FIRST_COMPLETED)
+					for future in done:
+						piece_rows, piece_timezones = future.result() #Re-raises errors of the worker
+						for col, timezone in piece_timezones.items(): #All pieces must have the same tz
+							if str(timezones.setdefault(col, timezone)) != str(timezone):
+								raise _ColumnReparseError(col)
+						rows_parsed += piece_rows
+						start, stop = ranges[futures[future]]
+						bytes_parsed += stop - start
+					progress_callback(bytes_parsed, rows_parsed) #Also allows cancelling while waiting
+			except BaseException:
+				for future in futures:
+					future.cancel() #Running pieces are finished (on exiting the executor), but their results ignored
+				raise
+
+		tables = []
+		for out_path in out_paths: #Read into memory (not memory-mapped), so the files can be removed right away
+			with pyarrow.OSFile(out_path, "rb") as source:
+				tables.append(pyarrow.ipc.open_file(source).read_all())
+			os.remove(out_path)
+	finally:
+		shutil.rmtree(tmp_dir, ignore_errors=True)
+
+	table = pyarrow.concat_tables(_unify_piece_types(tables))
+	del tables
+	data = {}
+	for col in table.schema.names:
+		series = table.column(col).to_pandas()
+		if series.dtype == object and series.hasnans: #Arrow uses None for missing values, pd.read_csv uses NaN
+			series = series.fillna(np.nan)
+		elif timezones.get(col, None) is not None:
+			series = series.dt.tz_localize("UTC").dt.tz_convert(timezones[col])
+		data[col] = series
+	return _build_dataframe(data, index_col, downcast)
+
+
+def read_csv_parallel(
+			file_source : str,
+			progress_callback : typing.Optional[typing.Callable[[int, int], None]] = None,
+			n_workers : typing.Optional[int] = None,
+			min_parallel_bytes : int = DEFAULT_MIN_PARALLEL_BYTES,
+			piece_bytes : int = DEFAULT_PIECE_BYTES,
+			index_col : str = "Index",
+			downcast : bool = True
+		) -> pd.DataFrame:
+	"""Read a csv-file by parsing pieces of the file in parallel (in a process pool). Small files, files with quoted
+	fields (which can contain newlines, so the file can't be split at arbitrary lines) or if pyarrow is not
+	installed, the file is read using read_csv_streaming.
+
+	Args:
+		file_source (str): The csv file
+		progress_callback (typing.Callable[[int, int], None] | None, optional): Called with (bytes_read, rows_parsed)
+			during reading, exceptions raised by the callback (e.g. to cancel) are propagated. Defaults to None.
+		n_workers (int | None, optional): The amount of processes to use. Defaults to None (the amount of cpus).
+		min_parallel_bytes (int, optional): Files smaller than this are read using the streaming reader.
+			Defaults to DEFAULT_MIN_PARALLEL_BYTES.
+		piece_bytes (int, optional): The (approximate) size of each piece. Defaults to DEFAULT_PIECE_BYTES.
+		index_col (str, optional): If this column exists, it is used as the index. Defaults to "Index".
+		downcast (bool, optional): Whether to downcast float columns to float32 where this is exact, and integer
+			columns to the smallest integer type that holds their values. Defaults to True.
+
+	Returns:
+		pd.DataFrame: The parsed dataframe
+	"""
+	if progress_callback is None:
+		progress_callback = lambda *_: None #pylint: disable=unnecessary-lambda-assignment
+	n_workers = n_workers if n_workers is not None else (os.cpu_count() or 1)
+	file_size = os.path.getsize(file_source)
+	if n_workers <= 1 or file_size < min_parallel_bytes:
+		return read_csv_streaming(file_source, progress_callback=progress_callback, index_col=index_col,
+			downcast=downcast)
+	try:
+		import pyarrow.ipc #pylint: disable=import-outside-toplevel, unused-import
+	except ImportError as err:
+		log.info(f"Could not import pyarrow, parsing csv-file using a single process ({err}). Install pyarrow to "
+			"enable parallel parsing of large csv-files.")
+		return read_csv_streaming(file_source, progress_callback=progress_callback, index_col=index_col,
+			downcast=downcast)
+
+	with open(file_source, "rb") as file:
+		layout = _inspect_csv(file)
+		if layout.has_quotes:
+			log.info(f"{file_source} contains quoted fields, parsing it using a single process")
+			return read_csv_streaming(file_source, progress_callback=progress_callback, index_col=index_col,
+				downcast=downcast)
+		n_pieces = max(n_workers, -(-file_size // piece_bytes))
+		ranges = _split_at_lines(file, len(layout.header), file_size, n_pieces)
+
+	log.info(f"Parsing {file_source} in {len(ranges)} pieces using {n_workers} processes")
+	string_columns : typing.Set[str] = set()
+	while True: #Re-parse if a column turns out to be inconsistent between pieces
+		try:
+			return _read_pieces_parallel(file_source, layout, ranges, string_columns, n_workers, progress_callback,
+				index_col, downcast)
+		except _ColumnReparseError as err:
+			log.info(f"Column {err.column} is inconsistent between pieces (e.g. not all values are datetimes or "
+				f"numbers), re-parsing the file with {err.column} as a string column")
+			layout.datetime_columns.pop(err.column, None)
+			string_columns.add(err.column)
@@ -2,11 +2,14 @@
 Contains several utility functions for working with dataframes
 """
 import logging
+import os
 import typing
 
 import numpy as np
 import pandas as pd
 
+from mvts_analyzer.utility import csv_reader, file_cache
+
 log = logging.getLogger(__name__)
 
 
@@ -30,7 +33,7 @@ def get_fft_columns(dataframe : typing.Optional[pd.DataFrame]) -> typing.Dict[st
 		idx =  cols[cur_col].first_valid_index()
 		if idx is not None:
 			var = cols[cur_col].loc[idx]
-			if isinstance(var, (list, type(np.array))):
+			if isinstance(var, (list, np.ndarray)):
 				fft_cols[cur_col] = len(var)
 	log.debug("Found FFT columns (non-none columns with list/np.array) {fft_cols}")
 	return fft_cols
@@ -62,12 +65,68 @@ def get_lbl_columns(dataframe: typing.Optional[pd.DataFrame]) -> typing.List[str
 	log.debug(f"Found label columns: {lbl_cols}")
 	return [str(i) for i in lbl_cols] #TODO: enable the use of int-columns?
 
+CATEGORICAL_MAX_UNIQUE_FRACTION = 0.5 #Only store string-columns as categoricals if at most this fraction is unique
+
+def to_categorical_labels(series : pd.Series) -> typing.Optional[pd.Series]:
+	"""Convert a label column of python strings (object/string dtype) to a pandas Categorical, so the labels are
+	stored as integer codes plus a dictionary of labels (the categories).
+
+	Args:
+		series (pd.Series): The column to convert
+
+	Returns:
+		typing.Optional[pd.Series]: The categorical column, or None if the column is not a (string) label column or
+			contains too many unique values to benefit from categorical storage
+	"""
+	if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)) \
+			or isinstance(series.dtype, pd.CategoricalDtype) \
+			or pd.api.types.infer_dtype(series, skipna=True) != "string":
+		return None
+	codes, uniques = pd.factorize(series) #Missing values -> -1
+	if len(uniques) == 0 or len(uniques) > CATEGORICAL_MAX_UNIQUE_FRACTION * len(series):
+		return None
+	return pd.Series(pd.Categorical.from_codes(codes, categories=uniques), index=series.index, name=series.name)
+
+def rename_categorical_labels(series : pd.Series, transform_dict : typing.Dict[typing.Any, typing.Any]) -> pd.Series:
+	"""Rename the labels of a categorical column by editing the categories, labels that are renamed to an already
+	existing label are merged, labels renamed to None (or NaN) are removed.
+
+	Args:
+		series (pd.Series): The categorical column
+		transform_dict (typing.Dict[typing.Any, typing.Any]): old label -> new label
+
+	Returns:
+		pd.Series: The renamed categorical column
+	"""
+	new_categories : typing.Dict[typing.Any, int] = {}
+	remap = np.empty(len(series.cat.categories) + 1, dtype=np.int32) #Last entry: missing (-1) stays missing
+	remap[-1] = -1
+	for code, category in enumerate(series.cat.categories):
+		new_category = transform_dict.get(category, category)
+		remap[code] = -1 if new_category is None or pd.isna(new_category) \
+			else new_categories.setdefault(new_category, len(new_categories))
+	codes = remap.take(series.cat.codes.to_numpy()) #Codes of -1 take the last entry
+	return pd.Series(pd.Categorical.from_codes(codes, categories=list(new_categories)),
+		index=series.index, name=series.name)
+
+def align_categories(first : pd.Series, second : pd.Series) -> typing.Tuple[pd.Series, pd.Series]:
+	"""Convert two columns to categoricals with the same categories, so they can be combined (e.g. using fillna)"""
+	first, second = first.astype("category"), second.astype("category")
+	categories = first.cat.categories.union(second.cat.categories, sort=False)
+	return first.cat.set_categories(categories), second.cat.set_categories(categories)
+
+LOAD_FILE_DIALOG_FILTER = "Dataframes (*.pkl *.parquet *.feather *.xlsx *.csv);; Pickled dataframe (*.pkl);; " \
+	"Parquet (*.parquet);; Feather (*.feather);; Excel sheet (*.xlsx);; Comma-Separated-Values (*.csv)"
+SAVE_FILE_DIALOG_FILTER = "Pickled dataframe (*.pkl);; Parquet (*.parquet);; Feather (*.feather);; " \
+	"Excel sheet (*.xlsx);; Comma-Separated-Values (*.csv)"
+PROJECTABLE_FILETYPES = ["parquet", "feather"] #Filetypes from which only a subset of the columns/rows can be read
+
 def save_dataframe(dataframe : pd.DataFrame, save_path : str, locs=None):
 	"""Save a dataframe to file, use the file extension to determine the filetype
 
 	Args:
 		dataframe (pd.DataFrame): The dataframe to save
-		save_path (str): The path to save to - including file extension (.xlsx, .pkl)
+		save_path (str): The path to save to - including file extension (.xlsx, .pkl, .csv, .parquet, .feather)
 	"""
 	if dataframe is None or dataframe.empty:
 		msg = "Error: could not save dataframe - dataframe is not set or empty"
@@ -92,6 +151,11 @@ def save_dataframe(dataframe : pd.DataFrame, save_path : str, locs=None):
 		fft_cols = get_fft_columns(dataframe)
 		dataframe.loc[locs, dataframe.columns.difference(list(fft_cols.keys()))].dropna( #type: ignore
 			how='all', axis=1).to_csv(save_path, index_label="Index") #type: ignore
+	elif file_type == "parquet":
+		dataframe.loc[locs].to_parquet(save_path) #Index is stored in the pandas-metadata
+	elif file_type == "feather":
+		#Feather does not store (non-default) indexes, so store it as a column
+		dataframe.loc[locs].rename_axis("Index").reset_index().to_feather(save_path)
 
 	else:
 		raise NotImplementedError
@@ -100,47 +164,154 @@ def save_dataframe(dataframe : pd.DataFrame, save_path : str, locs=None):
 	log.info(msg)
 	return True, msg
 
-def load_dataframe_using_file_extension(file_source : str):
+CACHED_FILETYPES = ["csv", "xlsx"] #Text-based/slow to parse filetypes, which are cached after parsing
+
+ProgressCallback = typing.Callable[[int, int], None] #(bytes_read, rows_parsed) -> None
+
+class LoadCancelledError(Exception):
+	"""Raised (by a progress callback) to cancel the loading of a dataframe"""
+
+
+def restrict_dataframe(
+			dataframe : pd.DataFrame,
+			columns : typing.Optional[typing.Iterable[str]] = None,
+			datetime_range : typing.Optional[typing.Tuple[typing.Any, typing.Any]] = None,
+			datetime_column : str = "DateTime"
+		) -> pd.DataFrame:
+	"""Restrict a dataframe to the passed columns (non-existing columns are ignored) and to the rows within the
+	datetime range
+
+	Args:
+		dataframe (pd.DataFrame): The dataframe
+		columns (typing.Iterable[str] | None, optional): The columns to keep. Defaults to None (all columns).
+		datetime_range (typing.Tuple[typing.Any, typing.Any] | None, optional): The (inclusive) range (left, right)
+			of datetime_column to keep, left/right can be None. Defaults to None (all rows).
+		datetime_column (str, optional): The datetime column. Defaults to "DateTime".
 	"""
-	Load a dataframe from file, using the file extension to determine the filetype
+	if columns is not None:
+		dataframe = dataframe[[col for col in dataframe.columns if col in set(columns)]]
+	if datetime_range is not None and datetime_column in dataframe.columns:
+		mask = np.ones(len(dataframe), dtype=bool)
+		if datetime_range[0] is not None:
+			mask &= (dataframe[datetime_column] >= datetime_range[0]).to_numpy()
+		if datetime_range[1] is not None:
+			mask &= (dataframe[datetime_column] <= datetime_range[1]).to_numpy()
+		dataframe = dataframe[mask]
+	return dataframe
+
+def _get_load_columns(
+			columns : typing.Optional[typing.Iterable[str]],
+			datetime_column : str
+		) -> typing.Optional[typing.List[str]]:
+	"""Get the columns to load (always includes the datetime column)"""
+	if columns is None:
+		return None
+	columns = [col for col in columns if col is not None and col != ""]
+	return list(dict.fromkeys([datetime_column, *columns])) #Unique, but keep order
+
+def load_dataframe_using_file_extension(
+			file_source : str,
+			cache : typing.Optional[file_cache.FileCache] = None,
+			use_cache : bool = True,
+			columns : typing.Optional[typing.Iterable[str]] = None,
+			datetime_range : typing.Optional[typing.Tuple[typing.Any, typing.Any]] = None,
+			datetime_column : str = "DateTime",
+			progress_callback : typing.Optional[ProgressCallback] = None
+		):
+	"""
+	Load a dataframe from file, using the file extension to determine the filetype. Slow-to-parse filetypes (csv/xlsx)
+	are stored in a binary file cache after parsing, so they load (almost) instantly next time.
+
+	Optionally, only a subset of the columns and rows (by datetime range) is returned. For parquet/feather, only
+	these columns are read from disk and for parquet, the datetime range is also pushed down to the row groups, so
+	row groups outside the range are never read. For other filetypes, the full file is read and restricted afterwards.
+
+	Args:
+		file_source (str): The file to load
+		cache (file_cache.FileCache | None, optional): The file cache to use. Defaults to None (the default cache).
+		use_cache (bool, optional): Whether to use the file cache. Defaults to True.
+		columns (typing.Iterable[str] | None, optional): The columns to load (the datetime column is always
+			loaded), non-existing columns are ignored. Defaults to None (all columns).
+		datetime_range (typing.Tuple[typing.Any, typing.Any] | None, optional): (left, right) inclusive range of the
+			datetime column to load, left/right can be None. Defaults to None (all rows).
+		datetime_column (str, optional): The name of the datetime column. Defaults to "DateTime".
+		progress_callback (ProgressCallback | None, optional): Called with (bytes_read, rows_parsed) while loading
+			(from the loading thread). Csv-files report the bytes read during parsing, other filetypes only report
+			at the start and end. Can raise LoadCancelledError to cancel the loading, which is re-raised.
+			Defaults to None.
 	"""
+	if progress_callback is None:
+		progress_callback = lambda *_: None #pylint: disable=unnecessary-lambda-assignment
 	try:
 		filetype = file_source.rsplit(".", 1)[-1]
-		if filetype == "pkl":
+		file_size = os.path.getsize(file_source)
+		progress_callback(0, 0)
+		load_columns = _get_load_columns(columns, datetime_column)
+		if use_cache and filetype in CACHED_FILETYPES:
+			cache = file_cache.get_default_cache() if cache is None else cache
+			new_df = cache.load(file_source)
+			if new_df is not None:
+				new_df = restrict_dataframe(new_df, load_columns, datetime_range, datetime_column)
+				progress_callback(file_size, len(new_df))
+				return True, f"Succesfully loaded dataframe form {file_source} (cached)", new_df
+		else:
+			cache = None
+
+		if filetype == "parquet":
+			new_df = _load_parquet(file_source, load_columns, datetime_range, datetime_column)
+		elif filetype == "feather":
+			new_df = pd.read_feather(file_source, columns=_get_existing_feather_columns(file_source, load_columns))
+			if "Index" in new_df.columns:
+				new_df = new_df.set_index("Index")
+		elif filetype == "pkl":
 			new_df = pd.read_pickle(file_source)
 		elif filetype == "xlsx":
 			new_df = pd.read_excel(file_source)
 			if "Index" in new_df.columns:
 				new_df = new_df.set_index("Index")
 		elif filetype == "csv":
-			# First check if ";" occurs more than "," in the first 1000 characters
-			with open(file_source, 'r', encoding='utf-8') as f:
-				content = f.read(1000)
-			if content.count(";") > content.count(","):
-				sep = ";"
-			else:
-				sep = ","
-
-			try: 
-				new_df = pd.read_csv(file_source, index_col="Index", sep=sep) #Try to read with index column
-			except ValueError: #If no index column is found, read without index
-				new_df = pd.read_csv(file_source, sep=sep)
-			
-			#Note that datetime columns are not automatically parsed, so we do that here
-			for col in new_df.columns:
-				#Check if first value is a datetime
-				if isinstance(new_df[col].iloc[0], str):
-					try:
-						pd.to_datetime(new_df[col].iloc[0]) #Attempt with first element -> if this fails, assume no dtcol
-						new_df[col] = pd.to_datetime(new_df[col])
-					except Exception: #pylint: disable=broad-exception-caught
-						pass
-
+			new_df = csv_reader.read_csv_parallel(file_source, progress_callback=progress_callback) #Streams small files
 		else:
 			raise NotImplementedError(f"Filetype {filetype} not implemented for loading dataframes...")
 
+		if cache is not None:
+			cache.store(file_source, new_df) #Always cache the full dataframe
+		new_df = restrict_dataframe(new_df, load_columns, datetime_range, datetime_column)
+		progress_callback(file_size, len(new_df))
 		return True, f"Succesfully loaded dataframe form {file_source}", new_df
+	except LoadCancelledError:
+		log.info(f"Cancelled loading of {file_source}")
+		raise
 	except Exception as ex: #pylint: disable=broad-exception-caught
 		msg = f"Could not append data from selected file ({file_source}): {ex}"
 		log.warning(msg)
 		return False, msg, None
+
+
+def _load_parquet(
+			file_source : str,
+			columns : typing.Optional[typing.List[str]],
+			datetime_range : typing.Optional[typing.Tuple[typing.Any, typing.Any]],
+			datetime_column : str
+		) -> pd.DataFrame:
+	"""Load a parquet file, only reading the passed columns and pushing the datetime range down to the row groups"""
+	import pyarrow.parquet #pylint: disable=import-outside-toplevel #Optional dependency, only needed for parquet
+	schema_names = pyarrow.parquet.read_schema(file_source).names
+	if columns is not None:
+		columns = [col for col in columns if col in schema_names] #Index columns are added by pandas-metadata
+	filters = None
+	if datetime_range is not None and datetime_column in schema_names:
+		filters = [(datetime_column, op, pd.Timestamp(val))
+			for op, val in zip((">=", "<="), datetime_range) if val is not None] or None
+	return pd.read_parquet(file_source, engine="pyarrow", columns=columns, filters=filters)
+
+def _get_existing_feather_columns(
+			file_source : str,
+			columns : typing.Optional[typing.List[str]]
+		) -> typing.Optional[typing.List[str]]:
+	"""Filter the columns to those that exist in the feather file (and always include the "Index" column)"""
+	if columns is None:
+		return None
+	import pyarrow.ipc #pylint: disable=import-outside-toplevel #Optional dependency, only needed for feather
+	names = pyarrow.ipc.open_file(pyarrow.memory_map(file_source, "r")).schema.names #Only reads the metadata
+	return [col for col in ["Index", *columns] if col in names]
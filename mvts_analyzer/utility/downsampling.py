@@ -0,0 +1,453 @@
+"""
+Implements level-of-detail (LOD) reduction methods for plotting long time-series.
+
+The main method is a min/max (M4-style) decimation: the x-range is divided into a number of buckets (usually one per
+horizontal pixel) and for each bucket only the first, last, minimum and maximum sample are kept. When drawn as a line,
+the result is visually indistinguishable from the full-resolution line, while the amount of drawn segments only
+depends on the canvas width instead of the amount of rows.
+
+For very long series, the SummaryPyramid precomputes these min/max summaries at multiple resolutions, so a zoomed-out
+view only has to touch a few thousand precomputed buckets instead of all rows.
+
+All methods return positions (indexes into the passed arrays) so the caller can always map the drawn points back to
+the full-resolution data (e.g. the pandas locs).
+
+Image-like data (e.g. spectrograms) is reduced by averaging blocks of values (see bin_mean) instead.
+"""
+import logging
+import typing
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+
+def is_monotonic(x_vals : np.ndarray) -> typing.Tuple[bool, bool]:
+	"""Check whether the passed array is monotonic
+
+	Args:
+		x_vals (np.ndarray): 1D array of (numeric) values
+
+	Returns:
+		typing.Tuple[bool, bool]: (is_monotonic, is_descending), an array with length <= 1 is seen as ascending
+	"""
+	if len(x_vals) <= 1:
+		return True, False
+	diffs = np.diff(x_vals)
+	if np.all(diffs >= 0):
+		return True, False
+	if np.all(diffs <= 0):
+		return True, True
+	return False, False
+
+
+def m4_downsample_positions(
+			x_vals : np.ndarray,
+			y_vals : np.ndarray,
+			n_buckets : int,
+			x_range : typing.Optional[typing.Tuple[float, float]] = None
+		) -> np.ndarray:
+	"""Min/max (M4) decimation of a series. The x-range is split into n_buckets equally sized buckets, of each
+	bucket the positions of the first, last, minimum and maximum value are kept.
+
+	Args:
+		x_vals (np.ndarray): The x-values, should be monotonic (ascending or descending) and numeric
+		y_vals (np.ndarray): The y-values, should not contain NaN-values
+		n_buckets (int): The amount of buckets, usually the amount of horizontal pixels
+		x_range (typing.Tuple[float, float] | None, optional): The x-range over which the buckets are spread (e.g. the
+			plot domain). Values outside of this range are added to the first/last bucket. Defaults to None (use the
+			range of x_vals).
+
+	Returns:
+		np.ndarray: Sorted positions (in x_vals/y_vals) of the values that should be plotted
+	"""
+	n_vals = len(x_vals)
+	if n_buckets <= 0 or n_vals <= 4 * n_buckets: #No reduction possible/necessary
+		return np.arange(n_vals)
+
+	if x_vals[0] > x_vals[-1]: #Descending -> reduce reversed view and flip positions back
+		positions = m4_downsample_positions(x_vals[::-1], y_vals[::-1], n_buckets, x_range)
+		return (n_vals - 1 - positions)[::-1]
+
+	left, right = (x_vals[0], x_vals[-1]) if x_range is None else x_range
+	if left is None or right is None or not right > left: #e.g. all x-values the same
+		left, right = x_vals[0], x_vals[-1]
+	if not right > left:
+		return np.unique(np.array([0, np.argmin(y_vals), np.argmax(y_vals), n_vals - 1]))
+
+	edges = np.linspace(left, right, n_buckets + 1)[:-1]
+	starts = np.searchsorted(x_vals, edges, side="left")
+	starts[0] = 0 #Values left of the range are added to the first bucket
+	starts = starts[starts < np.append(starts[1:], n_vals)] #Only keep non-empty buckets
+	counts = np.diff(np.append(starts, n_vals))
+
+	all_positions = np.arange(n_vals)
+	mins = np.minimum.reduceat(y_vals, starts)
+	argmins = np.minimum.reduceat(np.where(y_vals == np.repeat(mins, counts), all_positions, n_vals), starts)
+	maxes = np.maximum.reduceat(y_vals, starts)
+	argmaxes = np.minimum.reduceat(np.where(y_vals == np.repeat(maxes, counts), all_positions, n_vals), starts)
+
+	return np.unique(np.concatenate((starts, starts + counts - 1, argmins, argmaxes)))
+
+
+def segment_contains_flag(flags : np.ndarray, positions : np.ndarray) -> np.ndarray:
+	"""Given per-segment flags of the full-resolution line (flags[i] is the flag of the segment between point i and
+	point i+1), calculate for each segment of the reduced line (between positions[j] and positions[j+1]) whether
+	at least 1 of the full-resolution segments it replaces was flagged.
+
+	Args:
+		flags (np.ndarray): Boolean array of length n-1 for a line with n points
+		positions (np.ndarray): Sorted positions of the kept points (e.g. result of m4_downsample_positions)
+
+	Returns:
+		np.ndarray: Boolean array of length len(positions)-1
+	"""
+	flag_count = np.concatenate(([0], np.cumsum(flags, dtype=np.int64)))
+	return (flag_count[positions[1:]] - flag_count[positions[:-1]]) > 0
+
+
+class _PyramidLevel(typing.NamedTuple):
+	"""The summaries of a single column at a single level of a SummaryPyramid. Bucket i covers the sorted rows
+	[i*bucket_size, (i+1)*bucket_size). Positions are -1 for buckets without (non-NaN) values."""
+	bucket_size : int
+	mins : np.ndarray
+	maxes : np.ndarray
+	sums : np.ndarray
+	counts : np.ndarray
+	argmins : np.ndarray
+	argmaxes : np.ndarray
+	firsts : np.ndarray
+	lasts : np.ndarray
+
+
+class SummaryPyramid():
+	"""
+	Multi-resolution index of per-bucket min/max/mean/count summaries of numeric columns, keyed on a sorted time
+	column. Level 0 summarizes buckets of base_bucket_size (sorted) rows, every next level groups level_factor buckets
+	of the level below it. Next to the summaries, the positions (in sorted order) of the first, last, minimum and
+	maximum value of each bucket are stored, so the summaries can be used for min/max decimation while still
+	pointing to actual rows.
+
+	A domain (time range) is translated to a row range using a binary search on the sorted times, after which the
+	level with approximately the desired amount of buckets can be sliced directly.
+	"""
+	def __init__(self,
+				sorted_times : np.ndarray,
+				value_getter : typing.Callable[[str, int, int], np.ndarray],
+				base_bucket_size : int = 64,
+				level_factor : int = 4
+			):
+		"""
+		Args:
+			sorted_times (np.ndarray): The sorted (ascending) times as int64 (e.g. nanoseconds since epoch)
+			value_getter (typing.Callable[[str, int, int], np.ndarray]): Function of the form (column, start, stop)
+				which returns the float values of rows [start, stop) of the column (in sorted order), used for the
+				partially covered buckets at the edges of a query.
+			base_bucket_size (int, optional): Amount of rows per bucket at level 0. Defaults to 64.
+			level_factor (int, optional): Amount of buckets that are grouped in each next level. Defaults to 4.
+		"""
+		self._times = sorted_times
+		self._value_getter = value_getter
+		self._base_bucket_size = base_bucket_size
+		self._level_factor = level_factor
+		self._levels : typing.Dict[str, typing.List[_PyramidLevel]] = {}
+		self._pos_dtype = np.int32 if len(sorted_times) < np.iinfo(np.int32).max else np.int64
+
+	def __len__(self):
+		return len(self._times)
+
+	@property
+	def columns(self) -> typing.List[str]:
+		"""The columns for which summaries are available"""
+		return list(self._levels.keys())
+
+	def has_column(self, column : str) -> bool:
+		"""Whether summaries are available for the passed column"""
+		return column in self._levels
+
+	def remove_column(self, column : str):
+		"""Remove the summaries of a column (if they exist)"""
+		self._levels.pop(column, None)
+
+	def add_column(self, column : str, sorted_values : np.ndarray):
+		"""(Re)build the summaries of a column
+
+		Args:
+			column (str): The name of the column
+			sorted_values (np.ndarray): The float values of this column, sorted by time (same order as sorted_times),
+				NaN values are ignored in all summaries
+		"""
+		assert len(sorted_values) == len(self._times), "Values should be aligned with the sorted times"
+		levels = [self._build_base_level(sorted_values)]
+		while len(levels[-1].mins) > 1:
+			levels.append(self._build_next_level(levels[-1]))
+		self._levels[column] = levels
+
+	def _build_base_level(self, values : np.ndarray) -> _PyramidLevel:
+		size = self._base_bucket_size
+		n_buckets = -(-len(values) // size)
+		padded = np.full(n_buckets * size, np.nan)
+		padded[:len(values)] = values
+		padded = padded.reshape(n_buckets, size)
+		valid = ~np.isnan(padded)
+		counts = valid.sum(axis=1)
+		has_vals = counts > 0
+		offsets = np.arange(n_buckets, dtype=np.int64) * size
+
+		mins = np.where(valid, padded, np.inf).min(axis=1)
+		maxes = np.where(valid, padded, -np.inf).max(axis=1)
+		argmins = np.where(has_vals, offsets + np.where(valid, padded, np.inf).argmin(axis=1), -1)
+		argmaxes = np.where(has_vals, offsets + np.where(valid, padded, -np.inf).argmax(axis=1), -1)
+		firsts = np.where(has_vals, offsets + valid.argmax(axis=1), -1)
+		lasts = np.where(has_vals, offsets + size - 1 - valid[:, ::-1].argmax(axis=1), -1)
+		return _PyramidLevel(
+			size, mins, maxes, np.where(valid, padded, 0.0).sum(axis=1), counts.astype(np.int64),
+			argmins.astype(self._pos_dtype), argmaxes.astype(self._pos_dtype),
+			firsts.astype(self._pos_dtype), lasts.astype(self._pos_dtype)
+		)
+
+	def _build_next_level(self, lower : _PyramidLevel) -> _PyramidLevel:
+		factor = self._level_factor
+		n_buckets = -(-len(lower.mins) // factor)
+		pad = n_buckets * factor - len(lower.mins)
+
+		def grouped(arr, fill):
+			return np.append(arr, np.full(pad, fill, dtype=arr.dtype)).reshape(n_buckets, factor)
+
+		rows = np.arange(n_buckets)
+		mins, maxes = grouped(lower.mins, np.inf), grouped(lower.maxes, -np.inf)
+		min_child, max_child = mins.argmin(axis=1), maxes.argmax(axis=1)
+		firsts, lasts = grouped(lower.firsts, -1), grouped(lower.lasts, -1)
+		valid = firsts >= 0
+		first_child = valid.argmax(axis=1)
+		last_child = factor - 1 - valid[:, ::-1].argmax(axis=1)
+		return _PyramidLevel(
+			lower.bucket_size * factor,
+			mins[rows, min_child],
+			maxes[rows, max_child],
+			grouped(lower.sums, 0.0).sum(axis=1),
+			grouped(lower.counts, 0).sum(axis=1),
+			grouped(lower.argmins, -1)[rows, min_child], #Empty buckets have min=inf -> argmin stays -1
+			grouped(lower.argmaxes, -1)[rows, max_child],
+			firsts[rows, first_child],
+			lasts[rows, last_child],
+		)
+
+	def get_row_range(self, left : typing.Any = None, right : typing.Any = None) -> typing.Tuple[int, int]:
+		"""Get the (sorted) row range [start, stop) of all rows with left <= time <= right using a binary search.
+
+		Args:
+			left (typing.Any, optional): The left bound, anything convertible to a pd.Timestamp (or an int64 of the
+				same unit as the sorted times). Defaults to None (no bound).
+			right (typing.Any, optional): The right bound. Defaults to None (no bound).
+		"""
+		start = 0 if left is None else int(np.searchsorted(self._times, to_int64_time(left), side="left"))
+		stop = len(self._times) if right is None else int(np.searchsorted(self._times, to_int64_time(right), side="right"))
+		return start, max(start, stop)
+
+	def select_level(self, n_rows : int, n_buckets : int) -> typing.Optional[int]:
+		"""Select the coarsest level that still contains at least n_buckets buckets for a range of n_rows rows, returns
+		None if even the finest level is too coarse (in which case the raw data should be used)."""
+		level, bucket_size = None, self._base_bucket_size
+		while n_rows // bucket_size >= n_buckets:
+			level = 0 if level is None else level + 1
+			bucket_size *= self._level_factor
+		return level
+
+	def get_summary(self,
+				column : str,
+				start : int,
+				stop : int,
+				n_buckets : int
+			) -> typing.Optional[typing.Dict[str, np.ndarray]]:
+		"""Get the per-bucket min/max/mean/count summaries (views where possible) of the buckets that are fully covered
+		by the (sorted) row range [start, stop) at the level with approximately n_buckets buckets.
+
+		Returns:
+			typing.Optional[typing.Dict[str, np.ndarray]]: dictionary with the keys "start_rows" (first row of each
+				bucket), "min", "max", "mean" and "count", or None if no level is coarse enough or the column is unknown
+		"""
+		level = self.select_level(stop - start, n_buckets)
+		if level is None or column not in self._levels:
+			return None
+		summaries = self._levels[column][level]
+		size = summaries.bucket_size
+		first, last = -(-start // size), stop // size
+		counts = summaries.counts[first:last]
+		with np.errstate(invalid="ignore", divide="ignore"):
+			means = summaries.sums[first:last] / counts
+		return {
+			"start_rows" : np.arange(first, last) * size,
+			"min" : summaries.mins[first:last],
+			"max" : summaries.maxes[first:last],
+			"mean" : means,
+			"count" : counts,
+		}
+
+	def query_positions(self, column : str, start : int, stop : int, n_buckets : int) -> np.ndarray:
+		"""Get the (sorted-order) positions of the rows that should be drawn for a min/max-decimated line of the rows
+		[start, stop) using approximately n_buckets buckets. NaN-values are never returned.
+
+		Args:
+			column (str): The column, should have been added using add_column
+			start (int): First (sorted) row of the range
+			stop (int): Last (sorted) row of the range (exclusive)
+			n_buckets (int): Desired amount of buckets (e.g. amount of horizontal pixels)
+
+		Returns:
+			np.ndarray: Sorted positions in [start, stop)
+		"""
+		level = self.select_level(stop - start, n_buckets)
+		if level is None:
+			return self._raw_positions(column, start, stop, n_buckets)
+		summaries = self._levels[column][level]
+		size = summaries.bucket_size
+		first, last = -(-start // size), stop // size
+		if first >= last:
+			return self._raw_positions(column, start, stop, n_buckets)
+
+		inner = np.concatenate((
+			summaries.firsts[first:last], summaries.lasts[first:last],
+			summaries.argmins[first:last], summaries.argmaxes[first:last]
+		))
+		return np.unique(np.concatenate((
+			self._raw_positions(column, start, first * size, 1), #Partially covered bucket at the start
+			inner[inner >= 0],
+			self._raw_positions(column, last * size, stop, 1), #And at the end
+		)).astype(np.int64))
+
+	def _raw_positions(self, column : str, start : int, stop : int, n_buckets : int) -> np.ndarray:
+		"""Min/max decimation of the raw values of rows [start, stop)"""
+		if stop <= start:
+			return np.zeros(0, dtype=np.int64)
+		values = self._value_getter(column, start, stop)
+		valid = np.flatnonzero(~np.isnan(values))
+		positions = m4_downsample_positions(self._times[start:stop][valid], values[valid], n_buckets)
+		return start + valid[positions]
+
+
+def to_int64_time(value : typing.Any) -> int:
+	"""Convert a time (datetime, np.datetime64, pd.Timestamp, str or int) to int64 nanoseconds"""
+	if isinstance(value, (int, np.integer)):
+		return int(value)
+	timestamp = pd.Timestamp(value)
+	if timestamp.tzinfo is not None: #Times are stored as (naive) UTC nanoseconds
+		timestamp = timestamp.tz_convert(None)
+	return int(timestamp.value)
+
+
+def get_grid_positions(
+			x_vals : np.ndarray,
+			tolerance : float = 0.05
+		) -> typing.Optional[typing.Tuple[float, np.ndarray]]:
+	"""Check whether ascending values lie on a regular grid (e.g. regularly sampled times, possibly with gaps) and get
+	the position of each value on this grid.
+
+	Args:
+		x_vals (np.ndarray): 1D array of numeric values
+		tolerance (float, optional): The maximum deviation of any value from its grid point, relative to the step.
+			Defaults to 0.05.
+
+	Returns:
+		typing.Optional[typing.Tuple[float, np.ndarray]]: The step (the median difference) and the (strictly increasing)
+			grid position of each value (x_vals[0] is at position 0), or None if the values do not lie on a grid
+	"""
+	if len(x_vals) < 2:
+		return None
+	step = float(np.median(np.diff(x_vals)))
+	if not step > 0:
+		return None
+	offsets = (x_vals - x_vals[0]) / step
+	positions = np.rint(offsets).astype(np.int64)
+	if float(np.abs(offsets - positions).max()) > tolerance or not np.all(positions[1:] > positions[:-1]):
+		return None
+	return step, positions
+
+
+BIN_CHUNK_ROWS = 1024 #bin_mean processes (about) this amount of input-rows at a time
+
+
+def _mean_column_blocks(values : np.ndarray, col_factor : int, out : np.ndarray):
+	"""Average blocks of col_factor consecutive columns of a 2D array into out"""
+	if col_factor <= 1:
+		out[...] = values
+		return
+	n_full = values.shape[1] // col_factor
+	np.mean(values[:, :n_full * col_factor].reshape(len(values), n_full, col_factor), axis=2, out=out[:, :n_full])
+	if n_full * col_factor < values.shape[1]:
+		np.mean(values[:, n_full * col_factor:], axis=1, out=out[:, n_full])
+
+
+def bin_mean(
+			values : np.ndarray,
+			row_factor : int = 1,
+			col_factor : int = 1,
+			rows : typing.Optional[np.ndarray] = None,
+			out : typing.Optional[np.ndarray] = None,
+			dtype : typing.Any = np.float32
+		) -> np.ndarray:
+	"""Average (row_factor x col_factor) blocks of a 2D array (e.g. time x frequency bins of a spectrogram), the last
+	block along each axis may be smaller.
+
+	The rows are processed in chunks, the blocks are averaged using reshaped views (no copies) and written directly
+	into the output, so apart from the output only small (chunk-sized) scratch buffers are allocated, also when values
+	is e.g. a (memory-mapped) matrix or a column-slice of one.
+
+	Args:
+		values (np.ndarray): The 2D values, the last axis should be contiguous for the reshapes to be views
+		row_factor (int, optional): Amount of rows per block. Defaults to 1.
+		col_factor (int, optional): Amount of columns per block. Defaults to 1.
+		rows (np.ndarray | None, optional): If passed, the rows of values to use (in this order), they are gathered
+			one chunk at a time. Defaults to None (all rows).
+		out (np.ndarray | None, optional): Buffer of shape (ceil(n_rows / row_factor), ceil(n_cols / col_factor)) to
+			write the result to. Defaults to None (a new buffer of dtype is allocated).
+		dtype (typing.Any, optional): The dtype of the newly allocated output. Defaults to np.float32.
+
+	Returns:
+		np.ndarray: The averaged values (out, if passed)
+	"""
+	row_factor, col_factor = max(1, int(row_factor)), max(1, int(col_factor))
+	n_rows = len(rows) if rows is not None else values.shape[0]
+	n_cols = values.shape[1]
+	out_shape = (-(-n_rows // row_factor), -(-n_cols // col_factor))
+	if out is None:
+		out = np.empty(out_shape, dtype=dtype)
+	elif out.shape != out_shape:
+		raise ValueError(f"Output buffer has shape {out.shape}, expected {out_shape}")
+
+	chunk_rows = max(1, BIN_CHUNK_ROWS // row_factor) * row_factor #Whole blocks per chunk
+	scratch = np.empty((chunk_rows // row_factor, n_cols), dtype=out.dtype) if row_factor > 1 else None
+	for start in range(0, n_rows, chunk_rows):
+		stop = min(start + chunk_rows, n_rows)
+		chunk = values[start:stop] if rows is None else values[rows[start:stop]]
+		chunk_out = out[start // row_factor : -(-stop // row_factor)]
+		if scratch is not None: #First average the rows, then the columns of the (smaller) result
+			n_full = (stop - start) // row_factor
+			np.mean(chunk[:n_full * row_factor].reshape(n_full, row_factor, n_cols), axis=1, out=scratch[:n_full])
+			if n_full * row_factor < stop - start:
+				np.mean(chunk[n_full * row_factor:], axis=0, out=scratch[n_full])
+			chunk = scratch[:len(chunk_out)]
+		_mean_column_blocks(chunk, col_factor, chunk_out)
+	return out
+
+
+def grouped_mean(values : np.ndarray, starts : np.ndarray) -> np.ndarray:
+	"""Average consecutive groups of values along the first axis, group i contains values[starts[i]:starts[i + 1]] (the
+	last group runs to the end). Groups should not be empty. If all groups (except the last) are equally sized, this is
+	done using bin_mean, which is much faster than np.add.reduceat.
+
+	Args:
+		values (np.ndarray): The 2D values (e.g. a spectrogram)
+		starts (np.ndarray): The (strictly increasing) start of each group, starts[0] should be 0
+
+	Returns:
+		np.ndarray: The averaged (float32) values, of length len(starts) along the first axis
+	"""
+	sizes = np.diff(np.append(starts, len(values)))
+	if len(sizes) > 0 and np.all(sizes[:-1] == sizes[0]) and sizes[-1] <= sizes[0]:
+		return bin_mean(values, int(sizes[0]), 1)
+	averaged = np.empty((len(starts), *values.shape[1:]), dtype=np.float32)
+	for i, (start, size) in enumerate(zip(starts, sizes)): #One (vectorized) mean per group
+		np.mean(values[start:start + size], axis=0, out=averaged[i])
+	return averaged
@@ -0,0 +1,144 @@
+"""
+Implements contiguous storage for fft-columns (columns that contain one list/array of fft-lines per row).
+
+Storing one python list (of python floats) per row uses a lot of memory and rebuilding a 2-D matrix from it (e.g.
+np.array(column.tolist())) on every replot is slow. Instead, all rows of an fft-column are stored in a single
+contiguous (optionally memory-mapped) 2-D matrix, the dataframe-column then holds lightweight row-views of this matrix,
+so the dataframe can still be used as before (saving, appending, apply_python_code etc.), while the plotter can slice
+the matrix directly. The values are stored losslessly: as float32 if all values can be represented exactly, else as
+float64.
+"""
+import logging
+import os
+import tempfile
+import typing
+import weakref
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MEMMAP_DIR = os.environ.get("MVTS_ANALYZER_FFT_MEMMAP_DIR", None) #If set, matrices are memory-mapped from disk
+CONVERSION_CHUNK_ROWS = 4096 #Rows are converted in chunks, so no full-size (float64) intermediates are created
+
+
+def _is_fft_cell(value : typing.Any) -> bool:
+	return isinstance(value, (list, np.ndarray))
+
+
+class FftMatrix():
+	"""
+	Contiguous 2-D storage (rows x lines) of the rows of an fft-column. The cells of the column are replaced by
+	row-views of the matrix (see align), the matrix-row of each cell is then found using the memory-address of the view.
+	Changing a view in place (e.g. cell[0] = 1.0) changes the matrix as well.
+	"""
+	def __init__(self, memmap_dir : typing.Optional[str] = DEFAULT_MEMMAP_DIR):
+		"""
+		Args:
+			memmap_dir (str | None, optional): If passed, the matrix is stored in a (temporary) memory-mapped file in
+				this directory instead of in memory. Defaults to DEFAULT_MEMMAP_DIR ($MVTS_ANALYZER_FFT_MEMMAP_DIR).
+		"""
+		self.memmap_dir = memmap_dir
+		self._matrix : typing.Optional[np.ndarray] = None
+
+	@property
+	def matrix(self) -> typing.Optional[np.ndarray]:
+		"""The (rows x lines) float32/float64 matrix"""
+		return self._matrix
+
+	@property
+	def n_lines(self) -> int:
+		"""The amount of lines (columns of the matrix)"""
+		return 0 if self._matrix is None else self._matrix.shape[1]
+
+	def get_rows(self, cells : np.ndarray) -> typing.Optional[np.ndarray]:
+		"""Get the matrix row of each cell (-1 for missing cells), or None if not all (non-missing) cells are row-views
+		of the matrix (e.g. rows were appended or replaced)
+
+		Args:
+			cells (np.ndarray): The (object) values of the column
+		"""
+		matrix = self._matrix
+		rows = np.full(len(cells), -1, dtype=np.int64)
+		if matrix is None:
+			return None if any(_is_fft_cell(cell) for cell in cells) else rows
+		start, row_bytes = matrix.__array_interface__["data"][0], matrix.strides[0]
+		for pos, cell in enumerate(cells):
+			if isinstance(cell, np.ndarray) and cell.base is matrix and cell.shape == matrix.shape[1:] \
+					and cell.strides == matrix.strides[1:]:
+				row, remainder = divmod(cell.__array_interface__["data"][0] - start, row_bytes)
+				if remainder == 0:
+					rows[pos] = row
+					continue
+			if _is_fft_cell(cell): #E.g. a new list or a slice of a view
+				return None
+		return rows
+
+	def align(self, cells : np.ndarray) -> typing.Tuple[np.ndarray, typing.Optional[np.ndarray]]:
+		"""Make sure all (non-missing) cells are rows of the matrix, if this is not the case, the matrix is rebuilt
+		from the cells.
+
+		Args:
+			cells (np.ndarray): The (object) values of the column
+
+		Raises:
+			ValueError: If the cells can not be stored in a matrix (e.g. they differ in length)
+
+		Returns:
+			typing.Tuple[np.ndarray, typing.Optional[np.ndarray]]: The matrix row of each cell (-1 for missing cells)
+				and, if the matrix was rebuilt, the new (object) values of the column (row-views of the matrix) that
+				should replace the old values. Else None.
+		"""
+		rows = self.get_rows(cells)
+		if rows is not None:
+			return rows, None
+		return self._rebuild(cells)
+
+	def _rebuild(self, cells : np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+		positions = np.flatnonzero([_is_fft_cell(cell) for cell in cells])
+		lengths = {len(cells[pos]) for pos in positions}
+		if len(lengths) > 1:
+			raise ValueError(f"Fft-rows differ in length ({sorted(lengths)[:5]}...), can not store them as a matrix")
+		n_lines = lengths.pop() if len(lengths) > 0 else 0
+
+		matrix = self._allocate(len(positions), n_lines, np.float32)
+		for start in range(0, len(positions), CONVERSION_CHUNK_ROWS):
+			chunk = positions[start:start + CONVERSION_CHUNK_ROWS]
+			values = np.array([cells[pos] for pos in chunk], dtype=np.float64)
+			if matrix.dtype == np.float32 and not np.array_equal(values.astype(np.float32), values, equal_nan=True):
+				log.debug("Fft-values can not be stored as float32 without losing precision, using float64")
+				wide_matrix = self._allocate(len(positions), n_lines, np.float64)
+				wide_matrix[:start] = matrix[:start] #float32 -> float64 is exact
+				matrix = wide_matrix
+			matrix[start:start + len(chunk)] = values
+
+		rows = np.full(len(cells), -1, dtype=np.int64)
+		rows[positions] = np.arange(len(positions))
+		new_cells = cells.copy()
+		for pos, view in zip(positions, matrix): #NOTE: assigning the list at once would broadcast it as a 2D-array
+			new_cells[pos] = view
+
+		self._matrix = matrix
+		log.debug(f"Rebuilt {matrix.dtype} fft-matrix of shape {matrix.shape} ({matrix.nbytes / 1024**2:.1f}MB)")
+		return rows, new_cells
+
+	def _allocate(self, n_rows : int, n_lines : int, dtype : typing.Type[np.floating]) -> np.ndarray:
+		if self.memmap_dir is None or n_rows * n_lines == 0:
+			return np.empty((n_rows, n_lines), dtype=dtype)
+		os.makedirs(self.memmap_dir, exist_ok=True)
+		with tempfile.NamedTemporaryFile(dir=self.memmap_dir, prefix="fft_", suffix=f".{np.dtype(dtype).name}",
+				delete=False) as file:
+			path = file.name
+		matrix = np.memmap(path, dtype=dtype, mode="w+", shape=(n_rows, n_lines))
+		try:
+			os.remove(path) #The mapping stays valid on posix
+		except OSError: #On Windows, a mapped file can not be removed -> remove it once the matrix is released
+			weakref.finalize(matrix, _try_remove, path)
+		return matrix
+
+
+def _try_remove(path : str):
+	try:
+		os.remove(path)
+	except OSError:
+		log.debug(f"Could not remove memory-mapped fft-file {path}")
@@ -0,0 +1,197 @@
+"""
+Implements a transparent on-disk cache for parsed data files (e.g. csv/xlsx).
+
+Parsing large text-based files (including the datetime-detection) can take minutes, while the resulting dataframe can
+be stored in a columnar binary format (Arrow IPC/Feather) that can be memory-mapped and contains all parsed dtypes.
+Cache entries are keyed on the (absolute) path, size and modification time of the source file, so a changed source
+file is never loaded from the cache. The total size of the cache is bounded, least recently used entries are evicted
+first.
+
+The cache requires the optional dependency pyarrow, if it is not installed, the cache is simply disabled.
+"""
+import hashlib
+import logging
+import os
+import time
+import typing
+
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+CACHE_VERSION = 2 #Increase when the stored format changes, so old entries are not used anymore
+CACHE_EXTENSION = ".arrow"
+DEFAULT_CACHE_DIR = os.environ.get(
+	"MVTS_ANALYZER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "mvts_analyzer", "file_cache"))
+DEFAULT_MAX_SIZE_BYTES = 8 * 1024**3 #8GB
+DEFAULT_MIN_SOURCE_SIZE_BYTES = 1024**2 #Don't cache files smaller than 1MB, parsing these is fast anyway
+
+
+def _import_pyarrow():
+	"""Returns the pyarrow module (with ipc/feather) or None if it is not installed"""
+	try:
+		import pyarrow #pylint: disable=import-outside-toplevel
+		import pyarrow.feather #pylint: disable=import-outside-toplevel, unused-import
+		import pyarrow.ipc #pylint: disable=import-outside-toplevel, unused-import
+		return pyarrow
+	except ImportError as err:
+		log.info(f"Could not import pyarrow, file cache is disabled ({err}). Install pyarrow to enable caching of "
+			"parsed data files.")
+		return None
+
+
+class FileCache():
+	"""
+	On-disk cache of parsed dataframes, stored as (uncompressed, memory-mappable) Arrow IPC files.
+	"""
+	def __init__(self,
+				cache_dir : str = DEFAULT_CACHE_DIR,
+				max_size_bytes : int = DEFAULT_MAX_SIZE_BYTES,
+				min_source_size_bytes : int = DEFAULT_MIN_SOURCE_SIZE_BYTES
+			):
+		"""
+		Args:
+			cache_dir (str, optional): The directory in which the cache entries are stored.
+				Defaults to DEFAULT_CACHE_DIR (~/.cache/mvts_analyzer/file_cache or $MVTS_ANALYZER_CACHE_DIR).
+			max_size_bytes (int, optional): The maximum total size of all cache entries, when exceeded, the least
+				recently used entries are removed. Defaults to DEFAULT_MAX_SIZE_BYTES.
+			min_source_size_bytes (int, optional): Source files smaller than this are not cached.
+				Defaults to DEFAULT_MIN_SOURCE_SIZE_BYTES.
+		"""
+		self.cache_dir = cache_dir
+		self.max_size_bytes = max_size_bytes
+		self.min_source_size_bytes = min_source_size_bytes
+		self._pyarrow = None
+		self._pyarrow_checked = False
+
+	@property
+	def enabled(self) -> bool:
+		"""Whether the cache can be used (pyarrow is installed)"""
+		if not self._pyarrow_checked:
+			self._pyarrow = _import_pyarrow()
+			self._pyarrow_checked = True
+		return self._pyarrow is not None
+
+	def get_cache_path(self, file_source : str) -> typing.Optional[str]:
+		"""Get the path of the cache entry of a source file (which might not exist yet), or None if the file should not
+		be cached (e.g. it does not exist or is too small)
+
+		Args:
+			file_source (str): The path to the source file
+		"""
+		try:
+			stat = os.stat(file_source)
+		except OSError:
+			return None
+		if stat.st_size < self.min_source_size_bytes:
+			return None
+		key = f"{CACHE_VERSION}|{os.path.abspath(file_source)}|{stat.st_size}|{stat.st_mtime_ns}"
+		return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + CACHE_EXTENSION)
+
+	def load(self, file_source : str) -> typing.Optional[pd.DataFrame]:
+		"""Load the cached dataframe of a source file (memory-mapped where possible)
+
+		Args:
+			file_source (str): The path to the source file
+
+		Returns:
+			typing.Optional[pd.DataFrame]: The cached dataframe or None if there is no (valid) cache entry
+		"""
+		cache_path = self.get_cache_path(file_source)
+		if cache_path is None or not os.path.exists(cache_path) or not self.enabled:
+			return None
+		before = time.perf_counter()
+		try:
+			pyarrow = self._pyarrow
+			source = pyarrow.memory_map(cache_path, "r") #type: ignore #NOTE: kept alive by the buffers of the table
+			table = pyarrow.ipc.open_file(source).read_all() #type: ignore #Zero-copy: buffers point into the map
+			new_df = table.to_pandas(split_blocks=True) #Avoid consolidating (copying) columns into blocks
+			os.utime(cache_path) #Mark as recently used
+		except Exception as err: #pylint: disable=broad-exception-caught
+			log.warning(f"Could not load cache entry {cache_path} of {file_source}, removing it: {err}")
+			self._remove(cache_path)
+			return None
+		log.info(f"Loaded {file_source} from cache ({cache_path}) in {time.perf_counter() - before:.3f}s")
+		return new_df
+
+	def store(self, file_source : str, dataframe : pd.DataFrame) -> bool:
+		"""Store the parsed dataframe of a source file in the cache, after which the cache is trimmed to its maximum
+		size.
+
+		Args:
+			file_source (str): The path to the source file
+			dataframe (pd.DataFrame): The parsed dataframe
+
+		Returns:
+			bool: Whether the dataframe was cached
+		"""
+		cache_path = self.get_cache_path(file_source)
+		if cache_path is None or not self.enabled:
+			return False
+		before = time.perf_counter()
+		tmp_path = cache_path + ".tmp"
+		try:
+			os.makedirs(self.cache_dir, exist_ok=True)
+			self._pyarrow.feather.write_feather( #type: ignore
+				dataframe, tmp_path, compression="uncompressed") #Uncompressed, so the file can be memory-mapped
+			os.replace(tmp_path, cache_path) #Atomic, so a partially written entry is never loaded
+		except Exception as err: #pylint: disable=broad-exception-caught #E.g. object columns with mixed types
+			log.info(f"Could not cache {file_source}: {err}")
+			self._remove(tmp_path)
+			return False
+		log.info(f"Cached {file_source} as {cache_path} in {time.perf_counter() - before:.3f}s")
+		self.evict()
+		return True
+
+	def get_entries(self) -> typing.List[typing.Tuple[str, int, float]]:
+		"""Get all cache entries as a list of (path, size, last-used-time), sorted from least to most recently used"""
+		if not os.path.isdir(self.cache_dir):
+			return []
+		entries = []
+		for name in os.listdir(self.cache_dir):
+			if not name.endswith(CACHE_EXTENSION):
+				continue
+			path = os.path.join(self.cache_dir, name)
+			try:
+				stat = os.stat(path)
+			except OSError:
+				continue
+			entries.append((path, stat.st_size, stat.st_mtime))
+		return sorted(entries, key=lambda entry: entry[2])
+
+	def evict(self, max_size_bytes : typing.Optional[int] = None):
+		"""Remove the least recently used entries until the total size of the cache is at most max_size_bytes
+
+		Args:
+			max_size_bytes (int | None, optional): The maximum size. Defaults to None (use self.max_size_bytes).
+		"""
+		max_size_bytes = self.max_size_bytes if max_size_bytes is None else max_size_bytes
+		entries = self.get_entries()
+		total_size = sum(size for _, size, _ in entries)
+		for path, size, _ in entries:
+			if total_size <= max_size_bytes:
+				break
+			log.debug(f"Evicting cache entry {path} ({size} bytes)")
+			self._remove(path)
+			total_size -= size
+
+	def clear(self):
+		"""Remove all cache entries"""
+		self.evict(max_size_bytes=0)
+
+	@staticmethod
+	def _remove(path : str):
+		try:
+			os.remove(path)
+		except OSError:
+			pass
+
+
+_DEFAULT_CACHE : typing.Optional[FileCache] = None
+
+def get_default_cache() -> FileCache:
+	"""Returns the (shared) default file cache"""
+	global _DEFAULT_CACHE #pylint: disable=global-statement
+	if _DEFAULT_CACHE is None:
+		_DEFAULT_CACHE = FileCache()
+	return _DEFAULT_CACHE
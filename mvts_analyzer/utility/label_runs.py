@@ -0,0 +1,146 @@
+"""
+Implements a run-length encoded representation of label columns.
+
+Label columns usually consist of long stretches of the same label. Storing them as runs (the first DateTime-sorted row
+of each run, plus a category code per run) means that drawing a label track only has to clip the runs to the plotted
+domain, instead of sorting, copying and comparing the whole column on every replot. The runs are patched in place when
+labels are set or renamed, so they do not have to be rebuilt from the column.
+"""
+import logging
+import typing
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+MISSING_CODE = -1 #The code of missing labels (None/NaN)
+
+
+def _is_missing(value : typing.Any) -> bool:
+	try:
+		return value is None or bool(pd.isna(value))
+	except (TypeError, ValueError): #E.g. array-like values
+		return False
+
+
+class LabelRuns():
+	"""
+	Run-length encoding of a label column in DateTime-sorted order. Run i spans the sorted rows
+	[starts[i], starts[i + 1]) and has label categories[codes[i]] (or no label if codes[i] == MISSING_CODE). Adjacent
+	runs always have different codes.
+	"""
+	def __init__(self, starts : np.ndarray, codes : np.ndarray, categories : typing.List[typing.Any], n_rows : int):
+		"""
+		Args:
+			starts (np.ndarray): The first sorted row of each run (starts[0] == 0 if n_rows > 0)
+			codes (np.ndarray): The category code of each run (MISSING_CODE for missing labels)
+			categories (typing.List[typing.Any]): The label of each code
+			n_rows (int): The total amount of (sorted) rows
+		"""
+		self.starts = starts.astype(np.int64, copy=False)
+		self.codes = codes.astype(np.int32, copy=False)
+		self.categories = list(categories)
+		self.n_rows = n_rows
+		self._category_codes : typing.Dict[typing.Any, int] = {cat : code for code, cat in enumerate(self.categories)}
+
+	@classmethod
+	def from_values(cls, sorted_values : typing.Union[np.ndarray, pd.Series]) -> "LabelRuns":
+		"""Create the runs of the (DateTime-sorted) values of a label column"""
+		codes, uniques = pd.factorize(sorted_values) #Missing values -> -1 (MISSING_CODE)
+		return cls(*cls._encode(codes), list(uniques), len(codes))
+
+	@staticmethod
+	def _encode(row_codes : np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+		"""Get the starts/codes of the runs of per-row codes"""
+		if len(row_codes) == 0:
+			return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+		starts = np.flatnonzero(np.concatenate(([True], row_codes[1:] != row_codes[:-1])))
+		return starts, row_codes[starts]
+
+	def __len__(self):
+		return len(self.starts)
+
+	@property
+	def stops(self) -> np.ndarray:
+		"""The (exclusive) last sorted row of each run"""
+		return np.append(self.starts[1:], self.n_rows)
+
+	def decode(self, start : int = 0, stop : typing.Optional[int] = None) -> np.ndarray:
+		"""Get the code of each sorted row in [start, stop)"""
+		stop = self.n_rows if stop is None else stop
+		if stop <= start:
+			return np.zeros(0, dtype=np.int32)
+		first = int(np.searchsorted(self.starts, start, side="right")) - 1
+		last = int(np.searchsorted(self.starts, stop, side="left"))
+		lengths = np.diff(np.concatenate(([start], self.starts[first + 1 : last], [stop])))
+		return np.repeat(self.codes[first:last], lengths)
+
+	def get_code(self, label : typing.Any, add : bool = False) -> typing.Optional[int]:
+		"""Get the code of a label, if add=True, unknown labels are added as a new category (else None is returned)"""
+		if _is_missing(label):
+			return MISSING_CODE
+		code = self._category_codes.get(label, None)
+		if code is None and add:
+			code = len(self.categories)
+			self.categories.append(label)
+			self._category_codes[label] = code
+		return code
+
+	def get_codes(self, start : int, stop : int) -> np.ndarray:
+		"""Get the codes of all runs that overlap with the sorted rows [start, stop)"""
+		if stop <= start:
+			return np.zeros(0, dtype=np.int32)
+		first = int(np.searchsorted(self.starts, start, side="right")) - 1
+		return self.codes[first : int(np.searchsorted(self.starts, stop, side="left"))]
+
+	def clip(self, start : int, stop : int) -> typing.Tuple[np.ndarray, np.ndarray]:
+		"""Clip the runs to the sorted rows [start, stop), e.g. the plotted domain.
+
+		Returns:
+			typing.Tuple[np.ndarray, np.ndarray]: The edges (sorted rows) and codes of the clipped runs, run i spans
+				edges[i] until edges[i + 1]. The last edge is the last row (stop - 1), a run that only consists of the
+				last row is therefore dropped.
+		"""
+		if stop - start < 2:
+			return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+		first = int(np.searchsorted(self.starts, start, side="right")) - 1
+		last = int(np.searchsorted(self.starts, stop - 1, side="left")) #Runs starting at the last row are dropped
+		edges = np.concatenate(([start], self.starts[first + 1 : last], [stop - 1]))
+		return edges, self.codes[first:last]
+
+	def set_rows(self, rows : np.ndarray, label : typing.Any):
+		"""Set the label of the passed sorted rows, only the runs between the first and last row are re-encoded
+
+		Args:
+			rows (np.ndarray): The (ascending) sorted rows to set
+			label (typing.Any): The new label (None/NaN for no label)
+		"""
+		if len(rows) == 0:
+			return
+		code = self.get_code(label, add=True)
+		first = max(int(np.searchsorted(self.starts, rows[0], side="right")) - 2, 0) #Include the neighbouring runs,
+		last = min(int(np.searchsorted(self.starts, rows[-1], side="right")) + 1, len(self.starts)) #so they can merge
+		region_start = int(self.starts[first])
+		region_stop = int(self.starts[last]) if last < len(self.starts) else self.n_rows
+		row_codes = self.decode(region_start, region_stop)
+		row_codes[rows - region_start] = code
+		new_starts, new_codes = self._encode(row_codes)
+		self.starts = np.concatenate((self.starts[:first], new_starts + region_start, self.starts[last:]))
+		self.codes = np.concatenate((self.codes[:first], new_codes, self.codes[last:]))
+
+	def rename(self, transform_dict : typing.Dict[typing.Any, typing.Any]):
+		"""Rename labels (a dictionary edit), runs that end up with the same label are merged
+
+		Args:
+			transform_dict (typing.Dict[typing.Any, typing.Any]): old label -> new label (None for no label)
+		"""
+		old_categories = self.categories
+		self.categories, self._category_codes = [], {}
+		remap = np.empty(len(old_categories) + 1, dtype=np.int32) #Last entry: MISSING_CODE -> MISSING_CODE
+		remap[-1] = MISSING_CODE
+		for code, category in enumerate(old_categories):
+			remap[code] = self.get_code(transform_dict.get(category, category), add=True) #type: ignore
+		codes = remap[self.codes]
+		keep = np.concatenate(([True], codes[1:] != codes[:-1])) if len(codes) > 0 else np.zeros(0, dtype=bool)
+		self.starts, self.codes = self.starts[keep], codes[keep]
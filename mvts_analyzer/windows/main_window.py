@@ -18,7 +18,7 @@ from mvts_analyzer.graphing.graph_settings_controller import \
     GraphSettingsController
 from mvts_analyzer.graphing.graph_settings_model import GraphSettingsModel
 from mvts_analyzer.graphing.graph_settings_view import GraphSettingsView
-from mvts_analyzer.graphing.plotter.plot_wrapper import QPlotter
+from mvts_analyzer.graphing.plotter.plot_backends import create_plotter
 from mvts_analyzer.ui.main_window_ui import Ui_MainWindow
 from mvts_analyzer.utility.gui_utility import create_qt_warningbox
 from mvts_analyzer.windows.apply_python_window import ApplyPythonWindow
@@ -94,7 +94,7 @@ class MainWindow(QtWidgets.QMainWindow):
 		self.plot_widget = QtWidgets.QWidget() #the main plot tab
 		self.graph_data_model = GraphData(**graph_model_args)
 		self.graph_settings_model = GraphSettingsModel(**graph_settings_model_args) #Create model
-		self.plotter = QPlotter(self.graph_data_model, self.graph_settings_model)
+		self.plotter = create_plotter(self.graph_data_model, self.graph_settings_model)
 		self.graph_view = GraphSettingsView(self.plotter) # Create View (using created plotter)
 		self.setCentralWidget(self.graph_view)
 		self.graph_controller = GraphSettingsController(
@@ -115,7 +115,7 @@ class MainWindow(QtWidgets.QMainWindow):
 		self.ui.actionQuit.triggered.connect(self.close)
 		self.ui.actionRename_Label.triggered.connect(self.open_label_rename_window)
 		self.ui.actionPython_Code.triggered.connect(self.open_python_window)
-		self.ui.actionSave_Figure_As.triggered.connect(self.plotter.canvas.open_save_popup)
+		self.ui.actionSave_Figure_As.triggered.connect(self.plotter.open_save_popup)
 		self.ui.actionCopy_Figure_To_Clipboard.triggered.connect(self.graph_controller.copy_plot_to_clipboard)
 		self.ui.actionAppend_From_File.triggered.connect(self.graph_controller.append_df_from_file)
 		self.ui.actionOpenMergeLabelColumnWindow.triggered.connect(self.open_merge_label_column_window)
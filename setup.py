@@ -38,7 +38,8 @@ setup(
 		'numpy>=1.15.0',			#1.25.2 			1.15.0
 		'pandas>=1.2.0',			#2.0.3				1.2.0
 		'PySide6>=6.2.0',			#6.5.2				6.2.0
-		# 'scikit-image>=0.15',		#0.21				0.15  #Only used for y-resolution-reduction for fft
 		# 'scikit-learn>=1.3.0',	#1.3.0 #Only used fot certain data-analysis functions (not yet used in GUI)
+		# 'pyarrow>=7.0.0',			#14.0.2 #Optional, used to load/save parquet and feather files, by the parallel csv reader and for the cache of parsed csv/xlsx files
+		# 'pyqtgraph>=0.13.0',		#0.14.0 #Only used for the (optional) pyqtgraph/OpenGL plotting backend
 	]
 )
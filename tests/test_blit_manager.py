@@ -0,0 +1,30 @@
+"""
+Tests for BlitManager
+"""
+import io
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+
+from mvts_analyzer.graphing.plotter.blit_manager import BlitManager
+
+
+def test_saved_figure_draws_animated_artists_once():
+	"""Saving a figure should contain every animated artist exactly once"""
+	figure = Figure()
+	canvas = FigureCanvasAgg(figure)
+	blit_manager = BlitManager(canvas)
+	ax = figure.add_subplot() #pylint: disable=invalid-name
+	x_vals = np.arange(2000, dtype=np.float64)
+	points = np.column_stack((x_vals, np.sin(x_vals / 50)))
+	collection = LineCollection(np.stack((points[:-1], points[1:]), axis=1))
+	ax.add_collection(collection)
+	blit_manager.add_artist(collection)
+	canvas.draw()
+
+	buffer = io.StringIO()
+	figure.savefig(buffer, format="svg")
+	assert buffer.getvalue().count('<g id="LineCollection_') == 1
+	assert blit_manager.frame is None #Saving should not replace the cached (screen) background
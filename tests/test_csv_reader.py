@@ -0,0 +1,33 @@
+"""
+Tests for the streaming csv reader
+"""
+import numpy as np
+import pandas as pd
+
+from mvts_analyzer.utility import csv_reader
+
+
+def test_read_csv_streaming_downcasts_lossless(tmp_path):
+	"""Columns should be downcast to the smallest type that holds all values exactly"""
+	n_rows = 1000
+	df = pd.DataFrame({
+		"DateTime": pd.date_range("2020-01-01", periods=n_rows, freq="s"),
+		"Small": np.arange(n_rows) % 100,
+		"Negative": np.arange(n_rows) - 500,
+		"Large": np.arange(n_rows, dtype=np.int64) * 2**40,
+		"Half": np.arange(n_rows) / 2,
+		"Tenth": np.arange(n_rows) / 10,
+	})
+	path = tmp_path / "data.csv"
+	df.to_csv(path, index=False)
+
+	result = csv_reader.read_csv_streaming(str(path), chunk_rows=128)
+	assert result["Small"].dtype == np.int8
+	assert result["Negative"].dtype == np.int16
+	assert result["Large"].dtype == np.int64
+	assert result["Half"].dtype == np.float32
+	assert result["Tenth"].dtype == np.float64
+	for column in ["Small", "Negative", "Large", "Half", "Tenth"]:
+		assert np.array_equal(result[column].to_numpy(np.float64), df[column].to_numpy(np.float64))
+
+	assert csv_reader.read_csv_streaming(str(path), downcast=False)["Small"].dtype == np.int64
@@ -0,0 +1,113 @@
+"""
+Tests for GraphData
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from mvts_analyzer.graphing.graph_data import GraphData
+
+
+@pytest.fixture
+def descending_data() -> GraphData:
+	"""GraphData of a dataframe sorted descending by DateTime (like the example data)"""
+	data = GraphData()
+	times = pd.date_range("2020-01-01", periods=500, freq="min")[::-1]
+	data.load_existing_df(pd.DataFrame({"DateTime": times, "Value": np.arange(500, dtype=np.float64)}))
+	return data
+
+
+@pytest.mark.parametrize("left, right", [
+	("2019-12-30", "2019-12-31"), #Before the data
+	("2020-01-02", "2020-01-03"), #After the data
+	("2020-01-01 01:00", "2020-01-01 02:30"), #Inside the data
+	("2019-12-31", "2020-01-01 00:10"), #Overlapping the start
+	(None, None), #No bounds
+])
+def test_get_dt_indexer_descending(descending_data : GraphData, left, right):
+	"""The (reversed) slice of descending data should only select the rows within the domain"""
+	df = descending_data.df
+	assert df is not None
+	expected = np.ones(len(df), dtype=bool)
+	if left is not None:
+		expected &= (df["DateTime"] >= pd.Timestamp(left)).to_numpy()
+	if right is not None:
+		expected &= (df["DateTime"] <= pd.Timestamp(right)).to_numpy()
+
+	selected = df.iloc[descending_data.get_dt_indexer(left, right)]
+	assert sorted(selected.index) == sorted(df.index[expected])
+
+
+def test_overwrite_selection_only_emits_on_change(descending_data : GraphData):
+	"""Overwriting the selection with the same selection should not emit dfSelectionChanged"""
+	emitted = []
+	descending_data.dfSelectionChanged.connect(emitted.append)
+	mask = np.zeros(descending_data.get_df_len(), dtype=bool)
+	mask[10:20] = True
+	descending_data.set_df_selection(mask)
+	descending_data.set_df_selection(mask.copy())
+	assert len(emitted) == 1
+	assert np.array_equal(descending_data.selection_mask, mask)
+
+
+def test_install_prepared_df_matches_rebuild():
+	"""Installing a dataframe prepared outside of the GUI-thread should result in the same derived data"""
+	rng = np.random.default_rng(0)
+	df = pd.DataFrame({
+		"DateTime": pd.date_range("2020-01-01", periods=1000, freq="s")[::-1],
+		"Value": rng.random(1000),
+		"Label": rng.choice(["a", "b"], 1000)
+	})
+	rebuilt, prepared = GraphData(), GraphData()
+	rebuilt.install_loaded_df(df.copy(deep=True), "")
+	prepared.install_loaded_df(GraphData.prepare_df(df.copy(deep=True)), "")
+
+	assert np.array_equal(rebuilt.dt_sort_order, prepared.dt_sort_order) #type: ignore
+	assert isinstance(prepared.df["Label"].dtype, pd.CategoricalDtype) #type: ignore
+	rebuilt_pyramid, prepared_pyramid = rebuilt.get_summary_pyramid(), prepared.get_summary_pyramid()
+	assert rebuilt_pyramid is not None and prepared_pyramid is not None
+	assert np.array_equal(rebuilt_pyramid.query_positions("Value", 10, 900, 20),
+		prepared_pyramid.query_positions("Value", 10, 900, 20))
+
+
+def test_apply_python_code_new_label():
+	"""New labels can not be assigned directly to a categorical label column, set_lbls adds them as a category"""
+	data = GraphData()
+	data.load_existing_df(pd.DataFrame({
+		"DateTime": pd.date_range("2020-01-01", periods=100, freq="s"),
+		"Value": np.arange(100, dtype=np.float64),
+		"L": ["a", "b"] * 50
+	}))
+	assert isinstance(data.df["L"].dtype, pd.CategoricalDtype) #type: ignore
+
+	success, _ = data.apply_python_code('self.df.loc[self.df["Value"] >= 90, "L"] = "c"')
+	assert not success
+	success, msg = data.apply_python_code('self.set_lbls("L", self.df["Value"] >= 90, "c")')
+	assert success, msg
+	df = data.df
+	assert df is not None and isinstance(df["L"].dtype, pd.CategoricalDtype)
+	assert (df["L"].iloc[90:] == "c").all() and (df["L"].iloc[:90] != "c").all()
+	assert df["L"].iloc[:4].tolist() == ["a", "b", "a", "b"]
+
+
+@pytest.mark.parametrize("values, dtype", [
+	([0.5, 1.0, 2.0], np.float32), #Exactly representable as float32
+	([0.1, 0.2, 0.3], np.float64),
+])
+def test_fft_matrix_is_lossless(values, dtype):
+	"""The cells of fft-columns are replaced by row-views of a matrix that holds the exact same values"""
+	cells = [list(values) for _ in range(10)]
+	data = GraphData()
+	data.load_existing_df(pd.DataFrame({"DateTime": pd.date_range("2020-01-01", periods=10, freq="s"), "FFT": cells}))
+	fft_matrix = data.get_fft_matrix("FFT")
+	assert fft_matrix is not None
+	matrix, rows = fft_matrix
+	assert matrix.dtype == dtype and np.array_equal(rows, np.arange(10))
+	assert all(cell.base is matrix and cell.tolist() == values for cell in data.df["FFT"]) #type: ignore
+
+	data.df.at[2, "FFT"][0] = 4.0 #type: ignore #In-place edits change the matrix itself
+	assert matrix[2, 0] == 4.0
+	data.df.at[3, "FFT"] = [1.0, 2.0, 3.0] #type: ignore #Replaced cells are picked up on the next request
+	data.dfChanged.emit()
+	matrix, rows = data.get_fft_matrix("FFT") #type: ignore
+	assert np.array_equal(matrix[rows[3]], [1.0, 2.0, 3.0]) and matrix[rows[2], 0] == 4.0
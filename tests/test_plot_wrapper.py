@@ -0,0 +1,46 @@
+"""
+Tests for QPlotter (the matplotlib plotting backend)
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6 import QtWidgets #pylint: disable=wrong-import-position
+
+#Matplotlib (used by the settings model) only loads its Qt backend without a display once a Qt application exists
+APP = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+from mvts_analyzer.graphing.graph_data import GraphData #pylint: disable=wrong-import-position
+from mvts_analyzer.graphing.graph_settings_model import GraphSettingsModel #pylint: disable=wrong-import-position
+from mvts_analyzer.graphing.plotter.plot_wrapper import QPlotter #pylint: disable=wrong-import-position
+from mvts_analyzer.graphing.plotter.replot_scheduler import ReplotStage #pylint: disable=wrong-import-position
+
+
+def test_font_size_only_restyles():
+	"""Changing the font size should restyle the kept axes instead of replotting everything"""
+	rng = np.random.default_rng(0)
+	data = GraphData()
+	data.load_existing_df(pd.DataFrame({
+		"DateTime": pd.date_range("2020-01-01", periods=1000, freq="s"),
+		"A": rng.normal(size=1000) * 1000,
+		"B": rng.normal(size=1000),
+	}))
+	settings = GraphSettingsModel(default_plot_list=["A", "B"])
+	settings.plot_domain_limrange = data.get_col_limrange("DateTime") #Normally set by the settings controller
+	settings.font_size = 10
+	plotter = QPlotter(data, settings)
+	assert plotter._replot() #pylint: disable=protected-access
+	axes = dict(plotter.canvas.ax_dict)
+	offset = plotter.data_axes[1].spines["right"].get_position()[1]
+
+	settings.font_size = 20
+	assert plotter._get_changed_stages() == ReplotStage.STYLE #pylint: disable=protected-access
+	assert plotter._update_stages(ReplotStage.STYLE) #pylint: disable=protected-access
+	assert plotter.canvas.ax_dict == axes #The axes are kept
+	bottom_ax = plotter.canvas.ax_dict[plotter.canvas.ax_order[-1]]
+	assert bottom_ax.get_xticklabels()[0].get_fontsize() == 20 and bottom_ax.xaxis.label.get_fontsize() == 20
+	assert plotter.data_axes[1].get_yticklabels()[0].get_fontsize() == 20
+	assert plotter.data_axes[1].spines["right"].get_position()[1] > offset #Wider tick labels of the first twin-axis
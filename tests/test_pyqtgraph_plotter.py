@@ -0,0 +1,50 @@
+"""
+Smoke tests for the pyqtgraph plotting backend (skipped if pyqtgraph is not installed)
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyqtgraph")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6 import QtWidgets #pylint: disable=wrong-import-position
+
+#Matplotlib (used by the settings model) only loads its Qt backend without a display once a Qt application exists
+APP = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+from mvts_analyzer.graphing.graph_data import GraphData #pylint: disable=wrong-import-position
+from mvts_analyzer.graphing.graph_settings_model import GraphSettingsModel #pylint: disable=wrong-import-position
+from mvts_analyzer.graphing.plotter.pyqtgraph_plotter import PyQtGraphPlotter #pylint: disable=wrong-import-position
+
+
+@pytest.mark.parametrize("plot_type", ["Line", "Scatter"])
+def test_replot_and_select(plot_type):
+	"""Replotting creates the items of each series once, selections only update the data of these items"""
+	rng = np.random.default_rng(0)
+	data = GraphData()
+	data.load_existing_df(pd.DataFrame({
+		"DateTime": pd.date_range("2020-01-01", periods=1000, freq="s"),
+		"A": rng.normal(size=1000),
+		"B": rng.normal(size=1000),
+	}))
+	settings = GraphSettingsModel(default_plot_list=["A", "B"])
+	settings.plot_type = plot_type
+	settings.plot_domain_limrange = data.get_col_limrange("DateTime") #Normally set by the settings controller
+	plotter = PyQtGraphPlotter(data, settings)
+	assert plotter._replot() #pylint: disable=protected-access
+	groups = [list(series_groups) for series_groups in plotter._series_groups] #pylint: disable=protected-access
+	assert len(groups) == 2 and all(len(series_groups) > 0 for series_groups in groups)
+
+	mask = np.zeros(1000, dtype=bool)
+	mask[100:200] = True
+	data.set_df_selection(mask)
+	assert groups == plotter._series_groups #Items are kept #pylint: disable=protected-access
+	for series_groups in groups:
+		for group in series_groups:
+			if group.connect is None: #Scatter: the selected points are moved to the selected item
+				assert len(group.selected_item.getData()[0]) == 100
+			else: #Line: the segments ending at a selected point are connected in the selected item
+				assert group.selected_item.opts["connect"].sum() == 100
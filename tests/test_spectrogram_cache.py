@@ -0,0 +1,55 @@
+"""
+Tests for SpectrogramTileCache
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from mvts_analyzer.graphing.graph_data import GraphData
+from mvts_analyzer.graphing.plotter.spectrogram_cache import SpectrogramTileCache
+
+N_ROWS, N_LINES = 20000, 16
+
+
+@pytest.fixture
+def fft_data() -> GraphData:
+	"""GraphData with an fft-column of N_ROWS rows (sampled every second) of N_LINES lines"""
+	values = np.random.default_rng(0).random((N_ROWS, N_LINES))
+	data = GraphData()
+	data.load_existing_df(pd.DataFrame({
+		"DateTime": pd.date_range("2020-01-01", periods=N_ROWS, freq="s"),
+		"FFT": [list(row) for row in values]
+	}))
+	return data
+
+
+def test_window_is_time_binned(fft_data : GraphData): #pylint: disable=redefined-outer-name
+	"""Windows are averaged into bins of 2^level rows, centered on the (regularly sampled) times of their rows"""
+	cache = SpectrogramTileCache(fft_data)
+	times, values = cache.get_window("FFT", 0, N_LINES, 1, max_columns=1000) #type: ignore
+	level = cache.get_level(N_ROWS, 1000)
+	bin_size = 1 << level
+	assert level == 4 and len(times) == -(-N_ROWS // bin_size)
+	matrix, _ = fft_data.get_fft_matrix("FFT") #type: ignore
+	assert np.allclose(values[3], matrix[3 * bin_size : 4 * bin_size].mean(axis=0), atol=1e-6)
+	steps = np.diff(times.astype(np.int64))
+	assert np.all(steps == bin_size * 10**9) #Also the (partial) last bin
+
+
+def test_panning_reuses_tiles(fft_data : GraphData): #pylint: disable=redefined-outer-name
+	"""Panning at the same zoom level should only create the tiles that were not cached yet, also if the window does
+	not fit in the cache"""
+	cache = SpectrogramTileCache(fft_data)
+	cache.TILE_BINS = 64
+	cache.MAX_CACHE_BYTES = 1 #Only the tiles of the last window are kept
+	created = []
+	create_tile = cache._create_tile #pylint: disable=protected-access
+	cache._create_tile = lambda *args: created.append(args[3]) or create_tile(*args) #pylint: disable=protected-access
+
+	times = fft_data.df["DateTime"] #type: ignore
+	cache.get_window("FFT", 0, N_LINES, 1, times.iloc[0], times.iloc[9999], max_columns=500)
+	first_tiles = list(created)
+	assert len(first_tiles) > 1 and cache.cached_bytes > 0 #The tiles of the window are kept
+	created.clear()
+	cache.get_window("FFT", 0, N_LINES, 1, times.iloc[100], times.iloc[10099], max_columns=500)
+	assert len(created) <= 1 #Only the tile at the new right edge